@@ -0,0 +1,46 @@
+import os
+import sys
+
+def get_application_path():
+    """
+    Get the correct application path whether running as script or executable.
+
+    Returns:
+        str: Path to the application directory
+    """
+    if getattr(sys, 'frozen', False):
+        # Running as PyInstaller executable
+        return os.path.dirname(sys.executable)
+    else:
+        # Running as Python script
+        return os.path.dirname(os.path.abspath(__file__))
+
+def get_tools_path():
+    """
+    Get the correct Tools directory path.
+
+    Returns:
+        str: Path to the Tools directory
+    """
+    return os.path.join(get_application_path(), "Tools")
+
+def get_compressonator_path():
+    """Get the path of compressonatorcli.exe"""
+    return os.path.join(get_tools_path(), "compressonator", "compressonatorcli.exe")
+
+def get_yacpktool_path():
+    """Get the path of YACpkTool.exe"""
+    return os.path.join(get_tools_path(), "YACpkTool", "YACpkTool.exe")
+
+def get_dscstools_path():
+    """Get the path of DSCSToolsCLI.exe"""
+    return os.path.join(get_tools_path(), "DSCSTools", "DSCSToolsCLI.exe")
+
+def get_tool_working_dir():
+    """
+    Working directory for external tools.
+
+    PyInstaller builds run them from the executable's directory; scripts
+    keep the current directory.
+    """
+    return os.path.dirname(sys.executable) if hasattr(sys, '_MEIPASS') else None
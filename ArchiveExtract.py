@@ -0,0 +1,303 @@
+import os
+import mmap
+import time
+import struct
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from ToolProgress import counter_snapshot, format_bytes
+
+# ============================================================================
+# Memory-Mapped Archives
+# ============================================================================
+
+class MappedArchive:
+    """
+    Read-only, memory-mapped archive (base of CPKArchive and MVGLArchive).
+
+    Only the header and tables are parsed on open; file data is read from
+    the mapping when an entry is read or extracted. Use as a context manager
+    or call close().
+
+    Subclasses set format_name, format_error (raised for unreadable archives)
+    and decode, a module-level decode(data, position, encrypted, compressed,
+    extract_size) turning stored bytes into file contents, and fill
+    self.entries in _read_tables().
+    """
+    format_name = "archive"
+    format_error = ValueError
+    decode = None
+    encrypted = False
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise self.format_error("Empty file")
+        try:
+            self._read_tables()
+        except (self.format_error, struct.error, IndexError) as e:
+            self.close()
+            raise e if isinstance(e, self.format_error) else self.format_error(
+                f"Corrupt {self.format_name} archive: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _read_tables(self):
+        raise NotImplementedError
+
+    # ============================================================================
+    # Selection and Reading
+    # ============================================================================
+
+    def find(self, patterns):
+        """
+        Entries whose path matches any of the glob patterns (case-sensitive,
+        '*' also matches '/'). An empty pattern list selects every entry.
+        """
+        if not patterns:
+            return list(self.entries)
+        return [entry for entry in self.entries
+                if any(fnmatch.fnmatchcase(entry.path, pattern) for pattern in patterns)]
+
+    def get(self, path):
+        """Entry with exactly this path, or None"""
+        for entry in self.entries:
+            if entry.path == path:
+                return entry
+        return None
+
+    def advise_sequential(self):
+        """Hint the OS to read the mapping ahead (no-op where unsupported)"""
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            self._map.madvise(mmap.MADV_SEQUENTIAL)
+
+    def read_raw(self, entry):
+        """Stored bytes of an entry (still encrypted and compressed if it is)"""
+        if entry.offset + entry.size > len(self._map):
+            raise self.format_error(f"{entry.path}: data beyond end of archive")
+        return self._map[entry.offset:entry.offset + entry.size]
+
+    def read(self, entry):
+        """Contents of an entry, decrypted and decompressed"""
+        return self.decode(self.read_raw(entry), entry.offset, self.encrypted, entry.compressed,
+                           entry.extract_size)
+
+    def extract(self, entry, target_dir):
+        """
+        Write an entry below target_dir, keeping its directory structure.
+
+        Returns:
+            str: Path of the written file
+        """
+        output_path = safe_output_path(target_dir, entry.path, self.format_error)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'wb') as f:
+            f.write(self.read(entry))
+        return output_path
+
+def safe_output_path(target_dir, entry_path, error=ValueError):
+    """Join an archive path to target_dir, raising `error` for paths that escape it"""
+    parts = [part for part in entry_path.replace('\\', '/').split('/') if part not in ('', '.')]
+    if not parts or '..' in parts or ':' in parts[0]:
+        raise error(f"Unsafe path in archive: {entry_path!r}")
+    return os.path.join(target_dir, *parts)
+
+# ============================================================================
+# Listing
+# ============================================================================
+
+def parse_patterns(text):
+    """Split a ';' or ',' separated list of glob patterns (empty list = everything)"""
+    return [pattern.strip() for pattern in text.replace(',', ';').split(';') if pattern.strip()]
+
+def format_listing(entries):
+    """Format entries as one 'offset  size  [extract size]  path' line each plus a total line"""
+    lines = []
+    for entry in entries:
+        size = format_bytes(entry.size)
+        if entry.compressed:
+            size += f" -> {format_bytes(entry.extract_size)}"
+        lines.append(f"0x{entry.offset:010x}  {size:>22}  {entry.path}")
+    total = sum(entry.extract_size for entry in entries)
+    lines.append(f"{len(entries)} file(s), {format_bytes(total)}")
+    return "\n".join(lines)
+
+# ============================================================================
+# Extraction
+# ============================================================================
+
+# Minimum seconds between progress callbacks of the built-in readers
+NATIVE_PROGRESS_INTERVAL = 0.1
+
+# Read-ahead of parallel extraction: entries read from the archive but not
+# yet written, limited in number per worker and in total (extracted) bytes
+READ_AHEAD_PER_WORKER = 4
+READ_AHEAD_BYTES = 256 * 1024 * 1024
+
+def _extract_entry(decode, output_path, data, position, encrypted, compressed, extract_size):
+    """Decode and write one entry; runs in a worker"""
+    data = decode(data, position, encrypted, compressed, extract_size)
+    with open(output_path, 'wb') as f:
+        f.write(data)
+
+def extract_entries(archive, output_dir, patterns=None, on_progress=None, is_cancelled=None, jobs=None):
+    """
+    Extract files of an open MappedArchive with its decode function.
+
+    Entries are read in archive-offset order so the disk sees one sequential
+    stream; with jobs > 1 decompression runs on a process pool and
+    decryption and writes on a thread pool while this thread keeps reading.
+
+    Args:
+        patterns: Glob patterns selecting the files to extract (None or empty: all)
+        on_progress: Called with a ToolProgress snapshot dict while extracting
+        is_cancelled: Callable returning True to stop before the next file
+        jobs: Number of workers (default: CPU count, 1 = extract in this thread)
+
+    Returns:
+        dict: 'processed', 'total', 'failures' [(path, message)], 'cancelled',
+              'elapsed' and the final progress 'snapshot'
+    """
+    start_time = time.perf_counter()
+    jobs = jobs or os.cpu_count() or 1
+    is_cancelled = is_cancelled or (lambda: False)
+    result = {'processed': 0, 'total': 0, 'failures': [], 'cancelled': False, 'elapsed': 0.0}
+    entries = sorted(archive.find(patterns), key=lambda entry: entry.offset)
+    result['total'] = len(entries)
+    bytes_total = sum(entry.extract_size for entry in entries)
+    bytes_done = 0
+    last_report = 0.0
+
+    def snapshot():
+        return counter_snapshot(result['processed'], len(entries), bytes_done, bytes_total,
+                                time.perf_counter() - start_time)
+
+    def record(entry, error):
+        nonlocal bytes_done, last_report
+        if error is None:
+            result['processed'] += 1
+        else:
+            result['failures'].append((entry.path, error))
+        bytes_done += entry.extract_size
+        now = time.perf_counter()
+        if on_progress and now - last_report >= NATIVE_PROGRESS_INTERVAL:
+            last_report = now
+            on_progress(snapshot())
+
+    targets = _prepare_targets(entries, output_dir, record, archive.format_error)
+    archive.advise_sequential()
+    if jobs <= 1 or len(targets) <= 1:
+        for entry, output_path in targets:
+            if is_cancelled():
+                result['cancelled'] = True
+                break
+            try:
+                _extract_entry(archive.decode, output_path, archive.read_raw(entry), entry.offset,
+                               archive.encrypted, entry.compressed, entry.extract_size)
+                record(entry, None)
+            except (OSError, archive.format_error) as e:
+                record(entry, str(e))
+    else:
+        result['cancelled'] = _extract_parallel(archive, targets, jobs, record, is_cancelled)
+
+    result['snapshot'] = snapshot()
+    result['elapsed'] = time.perf_counter() - start_time
+    return result
+
+def _prepare_targets(entries, output_dir, record, error):
+    """
+    Resolve output paths and create every output directory up front.
+
+    Entries with unsafe paths are recorded as failures and left out.
+
+    Returns:
+        list: (entry, output path) in the order of entries
+    """
+    targets = []
+    for entry in entries:
+        try:
+            targets.append((entry, safe_output_path(output_dir, entry.path, error)))
+        except error as e:
+            record(entry, str(e))
+
+    for directory in sorted({os.path.dirname(output_path) for _, output_path in targets}):
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            pass  # Reported by the entries that cannot be written
+    return targets
+
+def _extract_parallel(archive, targets, jobs, record, is_cancelled):
+    """
+    Read entries in order on this thread and hand them to worker pools.
+
+    Compressed entries go to a process pool (decompression is CPU bound),
+    the others to a thread pool that decrypts (if needed) and writes.
+    Reading pauses while the read-ahead limits are reached.
+
+    Returns:
+        bool: True if cancelled
+    """
+    writer = ThreadPoolExecutor(max_workers=jobs)
+    decompressor = None
+    if any(entry.compressed for entry, _ in targets):
+        decompressor = ProcessPoolExecutor(max_workers=jobs)
+    max_pending = jobs * READ_AHEAD_PER_WORKER
+    pending = {}
+    pending_bytes = 0
+
+    def collect():
+        nonlocal pending_bytes
+        # Wake up regularly so cancellation is noticed while workers are busy
+        finished, _ = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+        for future in finished:
+            entry = pending.pop(future)
+            pending_bytes -= entry.extract_size
+            try:
+                future.result()
+                record(entry, None)
+            except Exception as e:
+                record(entry, str(e))
+
+    try:
+        for entry, output_path in targets:
+            while pending and (len(pending) >= max_pending
+                               or pending_bytes + entry.extract_size > READ_AHEAD_BYTES):
+                if is_cancelled():
+                    return True
+                collect()
+            if is_cancelled():
+                return True
+            try:
+                data = archive.read_raw(entry)
+            except archive.format_error as e:
+                record(entry, str(e))
+                continue
+            executor = decompressor if entry.compressed and decompressor else writer
+            pending[executor.submit(_extract_entry, archive.decode, output_path, data, entry.offset,
+                                    archive.encrypted, entry.compressed, entry.extract_size)] = entry
+            pending_bytes += entry.extract_size
+
+        while pending:
+            if is_cancelled():
+                return True
+            collect()
+        return False
+    finally:
+        writer.shutdown(wait=True, cancel_futures=True)
+        if decompressor:
+            decompressor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,97 @@
+import os
+
+from AppPaths import get_yacpktool_path, get_tool_working_dir
+from ArchiveExtract import extract_entries, parse_patterns, format_listing
+from CPKReader import CPKArchive
+from CPKPatcher import patch_cpk
+from ProcessRunner import ProcessRunner
+from ToolProgress import ProgressTracker, parser_for_command, run_with_progress
+
+# ============================================================================
+# Command Builders
+# ============================================================================
+
+def check_yacpktool():
+    """Raise FileNotFoundError if YACpkTool.exe is missing"""
+    yacpktool_path = get_yacpktool_path()
+    if not os.path.exists(yacpktool_path):
+        raise FileNotFoundError(f"YACpkTool.exe not found at {yacpktool_path}")
+    return yacpktool_path
+
+def extract_command(input_file, output_dir):
+    """
+    Build the extract command: YACpkTool.exe <INPUT_CPK> <OUT_FOLDER>
+
+    Creates output_dir if it doesn't exist.
+    """
+    yacpktool_path = check_yacpktool()
+    os.makedirs(output_dir, exist_ok=True)
+    return [yacpktool_path, input_file, output_dir]
+
+def repack_command(input_dir, output_file):
+    """
+    Build the repack command: YACpkTool.exe <IN_FOLDER> <OUT_CPK_FILE>
+
+    Creates the output file's directory if it doesn't exist.
+    """
+    yacpktool_path = check_yacpktool()
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    return [yacpktool_path, input_dir, output_file]
+
+# ============================================================================
+# Headless Execution
+# ============================================================================
+
+def make_progress_tracker(command):
+    """Progress tracker for a command built by this module (input/output paths from its arguments)"""
+    return ProgressTracker(parser_for_command(command), command[1], command[2])
+
+def run_command(command, on_output=None, timeout=None, on_progress=None):
+    """
+    Run a YACpkTool command to completion, streaming its output.
+
+    Args:
+        on_output: Called with each output line
+        timeout: Seconds after which the tool is killed
+        on_progress: Called periodically with a ToolProgress snapshot dict
+
+    Returns:
+        tuple: (returncode, final progress snapshot)
+
+    Raises:
+        TimeoutError: If the tool ran longer than `timeout` seconds
+    """
+    runner = ProcessRunner(command, cwd=get_tool_working_dir(), on_output=on_output,
+                           merge_stderr=True, timeout=timeout)
+    snapshot = run_with_progress(runner, make_progress_tracker(command), on_progress)
+    if runner.timed_out:
+        raise TimeoutError(f"{os.path.basename(command[0])} timed out after {timeout}s")
+    return runner.returncode, snapshot
+
+# ============================================================================
+# Built-in Reader
+# ============================================================================
+
+def list_entries(input_file, patterns=None):
+    """
+    List the files of a CPK archive without extracting anything.
+
+    Returns:
+        list: CPKEntry objects in archive order, filtered by glob patterns
+    """
+    with CPKArchive(input_file) as archive:
+        return archive.find(patterns)
+
+def extract_native(input_file, output_dir, patterns=None, on_progress=None, is_cancelled=None, jobs=None):
+    """
+    Extract files with the built-in CPK reader (no external tool).
+
+    See ArchiveExtract.extract_entries for the arguments and the returned dict.
+
+    Raises:
+        CPKFormatError: If the archive cannot be read
+    """
+    with CPKArchive(input_file) as archive:
+        return extract_entries(archive, output_dir, patterns, on_progress, is_cancelled, jobs)
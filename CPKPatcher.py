@@ -0,0 +1,316 @@
+import os
+import sys
+import time
+import struct
+
+from CPKReader import CPKArchive, CPKFormatError, UTFTable, UTF_MAGIC, unmask_utf
+from ToolProgress import counter_snapshot
+
+# Largest single copy request (copy_file_range/sendfile/read)
+COPY_BLOCK = 8 * 1024 * 1024
+
+# Tables stored after the content area move by multiples of this
+TABLE_ALIGN = 0x800
+
+# Minimum seconds between progress callbacks
+PROGRESS_INTERVAL = 0.1
+
+# ============================================================================
+# Block Copies
+# ============================================================================
+
+def _copy_file_range(source_fd, target_fd, offset, count):
+    return os.copy_file_range(source_fd, target_fd, count, offset)
+
+def _sendfile(source_fd, target_fd, offset, count):
+    return os.sendfile(target_fd, source_fd, offset, count)
+
+# In-kernel copies, tried in order; sendfile only writes to regular files on Linux
+KERNEL_COPIES = []
+if hasattr(os, 'copy_file_range'):
+    KERNEL_COPIES.append(_copy_file_range)
+if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+    KERNEL_COPIES.append(_sendfile)
+
+def _write_all(target, data):
+    view = memoryview(data)
+    while view:
+        view = view[target.write(view):]
+
+def copy_range(source, target, offset, count):
+    """
+    Copy count bytes at offset of source to the current position of target.
+
+    Uses os.copy_file_range or os.sendfile where available so the data never
+    passes through Python, falling back to buffered reads. target must be
+    unbuffered (buffering=0) so its file descriptor position stays in sync.
+    """
+    source_fd, target_fd = source.fileno(), target.fileno()
+    for kernel_copy in KERNEL_COPIES:
+        try:
+            while count:
+                copied = kernel_copy(source_fd, target_fd, offset, min(count, COPY_BLOCK))
+                if copied == 0:
+                    break  # End of source, reported below
+                offset += copied
+                count -= copied
+            break
+        except OSError:
+            continue  # Not supported for these files, try the next method
+
+    source.seek(offset)
+    while count:
+        chunk = source.read(min(count, COPY_BLOCK))
+        if not chunk:
+            raise CPKFormatError(f"Unexpected end of {os.path.basename(source.name)} while copying")
+        _write_all(target, chunk)
+        count -= len(chunk)
+
+# ============================================================================
+# Table Patching
+# ============================================================================
+
+def _align_up(value, align):
+    return -(-value // align) * align
+
+class _TablePacket:
+    """The @UTF table of a chunk inside buffer, unmasked and editable in place"""
+    def __init__(self, buffer, position, magic):
+        if bytes(buffer[position:position + 4]) != magic:
+            raise CPKFormatError(f"{magic.decode().strip()} chunk expected at offset 0x{position:x}")
+        size = struct.unpack_from('<Q', buffer, position + 8)[0]
+        self.buffer = buffer
+        self.start = position + 16
+        self.end = self.start + size
+        raw = bytes(buffer[self.start:self.end])
+        self.masked = raw[:4] != UTF_MAGIC
+        self.packet = bytearray(unmask_utf(raw) if self.masked else raw)
+        self.table = UTFTable(self.packet)
+
+    def store(self):
+        """Write the table back (masked again if it was)"""
+        packet = bytes(self.packet)
+        self.buffer[self.start:self.end] = unmask_utf(packet) if self.masked else packet
+
+def _patch_itoc(itoc, sizes_by_id):
+    """Update FileSize/ExtractSize of the DataL/DataH sub-tables of an ITOC"""
+    for column in ('DataL', 'DataH'):
+        if column not in itoc.table.columns or itoc.table.get(column) is None:
+            continue
+        start, _size = itoc.table.data_range(column)
+        files = UTFTable(itoc.packet, start)
+        for row, values in enumerate(files.rows):
+            size = sizes_by_id.get(values.get('ID'))
+            if size is not None:
+                files.set('FileSize', row, size)
+                if files.has_value('ExtractSize'):
+                    files.set('ExtractSize', row, size)
+
+# ============================================================================
+# Patch Build
+# ============================================================================
+
+def _collect_changes(changes_dir):
+    """Files below changes_dir keyed by their '/'-separated relative path"""
+    changes = {}
+    for root, _, files in os.walk(changes_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            changes[os.path.relpath(path, changes_dir).replace(os.sep, '/')] = path
+    return changes
+
+def patch_cpk(original_path, changes_dir, output_path, on_progress=None, is_cancelled=None):
+    """
+    Write a copy of a CPK archive with some files replaced.
+
+    Files in changes_dir replace the entries with the same path inside the
+    archive and are stored uncompressed. Unchanged entries are copied
+    byte for byte in large blocks, and the TOC (plus ITOC and header) is
+    rewritten in place, so the output has the same structure as the
+    original. Files that are not in the archive cannot be added this way
+    and are reported as failures.
+
+    Args:
+        on_progress: Called with a ToolProgress snapshot dict while writing
+        is_cancelled: Callable returning True to stop (no output is written)
+
+    Returns:
+        dict: 'replaced', 'copied' (unchanged entries), 'failures' [(path, message)],
+              'cancelled', 'error' (None or a message), 'elapsed' and the final 'snapshot'
+
+    Raises:
+        CPKFormatError: If the archive cannot be patched
+    """
+    start_time = time.perf_counter()
+    is_cancelled = is_cancelled or (lambda: False)
+    result = {'replaced': 0, 'copied': 0, 'failures': [], 'cancelled': False, 'error': None,
+              'elapsed': 0.0, 'snapshot': counter_snapshot(0, 0, 0, 0, 0.0)}
+
+    changes = _collect_changes(changes_dir)
+    with CPKArchive(original_path) as archive:
+        header = archive.header
+        entries = archive.entries
+        if not header.get('TocOffset'):
+            raise CPKFormatError("Only CPK archives with a file name table (TOC) can be patched")
+        paths = {entry.path for entry in entries}
+        for path in sorted(set(changes) - paths):
+            result['failures'].append((path, "Not in the original archive (adding files needs a full repack)"))
+        replacements = {index: changes[entry.path] for index, entry in enumerate(entries) if entry.path in changes}
+        if not replacements:
+            result['error'] = "No file of the folder matches a file in the archive"
+            result['elapsed'] = time.perf_counter() - start_time
+            return result
+
+        align = header.get('Align') or 1
+        content_offset = header.get('ContentOffset')
+        order = sorted(range(len(entries)), key=lambda index: entries[index].offset)
+        if entries[order[0]].offset < content_offset:
+            raise CPKFormatError("Files stored before the content area are not supported")
+        content_end = max([content_offset + header.get('ContentSize', 0)]
+                          + [entry.offset + entry.size for entry in entries])
+
+        # Layout: unchanged entries are copied in runs (gaps included) moved
+        # by a multiple of Align; replaced files go to the next aligned offset
+        plan = []  # ('copy', offset, size), ('file', path, size) or ('pad', size)
+        new_offsets = [0] * len(entries)
+        sizes = [entry.size for entry in entries]
+        cursor = content_offset
+        run = []
+
+        def place(offset):
+            nonlocal cursor
+            if offset > cursor:
+                plan.append(('pad', None, offset - cursor))
+            cursor = offset
+
+        def flush_run():
+            nonlocal cursor
+            if not run:
+                return
+            first = entries[run[0]].offset
+            last = max(entries[index].offset + entries[index].size for index in run)
+            delta = _align_up(cursor - first, align)
+            place(first + delta)
+            plan.append(('copy', first, last - first))
+            for index in run:
+                new_offsets[index] = entries[index].offset + delta
+            cursor += last - first
+            run.clear()
+
+        for index in order:
+            if index not in replacements:
+                run.append(index)
+                continue
+            flush_run()
+            place(_align_up(cursor, align))
+            sizes[index] = os.path.getsize(replacements[index])
+            plan.append(('file', replacements[index], sizes[index]))
+            new_offsets[index] = cursor
+            cursor += sizes[index]
+        flush_run()
+
+        tail_delta = _align_up(cursor - content_end, TABLE_ALIGN)
+        place(content_end + tail_delta)
+        head = bytearray(archive.read_span(0, content_offset))
+        tail = bytearray(archive.read_span(content_end))
+
+    def locate(offset):
+        """Buffer holding a table at an original file offset"""
+        if offset < content_offset:
+            return head, offset
+        if offset >= content_end:
+            return tail, offset - content_end
+        raise CPKFormatError(f"Table at 0x{offset:x} lies inside the content area")
+
+    def moved(offset):
+        return offset + tail_delta if offset >= content_end else offset
+
+    # TOC: new offsets (relative to the same base the reader uses) and sizes
+    toc_offset = header.get('TocOffset')
+    toc = _TablePacket(*locate(toc_offset), b'TOC ')
+    base = min(moved(toc_offset), 0x800, content_offset)
+    for index, entry in enumerate(entries):
+        toc.table.set('FileOffset', index, new_offsets[index] - base)
+        if index in replacements:
+            toc.table.set('FileSize', index, sizes[index])
+            if toc.table.has_value('ExtractSize'):
+                toc.table.set('ExtractSize', index, sizes[index])
+    toc.store()
+
+    if header.get('ItocOffset'):
+        itoc = _TablePacket(*locate(header.get('ItocOffset')), b'ITOC')
+        _patch_itoc(itoc, {entries[index].id: sizes[index] for index in replacements})
+        itoc.store()
+
+    # Header: tables after the content move, sizes change
+    cpk_header = _TablePacket(head, 0, b'CPK ')
+    table = cpk_header.table
+    for column in table.columns:
+        value = table.get(column)
+        if column.endswith('Offset') and isinstance(value, int) and value >= content_end and table.has_value(column):
+            table.set(column, 0, value + tail_delta)
+    size_changes = {
+        'ContentSize': tail_delta,
+        'EnabledPackedSize': sum(sizes[index] - entries[index].size for index in replacements),
+        'EnabledDataSize': sum(sizes[index] - entries[index].extract_size for index in replacements),
+    }
+    for column, change in size_changes.items():
+        if table.get(column) is not None and table.has_value(column):
+            table.set(column, 0, table.get(column) + change)
+    cpk_header.store()
+
+    # Write everything to a temporary file next to the output
+    bytes_total = len(head) + sum(size for _, _, size in plan) + len(tail)
+    bytes_done = 0
+    last_report = 0.0
+
+    def snapshot():
+        return counter_snapshot(result['replaced'] + result['copied'], len(entries), bytes_done, bytes_total,
+                                time.perf_counter() - start_time)
+
+    temp_path = f"{output_path}.tmp{os.getpid()}"
+    try:
+        with open(original_path, 'rb') as source, open(temp_path, 'wb', buffering=0) as target:
+            _write_all(target, head)
+            for kind, location, size in plan:
+                if is_cancelled():
+                    result['cancelled'] = True
+                    break
+                if kind == 'copy':
+                    copy_range(source, target, location, size)
+                elif kind == 'file':
+                    with open(location, 'rb') as replacement:
+                        copy_range(replacement, target, 0, size)
+                else:
+                    _write_all(target, bytes(size))
+                bytes_done += size
+                now = time.perf_counter()
+                if on_progress and now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    on_progress(snapshot())
+            else:
+                _write_all(target, tail)
+                bytes_done += len(tail)
+
+        if not result['cancelled']:
+            _verify(temp_path, entries, sizes)
+            os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    if not result['cancelled']:
+        result['replaced'] = len(replacements)
+        result['copied'] = len(entries) - len(replacements)
+    result['snapshot'] = snapshot()
+    result['elapsed'] = time.perf_counter() - start_time
+    return result
+
+def _verify(path, entries, sizes):
+    """Re-read the written archive's tables and check every entry"""
+    with CPKArchive(path) as patched:
+        if len(patched.entries) != len(entries):
+            raise CPKFormatError("Patched archive failed verification: entry count changed")
+        for entry, size in zip(patched.entries, sizes):
+            if entry.size != size or entry.offset + entry.size > os.path.getsize(path):
+                raise CPKFormatError(f"Patched archive failed verification: {entry.path}")
@@ -0,0 +1,409 @@
+import struct
+
+from ArchiveExtract import MappedArchive
+
+# ============================================================================
+# @UTF Tables
+# ============================================================================
+
+UTF_MAGIC = b'@UTF'
+
+# Column flags (high nibble of the column type byte)
+COLUMN_NAME = 0x10
+COLUMN_DEFAULT = 0x20  # Value stored once in the column schema
+COLUMN_ROW = 0x40      # Value stored in every row
+
+# Column type (low nibble) -> big-endian struct code
+COLUMN_TYPES = {
+    0x00: 'B', 0x01: 'b', 0x02: 'H', 0x03: 'h', 0x04: 'I', 0x05: 'i',
+    0x06: 'Q', 0x07: 'q', 0x08: 'f', 0x09: 'd',
+    0x0A: 'I',   # String: offset into the string pool
+    0x0B: 'II',  # Data: offset and size in the data pool
+    0x0C: '16s',
+}
+TYPE_STRING = 0x0A
+TYPE_DATA = 0x0B
+
+class CPKFormatError(ValueError):
+    """File is not a CPK archive the reader understands"""
+
+def unmask_utf(data):
+    """Undo the XOR mask CRI applies to @UTF tables of some archives"""
+    key = 0x655F
+    out = bytearray(len(data))
+    for i, byte in enumerate(data):
+        out[i] = byte ^ (key & 0xFF)
+        key = (key * 0x4115) & 0xFFFF
+    return bytes(out)
+
+def _decode_string(raw):
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('cp932', errors='replace')  # CRI tools write Shift-JIS
+
+class UTFTable:
+    """
+    A CRI @UTF table.
+
+    Attributes:
+        name: Table name
+        columns: Column names in schema order
+        rows: List of {column: value} dicts; strings are str, data columns
+              are bytes, columns without a value are None
+
+    Parsing a bytearray allows numeric per-row values to be changed in
+    place with set(), keeping the table layout byte for byte.
+    """
+    def __init__(self, data, offset=0):
+        """Parse the table at `offset` of data (bytes, memoryview or mmap)"""
+        if bytes(data[offset:offset + 4]) != UTF_MAGIC:
+            raise CPKFormatError(f"@UTF table expected at offset 0x{offset:x}")
+        table_size = struct.unpack_from('>I', data, offset + 4)[0]
+        base = offset + 8
+        if base + table_size > len(data):
+            raise CPKFormatError("Truncated @UTF table")
+
+        (_version, rows_offset, strings_offset, data_offset, name_offset,
+         column_count, row_width, row_count) = struct.unpack_from('>HHIIIHHI', data, base)
+        self._strings_offset = base + strings_offset
+        self._data_offset = base + data_offset
+        self._data = data
+        self._string_cache = {}
+        self.name = self._string(name_offset)
+
+        # Column schema
+        position = base + 24
+        schema = []
+        self._default_fields = {}
+        for _ in range(column_count):
+            flags, name_offset = struct.unpack_from('>BI', data, position)
+            position += 5
+            code = COLUMN_TYPES.get(flags & 0x0F)
+            if code is None:
+                raise CPKFormatError(f"Unknown @UTF column type 0x{flags & 0x0F:x}")
+            value = None
+            if flags & COLUMN_DEFAULT:
+                self._default_fields[self._string(name_offset)] = (position, flags & 0x0F, code)
+                raw = struct.unpack_from('>' + code, data, position)
+                position += struct.calcsize('>' + code)
+                value = self._convert(flags & 0x0F, raw)
+            schema.append((self._string(name_offset), flags, code, value))
+        self.columns = [name for name, _flags, _code, _value in schema]
+
+        # Rows: one struct covering every per-row column
+        row_columns = [(name, flags & 0x0F) for name, flags, _code, _value in schema if flags & COLUMN_ROW]
+        row_format = '>' + ''.join(code for _name, flags, code, _value in schema if flags & COLUMN_ROW)
+        row_struct = struct.Struct(row_format)
+        constants = {name: value for name, flags, _code, value in schema if not flags & COLUMN_ROW}
+
+        # Position of each per-row column inside a row (for set/data_range);
+        # default columns are located by _default_fields instead
+        self._rows_start = base + rows_offset
+        self._row_width = row_width
+        self._row_fields = {}
+        position = 0
+        for name, flags, code, _value in schema:
+            if flags & COLUMN_ROW:
+                self._row_fields[name] = (position, flags & 0x0F, code)
+                position += struct.calcsize('>' + code)
+
+        self.rows = []
+        for index in range(row_count):
+            raw = row_struct.unpack_from(data, self._rows_start + index * row_width)
+            row = dict(constants)
+            position = 0
+            for name, column_type in row_columns:
+                width = 2 if column_type == TYPE_DATA else 1
+                row[name] = self._convert(column_type, raw[position:position + width])
+                position += width
+            self.rows.append(row)
+
+    def _string(self, offset):
+        value = self._string_cache.get(offset)
+        if value is None:
+            start = self._strings_offset + offset
+            end = start
+            while self._data[end] != 0:
+                end += 1
+            value = _decode_string(bytes(self._data[start:end]))
+            self._string_cache[offset] = value
+        return value
+
+    def _convert(self, column_type, raw):
+        if column_type == TYPE_STRING:
+            return self._string(raw[0])
+        if column_type == TYPE_DATA:
+            start = self._data_offset + raw[0]
+            return bytes(self._data[start:start + raw[1]])
+        return raw[0]
+
+    def get(self, column, row=0, default=None):
+        """Value of a column in a row, default if the table has no such column"""
+        value = self.rows[row].get(column) if row < len(self.rows) else None
+        return default if value is None else value
+
+    def has_value(self, column):
+        """Check whether column has a stored value (per row or default) that set() can change"""
+        return column in self._row_fields or (column in self._default_fields and len(self.rows) == 1)
+
+    def _field(self, column, row):
+        """Buffer position, type and struct code of a stored value"""
+        field = self._row_fields.get(column)
+        if field is not None:
+            position, column_type, code = field
+            return self._rows_start + row * self._row_width + position, column_type, code
+        field = self._default_fields.get(column)
+        if field is None:
+            raise CPKFormatError(f"@UTF table {self.name}: column {column} has no stored value")
+        return field
+
+    def set(self, column, row, value):
+        """
+        Overwrite a numeric value in the parsed buffer (a bytearray).
+
+        Default columns are shared by every row, so they can only be set in
+        single-row tables.
+
+        Raises:
+            CPKFormatError: If the column has no numeric value of its own in
+                            this row or the value does not fit its type
+        """
+        if column not in self._row_fields and len(self.rows) != 1:
+            raise CPKFormatError(f"@UTF table {self.name}: column {column} is shared by every row")
+        position, column_type, code = self._field(column, row)
+        if column_type in (TYPE_STRING, TYPE_DATA):
+            raise CPKFormatError(f"@UTF table {self.name}: column {column} is not numeric")
+        try:
+            struct.pack_into('>' + code, self._data, position, value)
+        except struct.error:
+            raise CPKFormatError(f"@UTF table {self.name}: {value} does not fit column {column}") from None
+        self.rows[row][column] = value
+
+    def data_range(self, column, row=0):
+        """(offset, size) of a data value in the parsed buffer"""
+        position, column_type, _code = self._field(column, row)
+        if column_type != TYPE_DATA:
+            raise CPKFormatError(f"@UTF table {self.name}: column {column} is not a data column")
+        offset, size = struct.unpack_from('>II', self._data, position)
+        return self._data_offset + offset, size
+
+def read_utf_packet(data, offset, magic):
+    """
+    Parse the @UTF table of a CPK chunk ("CPK ", "TOC ", "ITOC", ...).
+
+    Chunks are a 16-byte header (magic, flags, packet size) followed by the
+    table, which may be masked.
+    """
+    if bytes(data[offset:offset + 4]) != magic:
+        raise CPKFormatError(f"{magic.decode().strip()} chunk expected at offset 0x{offset:x}")
+    packet_size = struct.unpack_from('<Q', data, offset + 8)[0]
+    packet = data[offset + 16:offset + 16 + packet_size]
+    if bytes(packet[:4]) != UTF_MAGIC:
+        packet = unmask_utf(packet)
+    return UTFTable(packet)
+
+# ============================================================================
+# CRILAYLA Decompression
+# ============================================================================
+
+CRILAYLA_MAGIC = b'CRILAYLA'
+CRILAYLA_HEADER_SIZE = 0x100  # Uncompressed prefix stored after the compressed data
+
+def is_crilayla(data):
+    return bytes(data[:8]) == CRILAYLA_MAGIC
+
+# Bit reader word: 8 bytes of the reversed stream per refill
+_BIT_WORD = struct.Struct('>Q')
+
+def decompress_crilayla(data):
+    """
+    Decompress a CRILAYLA stream.
+
+    The compressed bits are read backwards from the end of the stream and
+    fill the output from its end; the first 0x100 output bytes are stored
+    uncompressed after the compressed data.
+
+    The stream is reversed once so bits can be pulled 64 at a time into a
+    bit pool, and back-references are copied as slices into the
+    preallocated output instead of byte by byte.
+    """
+    if not is_crilayla(data):
+        raise CPKFormatError("Not CRILAYLA compressed data")
+    uncompressed_size, header_offset = struct.unpack_from('<II', data, 8)
+    prefix_start = 0x10 + header_offset
+    if prefix_start + CRILAYLA_HEADER_SIZE > len(data):
+        raise CPKFormatError("Truncated CRILAYLA data")
+
+    output = bytearray(CRILAYLA_HEADER_SIZE + uncompressed_size)
+    output[:CRILAYLA_HEADER_SIZE] = data[prefix_start:prefix_start + CRILAYLA_HEADER_SIZE]
+
+    # Reversed stream, padded because refills read ahead of the last token
+    stream = memoryview(bytes(data[0x10:prefix_start])[::-1] + bytes(2 * _BIT_WORD.size))
+    stream_bits = header_offset * 8
+    unpack_word = _BIT_WORD.unpack_from
+
+    pool = 0     # Unconsumed bits are the low `bits` bits of pool
+    bits = 0
+    position = 0
+    write = len(output) - 1
+    end = CRILAYLA_HEADER_SIZE - 1
+    try:
+        while write > end:
+            if bits < 32:  # A token without length extension needs at most 32 bits
+                pool = ((pool & ((1 << bits) - 1)) << 64) | unpack_word(stream, position)[0]
+                position += 8
+                bits += 64
+
+            # Flag bit and literal byte (or the start of the distance) in one read
+            token = (pool >> (bits - 9)) & 0x1FF
+            if token < 0x100:
+                bits -= 9
+                output[write] = token
+                write -= 1
+                continue
+
+            bits -= 14
+            distance = ((pool >> bits) & 0x1FFF) + 3
+            bits -= 2
+            level = (pool >> bits) & 0x3
+            length = 3 + level
+            if level == 0x3:
+                bits -= 3
+                level = (pool >> bits) & 0x7
+                length += level
+                if level == 0x7:
+                    bits -= 5
+                    level = (pool >> bits) & 0x1F
+                    length += level
+                    if level == 0x1F:
+                        level = 0xFF
+                        while level == 0xFF:
+                            if bits < 8:
+                                pool = ((pool & ((1 << bits) - 1)) << 64) | unpack_word(stream, position)[0]
+                                position += 8
+                                bits += 64
+                            bits -= 8
+                            level = (pool >> bits) & 0xFF
+                            length += level
+
+            source = write + distance
+            start = write - length + 1
+            if start <= end or source >= len(output):
+                raise CPKFormatError("Corrupt CRILAYLA data")
+            if distance >= length:
+                output[start:write + 1] = output[source - length + 1:source + 1]
+            else:
+                # Overlapping copy repeats the `distance` bytes above write
+                output[start:write + 1] = (output[write + 1:source + 1] * (length // distance + 1))[-length:]
+            write = start - 1
+    except struct.error:
+        raise CPKFormatError("Truncated CRILAYLA data") from None
+
+    if position * 8 - bits > stream_bits:
+        raise CPKFormatError("Truncated CRILAYLA data")
+    return bytes(output)
+
+def decode_entry(data, position, encrypted, compressed, extract_size):
+    """Decompress the stored bytes of an entry if they are CRILAYLA compressed (see MappedArchive.decode)"""
+    if compressed and is_crilayla(data):
+        data = decompress_crilayla(data)
+    return data
+
+# ============================================================================
+# CPK Archives
+# ============================================================================
+
+class CPKEntry:
+    """One file of a CPK archive"""
+    __slots__ = ('dir_name', 'file_name', 'id', 'offset', 'size', 'extract_size')
+
+    def __init__(self, dir_name, file_name, entry_id, offset, size, extract_size):
+        self.dir_name = dir_name
+        self.file_name = file_name
+        self.id = entry_id
+        self.offset = offset              # Absolute offset in the archive
+        self.size = size                  # Stored (possibly compressed) size
+        self.extract_size = extract_size  # Size after decompression
+
+    @property
+    def path(self):
+        """Path inside the archive with '/' separators"""
+        return f"{self.dir_name}/{self.file_name}" if self.dir_name else self.file_name
+
+    @property
+    def compressed(self):
+        return self.size != self.extract_size
+
+    def __repr__(self):
+        return f"CPKEntry({self.path!r}, offset=0x{self.offset:x}, size={self.size}, extract_size={self.extract_size})"
+
+class CPKArchive(MappedArchive):
+    """Read-only, memory-mapped CPK archive (see MappedArchive); reads TOC and ITOC archives"""
+    format_name = "CPK"
+    format_error = CPKFormatError
+    decode = staticmethod(decode_entry)
+
+    # ============================================================================
+    # Table of Contents
+    # ============================================================================
+
+    def _read_tables(self):
+        self.header = read_utf_packet(self._map, 0, b'CPK ')
+        self.entries = self._read_entries()
+
+    def _read_entries(self):
+        toc_offset = self.header.get('TocOffset')
+        content_offset = self.header.get('ContentOffset')
+        if toc_offset:
+            return self._read_toc(toc_offset, content_offset)
+        itoc_offset = self.header.get('ItocOffset')
+        if itoc_offset:
+            return self._read_itoc(itoc_offset, content_offset or 0)
+        raise CPKFormatError("CPK archive has neither TOC nor ITOC")
+
+    def _read_toc(self, toc_offset, content_offset):
+        toc = read_utf_packet(self._map, toc_offset, b'TOC ')
+        # TOC file offsets are relative to the start of the TOC or content
+        # area, whichever comes first (same rule as CriPakTools/YACpkTool)
+        base = min(toc_offset, 0x800)
+        if content_offset:
+            base = min(base, content_offset)
+        entries = []
+        for index, row in enumerate(toc.rows):
+            entries.append(CPKEntry(
+                row.get('DirName') or '',
+                row.get('FileName') or f"{index:05d}",
+                row.get('ID', index),
+                base + row['FileOffset'],
+                row['FileSize'],
+                row.get('ExtractSize') or row['FileSize'],
+            ))
+        return entries
+
+    def _read_itoc(self, itoc_offset, content_offset):
+        """ID-only archives: files are stored in ID order, aligned to Align"""
+        itoc = read_utf_packet(self._map, itoc_offset, b'ITOC')
+        files = {}
+        for column in ('DataL', 'DataH'):
+            blob = itoc.get(column)
+            if blob:
+                for row in UTFTable(blob).rows:
+                    files[row['ID']] = (row['FileSize'], row.get('ExtractSize') or row['FileSize'])
+
+        align = self.header.get('Align') or 1
+        offset = content_offset
+        entries = []
+        for entry_id in sorted(files):
+            size, extract_size = files[entry_id]
+            entries.append(CPKEntry('', f"{entry_id:05d}", entry_id, offset, size, extract_size))
+            offset += (size + align - 1) // align * align
+        return entries
+
+    # ============================================================================
+    # Raw Access
+    # ============================================================================
+
+    def read_span(self, start, end=None):
+        """Raw bytes of the archive file from start to end (default: end of file)"""
+        return self._map[start:end]
@@ -1,116 +1,127 @@
 import os
-import subprocess
-import sys
-import signal
-import atexit
-
-# Import for Windows-specific subprocess flags
-if sys.platform == 'win32':
-    CREATE_NO_WINDOW = subprocess.CREATE_NO_WINDOW
-else:
-    CREATE_NO_WINDOW = 0
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QLineEdit, QFileDialog, QProgressBar, QMessageBox, QGroupBox
+    QLineEdit, QFileDialog, QProgressBar, QMessageBox, QGroupBox, QCheckBox
 )
 from PyQt6.QtCore import QThread, pyqtSignal
 
-# Import path utilities from main application
-try:
-    from DSTSToolGUIV2 import get_tools_path
-except ImportError:
-    # Fallback for standalone usage
-    def get_tools_path():
-        return os.path.join(os.path.dirname(os.path.abspath(__file__)), "Tools")
+import CPKBatch
+from AppPaths import get_tool_working_dir
+from ProcessRunner import ProcessRunner, install_signal_handlers
+from ToolProgress import run_with_progress, format_status, format_summary
 
-# Global list to track running processes
-running_processes = []
+# Terminate running tools when the application is interrupted
+install_signal_handlers()
 
-def cleanup_processes():
-    """Cleanup function to terminate all running processes when application exits"""
-    for process in running_processes[:]:  # Copy list to avoid modification during iteration
-        try:
-            if process.poll() is None:  # Process is still running
-                process.terminate()
-                # Wait a bit for graceful termination
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    # Force kill if it doesn't terminate gracefully
-                    process.kill()
-                    process.wait()
-            running_processes.remove(process)
-        except Exception:
-            pass
-
-# Register cleanup function
-atexit.register(cleanup_processes)
-
-# Handle application exit signals
-def signal_handler(signum, frame):
-    cleanup_processes()
-    sys.exit(0)
-
-signal.signal(signal.SIGTERM, signal_handler)
-signal.signal(signal.SIGINT, signal_handler)
+# Seconds between progress updates
+PROGRESS_INTERVAL = 0.25
 
 class WorkerThread(QThread):
     progress_signal = pyqtSignal(int)
+    status_signal = pyqtSignal(str)
     finished_signal = pyqtSignal(bool, str)
 
-    def __init__(self, command):
+    def __init__(self, command, tracker):
         super().__init__()
         self.command = command
+        self.tracker = tracker
+        self.runner = None
+        self.cancel_requested = False
 
     def run(self):
-        process = None
         try:
             self.progress_signal.emit(5)  # Starting process
-            import time
-            start_time = time.time()
-            estimated_duration = 4.0  # Assume 4 seconds for CPK operations
-
-            # Use subprocess.Popen without capturing output to avoid console handle issues
-            # but still allow monitoring of the process
-            process = subprocess.Popen(
-                self.command,
-                cwd=os.path.dirname(sys.executable) if hasattr(sys, '_MEIPASS') else None,
-                creationflags=CREATE_NO_WINDOW
-            )
-
-            # Add process to global tracking list
-            running_processes.append(process)
+            self.runner = ProcessRunner(self.command, cwd=get_tool_working_dir(), merge_stderr=True)
+            if self.cancel_requested:
+                self.runner.cancel()  # Cancelled before the runner existed; it will not start
 
             self.progress_signal.emit(15)  # Process started
+            snapshot = run_with_progress(self.runner, self.tracker, self._report_progress, PROGRESS_INTERVAL)
+            rc = self.runner.returncode
 
-            # Monitor process with time-based progress updates
-            while True:
-                if process.poll() is not None:
-                    break
+            self.progress_signal.emit(100)
+            self.status_signal.emit("")
+            if self.runner.cancelled:
+                self.finished_signal.emit(False, "Cancelled")
+            elif rc == 0:
+                self.finished_signal.emit(True, f"Completed successfully - {format_summary(snapshot)}")
+            else:
+                self.finished_signal.emit(False, f"Error: Exit code {rc}")
+        except Exception as e:
+            self.progress_signal.emit(100)
+            self.finished_signal.emit(False, f"Error: {str(e)}")
 
-                # Calculate progress based on elapsed time
-                elapsed = time.time() - start_time
-                time_progress = min(80, int((elapsed / estimated_duration) * 80))
-                self.progress_signal.emit(15 + time_progress)
+    def _report_progress(self, snapshot):
+        """Map tool progress to 15% - 95%"""
+        if snapshot['fraction'] is not None:
+            self.progress_signal.emit(15 + int(snapshot['fraction'] * 80))
+        self.status_signal.emit(format_status(snapshot))
+
+    def cancel(self):
+        """Kill the running tool"""
+        self.cancel_requested = True
+        if self.runner:
+            self.runner.cancel()
+
+def describe_extract(result):
+    """Completion state and message of CPKBatch.extract_native"""
+    summary = format_summary(result['snapshot'])
+    if result['total'] == 0:
+        return False, "No files in the archive match the selected patterns"
+    if result['failures']:
+        report = "\n".join(f"- {path}: {message}" for path, message in result['failures'][:10])
+        return False, f"Completed with errors - {summary}\n\n{report}"
+    return True, f"Completed successfully - {summary}"
+
+def describe_patch(result):
+    """Completion state and message of CPKBatch.patch_cpk"""
+    if result['error']:
+        return False, result['error']
+    summary = (f"{result['replaced']} replaced, {result['copied']} copied unchanged - "
+               f"{format_summary(result['snapshot'])}")
+    if result['failures']:
+        report = "\n".join(f"- {path}: {message}" for path, message in result['failures'][:10])
+        return False, f"Patched with skipped files - {summary}\n\n{report}"
+    return True, f"Patched successfully - {summary}"
+
+class NativeThread(QThread):
+    """Run a built-in CPK operation; same signals as WorkerThread"""
+    progress_signal = pyqtSignal(int)
+    status_signal = pyqtSignal(str)
+    finished_signal = pyqtSignal(bool, str)
 
-                time.sleep(0.1)  # Small delay to prevent CPU overuse
+    def __init__(self, task, describe, *args):
+        super().__init__()
+        self.task = task
+        self.describe = describe
+        self.args = args
+        self.cancelled = False
 
-            rc = process.poll()
-            self.progress_signal.emit(95)  # Almost done
+    def run(self):
+        try:
+            self.progress_signal.emit(5)  # Reading archive tables
+            result = self.task(*self.args, on_progress=self._report_progress,
+                               is_cancelled=lambda: self.cancelled)
 
-            if rc == 0:
-                self.progress_signal.emit(100)
-                self.finished_signal.emit(True, "Completed successfully")
+            self.progress_signal.emit(100)
+            self.status_signal.emit("")
+            if result['cancelled']:
+                self.finished_signal.emit(False, "Cancelled")
             else:
-                self.progress_signal.emit(100)
-                self.finished_signal.emit(False, f"Error: Exit code {rc}")
+                self.finished_signal.emit(*self.describe(result))
         except Exception as e:
             self.progress_signal.emit(100)
             self.finished_signal.emit(False, f"Error: {str(e)}")
-        finally:
-            # Remove process from tracking list when done
-            if process and process in running_processes:
-                running_processes.remove(process)
+
+    def _report_progress(self, snapshot):
+        """Map operation progress to 5% - 95%"""
+        if snapshot['fraction'] is not None:
+            self.progress_signal.emit(5 + int(snapshot['fraction'] * 90))
+        self.status_signal.emit(format_status(snapshot))
+
+    def cancel(self):
+        """Stop before the next file"""
+        self.cancelled = True
 
 class CPKTool(QWidget):
     """
@@ -118,8 +129,11 @@ class CPKTool(QWidget):
 
     Features:
     - Extract CPK files to individual files
+    - Built-in CPK reader: list contents and extract glob-selected files without YACpkTool,
+      reading the archive sequentially and decompressing on all CPU cores
     - Repack individual files back into CPK format
-    - Progress monitoring with real-time updates
+    - Patch mode: copy an original CPK with only the changed files replaced (no full repack)
+    - Progress monitoring with real-time updates and a Cancel button
     - Process management for clean application exit
     - Uses YACpkTool for high-quality CPK operations
     """
@@ -188,6 +202,30 @@ class CPKTool(QWidget):
 
         extract_layout.addLayout(extract_output_layout)
 
+        # File selection (built-in reader only)
+        extract_files_layout = QHBoxLayout()
+        extract_files_label = QLabel("Files:")
+        extract_files_label.setStyleSheet("font-weight: bold; color: #495057;")
+        extract_files_layout.addWidget(extract_files_label)
+
+        self.extract_files_edit = QLineEdit()
+        self.extract_files_edit.setPlaceholderText("Glob patterns, e.g. *.mbe; images/*.img (empty = all files)")
+        self.extract_files_edit.setToolTip("Only extract files whose path in the archive matches one of these patterns")
+        extract_files_layout.addWidget(self.extract_files_edit)
+
+        list_files_btn = QPushButton("📋 List Files")
+        list_files_btn.setToolTip("Show the files of the CPK (matching the patterns) without extracting")
+        list_files_btn.clicked.connect(self.list_files)
+        extract_files_layout.addWidget(list_files_btn)
+
+        extract_layout.addLayout(extract_files_layout)
+
+        self.native_check = QCheckBox("Use built-in reader")
+        self.native_check.setChecked(True)
+        self.native_check.setToolTip("Read the CPK directly instead of running YACpkTool (needed for file patterns)")
+        self.native_check.toggled.connect(self.extract_files_edit.setEnabled)
+        extract_layout.addWidget(self.native_check)
+
         extract_btn = QPushButton("🚀 Extract Files")
         extract_btn.setToolTip("Start extracting files from CPK")
         extract_btn.clicked.connect(self.extract_files)
@@ -253,6 +291,26 @@ class CPKTool(QWidget):
 
         repack_layout.addLayout(repack_output_layout)
 
+        # Original CPK selection (patch mode)
+        repack_original_layout = QHBoxLayout()
+        repack_original_label = QLabel("Original CPK:")
+        repack_original_label.setStyleSheet("font-weight: bold; color: #495057;")
+        repack_original_layout.addWidget(repack_original_label)
+
+        self.repack_original_edit = QLineEdit()
+        self.repack_original_edit.setPlaceholderText("Optional: patch this CPK with the changed files only...")
+        self.repack_original_edit.setToolTip("When set, the source directory only needs the changed files: "
+                                             "they replace the matching files of this CPK and everything "
+                                             "else is copied unchanged")
+        repack_original_layout.addWidget(self.repack_original_edit)
+
+        repack_original_btn = QPushButton("📄 Browse")
+        repack_original_btn.setToolTip("Select the original CPK file")
+        repack_original_btn.clicked.connect(self.select_repack_original)
+        repack_original_layout.addWidget(repack_original_btn)
+
+        repack_layout.addLayout(repack_original_layout)
+
         repack_btn = QPushButton("🔧 Repack Files")
         repack_btn.setToolTip("Start packing files into CPK")
         repack_btn.clicked.connect(self.repack_files)
@@ -261,6 +319,18 @@ class CPKTool(QWidget):
         repack_group.setLayout(repack_layout)
         layout.addWidget(repack_group)
 
+        # Cancel (shared by all operations)
+        cancel_layout = QHBoxLayout()
+        cancel_layout.addStretch()
+
+        self.cancel_btn = QPushButton("⏹️ Cancel")
+        self.cancel_btn.setToolTip("Stop the running operation")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_operation)
+        cancel_layout.addWidget(self.cancel_btn)
+
+        layout.addLayout(cancel_layout)
+
         # Progress bar - compact
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
@@ -298,6 +368,12 @@ class CPKTool(QWidget):
         if file_path:
             self.repack_output_edit.setText(file_path)
 
+    def select_repack_original(self):
+        """Select the original CPK file for patch mode"""
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select original CPK file", "", "CPK files (*.cpk);;All files (*)")
+        if file_path:
+            self.repack_original_edit.setText(file_path)
+
     # ============================================================================
     # Main Processing Methods
     # ============================================================================
@@ -310,19 +386,37 @@ class CPKTool(QWidget):
             QMessageBox.warning(self, "Warning", "Please select input CPK file and output directory")
             return
 
-        # Check if YACpkTool.exe exists
-        yacpktool_path = os.path.join(get_tools_path(), "YACpkTool", "YACpkTool.exe")
-        if not os.path.exists(yacpktool_path):
-            QMessageBox.critical(self, "Error", f"YACpkTool.exe not found at {yacpktool_path}")
+        if self.native_check.isChecked():
+            patterns = CPKBatch.parse_patterns(self.extract_files_edit.text())
+            self.start_worker(NativeThread(CPKBatch.extract_native, describe_extract, input_file, output_dir, patterns))
             return
 
-        # Create output directory if it doesn't exist
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Execute extract command: YACpkTool.exe <INPUT_CPK> <OUT_FOLDER>
-        command = [yacpktool_path, input_file, output_dir]
+        try:
+            command = CPKBatch.extract_command(input_file, output_dir)
+        except FileNotFoundError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
         self.run_command(command)
 
+    def list_files(self):
+        """Show the archive's files matching the patterns"""
+        input_file = self.extract_input_edit.text()
+        if not input_file:
+            QMessageBox.warning(self, "Warning", "Please select input CPK file")
+            return
+
+        try:
+            entries = CPKBatch.list_entries(input_file, CPKBatch.parse_patterns(self.extract_files_edit.text()))
+        except (OSError, CPKBatch.CPKFormatError) as e:
+            QMessageBox.critical(self, "Error", f"Cannot read CPK file: {str(e)}")
+            return
+
+        box = QMessageBox(self)
+        box.setWindowTitle("CPK Contents")
+        box.setText(f"{len(entries)} file(s) in {os.path.basename(input_file)}")
+        box.setDetailedText(CPKBatch.format_listing(entries))
+        box.exec()
+
     def repack_files(self):
         """Repack files into CPK archive"""
         input_dir = self.repack_input_edit.text()
@@ -331,19 +425,16 @@ class CPKTool(QWidget):
             QMessageBox.warning(self, "Warning", "Please select input directory and output CPK file")
             return
 
-        # Check if YACpkTool.exe exists
-        yacpktool_path = os.path.join(get_tools_path(), "YACpkTool", "YACpkTool.exe")
-        if not os.path.exists(yacpktool_path):
-            QMessageBox.critical(self, "Error", f"YACpkTool.exe not found at {yacpktool_path}")
+        original_file = self.repack_original_edit.text()
+        if original_file:
+            self.start_worker(NativeThread(CPKBatch.patch_cpk, describe_patch, original_file, input_dir, output_file))
             return
 
-        # Create output directory if it doesn't exist
-        output_dir = os.path.dirname(output_file)
-        if output_dir:
-            os.makedirs(output_dir, exist_ok=True)
-
-        # Execute repack command: YACpkTool.exe <IN_FOLDER> <OUT_CPK_FILE>
-        command = [yacpktool_path, input_dir, output_file]
+        try:
+            command = CPKBatch.repack_command(input_dir, output_file)
+        except FileNotFoundError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
         self.run_command(command)
 
 
@@ -353,12 +444,23 @@ class CPKTool(QWidget):
 
     def run_command(self, command):
         """Execute command in worker thread with progress monitoring"""
+        self.start_worker(WorkerThread(command, CPKBatch.make_progress_tracker(command)))
+
+    def start_worker(self, worker):
+        """Connect a worker's signals and start it"""
         self.progress_bar.setValue(0)
-        self.worker = WorkerThread(command)
+        self.cancel_btn.setEnabled(True)
+        self.worker = worker
         self.worker.progress_signal.connect(self.update_progress)
+        self.worker.status_signal.connect(self.update_status)
         self.worker.finished_signal.connect(self.command_finished)
         self.worker.start()
 
+    def cancel_operation(self):
+        """Kill the running tool or stop the built-in operation before its next file"""
+        self.cancel_btn.setEnabled(False)
+        self.worker.cancel()
+
     # ============================================================================
     # Progress and UI Update Methods
     # ============================================================================
@@ -367,8 +469,13 @@ class CPKTool(QWidget):
         """Update progress bar value"""
         self.progress_bar.setValue(value)
 
+    def update_status(self, status):
+        """Show entries, bytes and ETA next to the percentage"""
+        self.progress_bar.setFormat(f"%p% - {status}" if status else "%p%")
+
     def command_finished(self, success, message):
         """Handle command completion with user notification"""
+        self.cancel_btn.setEnabled(False)
         self.progress_bar.setValue(100)
         if success:
             QMessageBox.information(self, "Success", message)
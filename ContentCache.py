@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+
+# Default size limit for each cache
+DEFAULT_CACHE_LIMIT = 2 * 1024 * 1024 * 1024  # 2 GiB
+
+def get_cache_root():
+    """Get the per-user cache directory for DSTSTools"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(r"~\AppData\Local")
+        return os.path.join(base, "DSTSTools", "Cache")
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser("~/.cache")
+    return os.path.join(base, "dststools")
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def file_state(path, recorded=None):
+    """
+    Return [size, mtime_ns, sha256] for a file.
+
+    The hash is reused from `recorded` when size and mtime are unchanged,
+    so unchanged files are never re-read.
+    """
+    stat = os.stat(path)
+    if recorded and recorded[0] == stat.st_size and recorded[1] == stat.st_mtime_ns:
+        return list(recorded)
+    return [stat.st_size, stat.st_mtime_ns, hash_file(path)]
+
+# ============================================================================
+# JSON Manifests
+# ============================================================================
+
+MANIFEST_VERSION = 1
+
+def load_manifest(path):
+    """Entries of a JSON manifest, or {} if it is missing, unreadable or of another version"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('entries') or {}
+
+def save_manifest(path, entries):
+    """Write the entries of a JSON manifest atomically"""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'entries': entries}, f, indent=1, sort_keys=True,
+                  ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def _tree_size(path):
+    """Total size of all files below path (or of path itself if it is a file)"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def _copy_if_changed(source, destination):
+    """Copy a file unless destination already has the same size and mtime"""
+    try:
+        src_stat = os.stat(source)
+        dst_stat = os.stat(destination)
+        if src_stat.st_size == dst_stat.st_size and src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+            return False
+    except OSError:
+        pass
+    shutil.copy2(source, destination)
+    return True
+
+class ContentCache:
+    """
+    Content-addressed cache of conversion outputs with LRU eviction.
+
+    Each entry is a directory under <cache_dir>/entries/ named after a key
+    derived from the source content hash. index.json tracks entry sizes and
+    last-use times; the least recently used entries are evicted once the
+    total size exceeds max_bytes.
+
+    The index is not safe for concurrent writers - use one ContentCache per
+    batch in the coordinating process only.
+    """
+    def __init__(self, name, max_bytes=DEFAULT_CACHE_LIMIT, cache_root=None):
+        self.cache_dir = os.path.join(cache_root or get_cache_root(), name)
+        self.entries_dir = os.path.join(self.cache_dir, "entries")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.max_bytes = max_bytes
+        self.index = {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f).get('entries', {})
+        except (OSError, ValueError):
+            pass  # Missing or unreadable index - start empty
+
+    # ============================================================================
+    # Keys and Lookup
+    # ============================================================================
+
+    @staticmethod
+    def make_key(content_hash, *params):
+        """Combine a source content hash with conversion parameters into a cache key"""
+        return hashlib.sha256("\0".join([content_hash] + [str(p) for p in params]).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.entries_dir, key[:2], key)
+
+    def contains(self, key):
+        """Check whether key is cached"""
+        return key in self.index and os.path.isdir(self._entry_path(key))
+
+    def entry_size(self, key):
+        """Size in bytes of a cached entry"""
+        return self.index.get(key, {}).get('size', 0)
+
+    # ============================================================================
+    # Store and Restore
+    # ============================================================================
+
+    def store(self, key, source_path, metadata=None, files=None):
+        """
+        Copy a file or directory tree into the cache under key.
+
+        A missing source_path stores an empty entry (e.g. a conversion that
+        legitimately produced no output).
+
+        Args:
+            files: Paths relative to the source directory to store instead
+                   of the whole tree, so files the conversion did not write
+                   (stale or user files) are left out
+
+        Raises:
+            OSError: If a listed file is missing; nothing is stored then
+        """
+        entry_path = self._entry_path(key)
+        temp_path = entry_path + f".tmp{os.getpid()}"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+
+        try:
+            if files is not None:
+                for relative in files:
+                    destination = os.path.join(temp_path, relative)
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    shutil.copy2(os.path.join(source_path, relative), destination)
+            elif os.path.isdir(source_path):
+                shutil.copytree(source_path, temp_path, dirs_exist_ok=True)
+            elif os.path.isfile(source_path):
+                shutil.copy2(source_path, os.path.join(temp_path, os.path.basename(source_path)))
+        except OSError:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+
+        shutil.rmtree(entry_path, ignore_errors=True)
+        os.replace(temp_path, entry_path)
+        self.index[key] = {
+            'size': _tree_size(entry_path),
+            'last_used': time.time(),
+            'metadata': metadata or {},
+        }
+
+    def restore(self, key, destination_dir):
+        """
+        Copy a cached entry into destination_dir.
+
+        Files that already match (same size and mtime) are kept untouched.
+
+        Returns:
+            int: Number of files actually copied
+        """
+        entry_path = self._entry_path(key)
+        copied = 0
+        for root, _, files in os.walk(entry_path):
+            relative = os.path.relpath(root, entry_path)
+            target_root = os.path.normpath(os.path.join(destination_dir, relative))
+            if files:
+                os.makedirs(target_root, exist_ok=True)
+            for name in files:
+                if _copy_if_changed(os.path.join(root, name), os.path.join(target_root, name)):
+                    copied += 1
+        self.index[key]['last_used'] = time.time()
+        return copied
+
+    def restore_file(self, key, destination_path):
+        """
+        Copy the single file of an entry stored from a file to destination_path.
+
+        Unlike restore() the file may be restored under a different name, so
+        outputs can be shared by sources with the same content.
+
+        Returns:
+            bool: True if the file was copied, False if it already matched
+        """
+        entry_path = self._entry_path(key)
+        cached_file = os.path.join(entry_path, os.listdir(entry_path)[0])
+        copied = _copy_if_changed(cached_file, destination_path)
+        self.index[key]['last_used'] = time.time()
+        return copied
+
+    def metadata(self, key):
+        """Metadata stored alongside an entry"""
+        return self.index.get(key, {}).get('metadata', {})
+
+    # ============================================================================
+    # Maintenance
+    # ============================================================================
+
+    def total_size(self):
+        """Total size of all cached entries in bytes"""
+        return sum(entry.get('size', 0) for entry in self.index.values())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        total = self.total_size()
+        evicted = 0
+        for key in sorted(self.index, key=lambda k: self.index[k].get('last_used', 0)):
+            if total <= self.max_bytes:
+                break
+            total -= self.index[key].get('size', 0)
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            del self.index[key]
+            evicted += 1
+        return evicted
+
+    def save(self):
+        """Evict over-limit entries and write the index atomically"""
+        self.evict()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self.index_path + f".tmp{os.getpid()}"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'entries': self.index}, f)
+        os.replace(temp_path, self.index_path)
+
+    def clear(self):
+        """
+        Delete every cached entry.
+
+        Returns:
+            int: Number of bytes freed
+        """
+        freed = _tree_size(self.cache_dir) if os.path.isdir(self.cache_dir) else 0
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self.index = {}
+        return freed
@@ -1,6 +1,7 @@
 import sys
 import os
 import webbrowser
+import multiprocessing
 from PyQt6.QtWidgets import QApplication, QMainWindow, QTabWidget, QMenuBar, QMenu, QMessageBox
 from PyQt6.QtGui import QIcon, QAction
 
@@ -9,29 +10,7 @@ from MBETool import MBETool
 from TEXTTool import TEXTTool
 from IMGTool import IMGTool
 from CPKTool import CPKTool
-
-def get_application_path():
-    """
-    Get the correct application path whether running as script or executable.
-
-    Returns:
-        str: Path to the application directory
-    """
-    if getattr(sys, 'frozen', False):
-        # Running as PyInstaller executable
-        return os.path.dirname(sys.executable)
-    else:
-        # Running as Python script
-        return os.path.dirname(os.path.abspath(__file__))
-
-def get_tools_path():
-    """
-    Get the correct Tools directory path.
-
-    Returns:
-        str: Path to the Tools directory
-    """
-    return os.path.join(get_application_path(), "Tools")
+from AppPaths import get_application_path, get_tools_path
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -130,4 +109,6 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Required for process pools in PyInstaller builds
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,557 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait,
+                                FIRST_COMPLETED)
+
+import DDSDecoder
+from AppPaths import get_compressonator_path
+from ContentCache import ContentCache, DEFAULT_CACHE_LIMIT, hash_file
+from ProcessRunner import ProcessRunner
+from ToolProgress import ProgressTracker, CompressonatorParser, run_with_progress, format_duration
+
+# Encoder threads given to each compressonatorcli process for BC7 (-NumThreads)
+ENCODE_THREADS_PER_PROCESS = 4
+# DDS to PNG decoding is effectively single threaded
+DECODE_THREADS_PER_PROCESS = 1
+
+def _noop(*args):
+    pass
+
+def _new_result(total=0):
+    return {'processed': 0, 'total': total, 'failures': [], 'error': None, 'cancelled': False, 'elapsed': 0.0}
+
+# ============================================================================
+# Compressonator Process Pool
+# ============================================================================
+
+def default_pool_size(threads_per_process=1):
+    """Number of concurrent compressonatorcli processes that fills every core once"""
+    return max(1, (os.cpu_count() or 1) // threads_per_process)
+
+class CompressonatorPool:
+    """
+    Bounded pool of concurrent compressonatorcli processes.
+
+    Without an explicit worker count the pool runs cores / threads_per_process
+    processes. With one, each process gets cores / workers threads instead, so
+    the machine is filled without oversubscribing it.
+
+    cancel() may be called from any thread: queued files are skipped and
+    running processes are killed.
+    """
+    def __init__(self, workers=None, threads_per_process=DECODE_THREADS_PER_PROCESS):
+        if workers:
+            self.workers = workers
+            self.threads_per_process = max(1, (os.cpu_count() or 1) // workers)
+        else:
+            self.workers = default_pool_size(threads_per_process)
+            self.threads_per_process = threads_per_process
+        self.cancelled = False
+        self._runners = set()
+        self._fractions = {}
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Skip queued files and kill running conversions"""
+        with self._lock:
+            self.cancelled = True
+            runners = list(self._runners)
+        for runner in runners:
+            runner.cancel()
+
+    def run(self, compressonator_path, jobs, on_result=None, on_progress=None):
+        """
+        Convert files concurrently.
+
+        Args:
+            compressonator_path: Path of compressonatorcli.exe
+            jobs: List of (name, args) tuples, args excluding the executable
+            on_result: Called as (name, returncode, stderr, elapsed) in completion order
+            on_progress: Called with the overall fraction (0-1), including
+                         the progress of files still being converted
+
+        Returns:
+            list: (name, returncode, stderr, elapsed) of every file that ran
+        """
+        on_result = on_result or _noop
+        on_progress = on_progress or _noop
+        total = len(jobs)
+        results = []
+
+        def report_progress():
+            with self._lock:
+                fraction = (len(results) + sum(self._fractions.values())) / total
+            on_progress(fraction)
+
+        def convert(name, args):
+            runner = ProcessRunner([compressonator_path] + args, cwd=os.path.dirname(compressonator_path),
+                                   capture=True)
+            with self._lock:
+                if self.cancelled:
+                    return None
+                self._runners.add(runner)
+                self._fractions[name] = 0.0
+
+            start_time = time.perf_counter()
+
+            def on_snapshot(snapshot):
+                if snapshot['fraction'] is not None:
+                    with self._lock:
+                        self._fractions[name] = snapshot['fraction']
+                    report_progress()
+
+            try:
+                run_with_progress(runner, ProgressTracker(CompressonatorParser()), on_snapshot)
+            finally:
+                with self._lock:
+                    self._runners.discard(runner)
+                    self._fractions.pop(name, None)
+            if runner.cancelled:
+                return None
+            return name, runner.returncode, "\n".join(runner.errors), time.perf_counter() - start_time
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, total) or 1) as executor:
+            futures = [executor.submit(convert, name, args) for name, args in jobs]
+            try:
+                for future in as_completed(futures):
+                    outcome = future.result()
+                    if outcome is None:
+                        continue  # Cancelled
+                    with self._lock:
+                        results.append(outcome)
+                    on_result(*outcome)
+                    report_progress()
+            except BaseException:
+                # Don't leave the executor waiting on queued files (e.g. Ctrl+C)
+                self.cancel()
+                raise
+        return results
+
+def _collect(result, pool, compressonator_path, jobs, describe, output, on_fraction, publish=None):
+    """
+    Run jobs on the pool and record successes and failures in result.
+
+    publish(name, elapsed) is called for every successful job to move its
+    output into place; an OSError from it counts as a failure.
+    """
+    def on_result(name, returncode, stderr, elapsed):
+        source_name, target_name = describe[name]
+        error = None if returncode == 0 else (stderr.strip() or f"Exit code {returncode}")
+        if error is None and publish:
+            try:
+                publish(name, elapsed)
+            except OSError as e:
+                error = str(e)
+        if error is None:
+            result['processed'] += 1
+            output(f"Converted: {source_name} → {target_name}")
+        else:
+            result['failures'].append((name, error))
+            output(f"Conversion error {source_name}: {error}")
+
+    pool.run(compressonator_path, jobs, on_result, on_fraction)
+    result['cancelled'] = pool.cancelled
+
+# ============================================================================
+# Native Decoding
+# ============================================================================
+
+def native_decoder_available():
+    """True if the built-in DDS decoder can run (it needs NumPy)"""
+    return DDSDecoder.np is not None
+
+def _decode_to_png(source_path, target_path):
+    """
+    Decode one IMG file to PNG (runs in a worker process).
+
+    Returns:
+        str: Why the built-in decoder cannot read the file, None on success
+    """
+    try:
+        DDSDecoder.convert_dds_to_png(source_path, target_path)
+    except DDSDecoder.DDSFormatError as e:
+        return str(e)
+    return None
+
+def _decode_native(result, pool, jobs, describe, output, on_fraction):
+    """
+    Decode jobs with the built-in decoder on pool.workers processes.
+
+    Returns:
+        list: (name, reason) of files in formats the decoder does not support
+    """
+    unsupported = []
+    done = 0
+
+    def record(name, reason, error):
+        nonlocal done
+        done += 1
+        source_name, target_name = describe[name]
+        if error is not None:
+            result['failures'].append((name, error))
+            output(f"Conversion error {source_name}: {error}")
+        elif reason is not None:
+            unsupported.append((name, reason))
+        else:
+            result['processed'] += 1
+            output(f"Converted: {source_name} → {target_name}")
+        on_fraction(done / len(jobs))
+
+    if pool.workers <= 1 or len(jobs) <= 1:
+        for name, args in jobs:
+            if pool.cancelled:
+                break
+            try:
+                record(name, _decode_to_png(*args), None)
+            except Exception as e:
+                record(name, None, str(e))
+        return unsupported
+
+    executor = ProcessPoolExecutor(max_workers=min(pool.workers, len(jobs)))
+    try:
+        futures = {executor.submit(_decode_to_png, *args): name for name, args in jobs}
+        pending = set(futures)
+        # Wake up regularly so cancel() skips the queued files promptly
+        while pending and not pool.cancelled:
+            finished, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+            for future in finished:
+                try:
+                    record(futures[future], future.result(), None)
+                except Exception as e:
+                    record(futures[future], None, str(e))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return unsupported
+
+# ============================================================================
+# IMG to PNG
+# ============================================================================
+
+# Decoder choices for IMG to PNG
+DECODER_AUTO = 'auto'                      # Built-in decoder, compressonator for unsupported files
+DECODER_NATIVE = 'native'                  # Built-in decoder only
+DECODER_COMPRESSONATOR = 'compressonator'  # compressonatorcli.exe only
+DECODERS = (DECODER_AUTO, DECODER_NATIVE, DECODER_COMPRESSONATOR)
+
+def _img_png_name(filename):
+    """Output name of an IMG file: the name without any .dds extension"""
+    return filename[:-4] if filename.lower().endswith('.dds') else filename
+
+def _compressonator_img_to_png(result, pool, compressonator_path, source, target, img_files, output,
+                               on_fraction):
+    """
+    Convert img_files with compressonatorcli.
+
+    The tool only reads files with a .dds extension, so each input is linked
+    into a scratch directory as <name>.dds; the source folder is never touched.
+    """
+    scratch = _make_scratch_dir(target)
+    try:
+        jobs = []
+        describe = {}
+        for img_file in img_files:
+            name = _img_png_name(img_file)
+            png_filename = name + '.png'
+            dds_path = os.path.join(scratch, name + '.dds')
+            _link_or_copy(os.path.join(source, img_file), dds_path)
+            jobs.append((name, [dds_path, os.path.join(scratch, png_filename)]))
+            describe[name] = (img_file, png_filename)
+
+        def publish(name, _elapsed):
+            png_filename = describe[name][1]
+            os.replace(os.path.join(scratch, png_filename), os.path.join(target, png_filename))
+
+        _collect(result, pool, compressonator_path, jobs, describe, output, on_fraction, publish)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def convert_img_to_png(source, target, progress=None, output=None, pool=None, decoder=DECODER_AUTO):
+    """
+    Convert IMG (DDS without extension) files to PNG.
+
+    The built-in decoder reads BC1-BC5/BC7 and uncompressed textures without
+    any external tool; compressonatorcli handles everything else.
+
+    Args:
+        source: Directory containing IMG files
+        target: Directory for PNG files
+        progress: Called with a percentage (0-100)
+        output: Called with one log line per converted or failed file
+        pool: CompressonatorPool to run on (default: one process per core);
+              the built-in decoder uses as many worker processes
+        decoder: DECODER_AUTO, DECODER_NATIVE or DECODER_COMPRESSONATOR
+
+    Returns:
+        dict: 'processed', 'total', 'failures' [(name, message)], 'error'
+              (fatal error message or None), 'cancelled' and 'elapsed'
+    """
+    source = os.path.abspath(source)  # compressonatorcli runs in its own directory
+    target = os.path.abspath(target)
+    progress = progress or _noop
+    output = output or _noop
+    pool = pool or CompressonatorPool(threads_per_process=DECODE_THREADS_PER_PROCESS)
+    result = _new_result()
+    start_time = time.perf_counter()
+
+    native = decoder != DECODER_COMPRESSONATOR and native_decoder_available()
+    if decoder == DECODER_NATIVE and not native:
+        result['error'] = "The built-in decoder requires NumPy"
+        return result
+    compressonator_path = get_compressonator_path()
+    has_compressonator = os.path.exists(compressonator_path)
+    if not native and not has_compressonator:
+        result['error'] = f"compressonatorcli.exe not found at {compressonator_path}"
+        return result
+
+    progress(15)  # Tool verified, scanning files
+    img_files = sorted(f for f in os.listdir(source) if os.path.isfile(os.path.join(source, f)))
+    if not img_files:
+        result['error'] = "No IMG files found in source directory"
+        return result
+
+    result['total'] = len(img_files)
+    progress(35)  # Files found, starting conversion
+
+    def on_fraction(fraction):
+        progress(35 + int(fraction * 50))  # Progress from 35% to 85%
+
+    if not native:
+        _compressonator_img_to_png(result, pool, compressonator_path, source, target, img_files, output,
+                                   on_fraction)
+    else:
+        jobs = []
+        describe = {}
+        for img_file in img_files:
+            name = _img_png_name(img_file)
+            png_filename = name + '.png'
+            jobs.append((name, (os.path.join(source, img_file), os.path.join(target, png_filename))))
+            describe[name] = (img_file, png_filename)
+        unsupported = _decode_native(result, pool, jobs, describe, output, on_fraction)
+
+        if unsupported and decoder == DECODER_AUTO and has_compressonator and not pool.cancelled:
+            output(f"{len(unsupported)} file(s) need compressonatorcli")
+            fallback_files = [describe[name][0] for name, _reason in unsupported]
+            _compressonator_img_to_png(result, pool, compressonator_path, source, target, fallback_files,
+                                       output, _noop)
+        else:
+            for name, reason in unsupported:
+                result['failures'].append((name, reason))
+                output(f"Conversion error {describe[name][0]}: {reason}")
+
+    result['cancelled'] = pool.cancelled
+    progress(90)  # Conversion complete
+    result['elapsed'] = time.perf_counter() - start_time
+    return result
+
+# ============================================================================
+# PNG to IMG
+# ============================================================================
+
+# Encoder settings; each one is part of the texture cache key (None = tool default)
+ENCODE_FORMAT = "BC7"
+ENCODE_QUALITY = None
+ENCODE_MIP_LEVELS = None
+
+def encode_arguments(threads):
+    """compressonatorcli options for PNG to IMG, without input and output paths"""
+    args = ["-fd", ENCODE_FORMAT, "-NumThreads", str(threads)]
+    if ENCODE_QUALITY is not None:
+        args += ["-Quality", str(ENCODE_QUALITY)]
+    if ENCODE_MIP_LEVELS is not None:
+        args += ["-miplevels", str(ENCODE_MIP_LEVELS)]
+    return args
+
+def convert_png_to_img(source, target, progress=None, output=None, pool=None, cache=None):
+    """
+    Convert PNG files to IMG (BC7 compressed DDS without extension) using
+    Compressonator CLI.
+
+    Same arguments and result as convert_img_to_png; the default pool gives
+    each encoder ENCODE_THREADS_PER_PROCESS threads. Encoded files are
+    written to a scratch directory and moved into target without their
+    .dds extension, so other files in target are left alone.
+
+    With a cache (see open_encode_cache) PNGs whose content and encoder
+    settings were encoded before are restored instead of re-encoded; the
+    result then also has 'cache_hits' and 'cache_time_saved' (estimated
+    wall-clock seconds the hits would have taken to encode on this pool).
+    """
+    source = os.path.abspath(source)  # compressonatorcli runs in its own directory
+    target = os.path.abspath(target)
+    progress = progress or _noop
+    output = output or _noop
+    pool = pool or CompressonatorPool(threads_per_process=ENCODE_THREADS_PER_PROCESS)
+    result = _new_result()
+    start_time = time.perf_counter()
+
+    compressonator_path = get_compressonator_path()
+    if not os.path.exists(compressonator_path):
+        result['error'] = f"compressonatorcli.exe not found at {compressonator_path}"
+        return result
+
+    progress(15)  # Tool verified, scanning files
+    png_files = [f for f in os.listdir(source) if f.lower().endswith('.png')]
+    if not png_files:
+        result['error'] = "No PNG files found in source directory"
+        return result
+
+    result['total'] = len(png_files)
+    describe = {png_file: (png_file, png_file[:-4]) for png_file in png_files}  # Remove .png
+    keys = {}
+    if cache is not None:
+        png_files = _restore_cached(result, cache, compressonator_path, source, target, png_files, describe,
+                                    keys, output, pool.workers)
+    progress(20)  # Files found, starting conversion
+
+    scratch = _make_scratch_dir(target)
+    jobs = []
+    for png_file in png_files:
+        img_filename = describe[png_file][1]
+        jobs.append((png_file, encode_arguments(pool.threads_per_process) + [
+            os.path.join(source, png_file), os.path.join(scratch, img_filename + '.dds')]))
+
+    def publish(png_file, elapsed):
+        img_filename = describe[png_file][1]
+        img_path = os.path.join(target, img_filename)
+        os.replace(os.path.join(scratch, img_filename + '.dds'), img_path)
+        if png_file in keys:
+            cache.store(keys[png_file], img_path, {'source': png_file, 'encode_seconds': elapsed})
+
+    try:
+        if jobs:
+            _collect(result, pool, compressonator_path, jobs, describe, output,
+                     lambda fraction: progress(20 + int(fraction * 65)), publish)  # Progress from 20% to 85%
+    finally:
+        progress(90)  # Conversion complete, cleaning up
+        shutil.rmtree(scratch, ignore_errors=True)
+        if cache is not None:
+            cache.save()
+
+    result['elapsed'] = time.perf_counter() - start_time
+    return result
+
+# ============================================================================
+# Texture Cache
+# ============================================================================
+
+ENCODE_CACHE_NAME = "img_encode"
+# Bump when the encoded output for the same settings changes
+ENCODE_CACHE_VERSION = "img-encode-1"
+
+def open_encode_cache(max_bytes=DEFAULT_CACHE_LIMIT):
+    """Open the per-user PNG to IMG encoding cache"""
+    return ContentCache(ENCODE_CACHE_NAME, max_bytes)
+
+def clear_encode_cache():
+    """Delete the encoding cache and return the number of bytes freed"""
+    return open_encode_cache().clear()
+
+def _encoder_signature(compressonator_path):
+    """Identify the installed encoder, so a different compressonator version misses the cache"""
+    stat = os.stat(compressonator_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def _restore_cached(result, cache, compressonator_path, source, target, png_files, describe, keys, output,
+                    workers=1):
+    """
+    Restore already encoded PNGs from the cache and record the keys of the
+    others in keys. Entries that cannot be restored are encoded again.
+
+    The stored encode times are those of single encoder processes, so their
+    sum is divided by the number of encoders that would have run at once.
+
+    Returns:
+        list: PNG files that still need encoding
+    """
+    signature = _encoder_signature(compressonator_path)
+    pending = []
+    result['cache_hits'] = 0
+    encode_seconds = 0.0
+    for png_file in png_files:
+        try:
+            key = ContentCache.make_key(hash_file(os.path.join(source, png_file)), ENCODE_CACHE_VERSION,
+                                        ENCODE_FORMAT, ENCODE_QUALITY, ENCODE_MIP_LEVELS, signature)
+        except OSError:
+            pending.append(png_file)  # Let the encoder report the error
+            continue
+        if cache.contains(key):
+            img_filename = describe[png_file][1]
+            try:
+                cache.restore_file(key, os.path.join(target, img_filename))
+            except (OSError, IndexError):  # IndexError: entry directory is empty
+                keys[png_file] = key
+                pending.append(png_file)
+                continue
+            result['processed'] += 1
+            result['cache_hits'] += 1
+            encode_seconds += cache.metadata(key).get('encode_seconds', 0.0)
+            output(f"Cached: {png_file} → {img_filename}")
+        else:
+            keys[png_file] = key
+            pending.append(png_file)
+    result['cache_time_saved'] = encode_seconds / max(1, min(workers, result['cache_hits']))
+    return pending
+
+# ============================================================================
+# Reporting Helpers
+# ============================================================================
+
+def format_result(result, description, source_kind):
+    """
+    Format a conversion result as a single status message.
+
+    Args:
+        description: Conversion name, e.g. "IMG to PNG"
+        source_kind: Source format used in error hints, e.g. "DDS"
+    """
+    if result['error']:
+        return f"Error: {result['error']}"
+    if result['cancelled']:
+        return f"Cancelled after converting {result['processed']}/{result['total']} file {description}"
+    if result['processed'] == 0:
+        return f"Error: Could not convert any files. Check {source_kind} file format."
+    message = f"Conversion completed {result['processed']}/{result['total']} file {description}"
+    if 'cache_hits' in result:
+        message += "\n" + format_cache_summary(result)
+    return message
+
+def format_cache_summary(result):
+    """Format cache statistics as e.g. 'Cache: 40/42 hits (95%), saved ~3:10 of encoding'"""
+    hits, total = result['cache_hits'], result['total']
+    rate = 100.0 * hits / total if total else 0.0
+    return (f"Cache: {hits}/{total} hits ({rate:.0f}%), "
+            f"saved ~{format_duration(result['cache_time_saved'])} of encoding")
+
+# ============================================================================
+# Scratch Directory Helpers
+# ============================================================================
+
+# Prefix of the per-run scratch directories created inside the target directory
+SCRATCH_PREFIX = '.dststools-'
+
+def _make_scratch_dir(target):
+    """
+    Create a private scratch directory for one run.
+
+    It lives inside target so hardlinks to the sources and the final
+    os.replace() usually stay on one volume; a unique name per run keeps
+    concurrent runs on the same folders apart.
+    """
+    return tempfile.mkdtemp(prefix=SCRATCH_PREFIX, dir=target)
+
+def _link_or_copy(source_path, link_path):
+    """Make source_path available at link_path: hardlink, else symlink, else copy"""
+    try:
+        os.link(source_path, link_path)
+        return
+    except OSError:
+        pass  # Other volume or no hardlink support
+    try:
+        os.symlink(os.path.abspath(source_path), link_path)
+        return
+    except OSError:
+        pass  # Symlinks need extra privileges on Windows
+    shutil.copyfile(source_path, link_path)
@@ -1,12 +1,12 @@
-import os
-import subprocess
-import sys
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QLineEdit, QFileDialog, QProgressBar, QMessageBox, QGroupBox
+    QLineEdit, QFileDialog, QProgressBar, QMessageBox, QGroupBox, QSpinBox, QComboBox,
+    QCheckBox
 )
 from PyQt6.QtCore import QThread, pyqtSignal
 
+import IMGBatch
+
 class WorkerThread(QThread):
     progress_signal = pyqtSignal(int)
     output_signal = pyqtSignal(str)
@@ -34,11 +34,15 @@ class IMGTool(QWidget):
     - Convert IMG files to PNG format (batch processing)
     - Convert PNG files to IMG format with BC7 compression (batch processing)
     - Progress monitoring with real-time updates
-    - Automatic DDS extension management
+    - Source folders are read in place, never renamed
+    - Built-in BC1-BC5/BC7 decoder for IMG to PNG (no external tool needed)
     - Uses Compressonator CLI for high-quality conversions
+    - Encoding cache keyed by PNG content hash and encoder settings (LRU, size limited)
+    - Parallel conversion pool sized from CPU cores, with cancellation
     """
     def __init__(self):
         super().__init__()
+        self.pool = None
         self.init_ui()
 
     def init_ui(self):
@@ -102,6 +106,22 @@ class IMGTool(QWidget):
 
         img2png_layout.addLayout(img2png_target_layout)
 
+        # Decoder selection
+        decoder_layout = QHBoxLayout()
+        decoder_label = QLabel("Decoder:")
+        decoder_label.setStyleSheet("font-weight: bold; color: #495057;")
+        decoder_layout.addWidget(decoder_label)
+
+        self.decoder_combo = QComboBox()
+        self.decoder_combo.addItem("Auto (built-in, Compressonator fallback)", IMGBatch.DECODER_AUTO)
+        self.decoder_combo.addItem("Built-in only", IMGBatch.DECODER_NATIVE)
+        self.decoder_combo.addItem("Compressonator CLI", IMGBatch.DECODER_COMPRESSONATOR)
+        self.decoder_combo.setToolTip("The built-in decoder reads BC1-BC5/BC7 textures without compressonatorcli")
+        decoder_layout.addWidget(self.decoder_combo)
+        decoder_layout.addStretch()
+
+        img2png_layout.addLayout(decoder_layout)
+
         img2png_btn = QPushButton("🔄 Convert to PNG")
         img2png_btn.setToolTip("Start converting IMG files to PNG")
         img2png_btn.clicked.connect(self.convert_img_to_png)
@@ -167,6 +187,20 @@ class IMGTool(QWidget):
 
         png2img_layout.addLayout(png2img_target_layout)
 
+        png2img_options_layout = QHBoxLayout()
+        self.cache_check = QCheckBox("Use conversion cache")
+        self.cache_check.setChecked(True)
+        self.cache_check.setToolTip("Reuse IMG files of PNGs encoded before instead of encoding them again")
+        png2img_options_layout.addWidget(self.cache_check)
+        png2img_options_layout.addStretch()
+
+        clear_cache_btn = QPushButton("🗑️ Clear Cache")
+        clear_cache_btn.setToolTip("Delete all cached PNG to IMG conversions")
+        clear_cache_btn.clicked.connect(self.clear_encode_cache)
+        png2img_options_layout.addWidget(clear_cache_btn)
+
+        png2img_layout.addLayout(png2img_options_layout)
+
         png2img_btn = QPushButton("🔄 Convert to IMG")
         png2img_btn.setToolTip("Start converting PNG files to IMG (BC7 compression)")
         png2img_btn.clicked.connect(self.convert_png_to_img)
@@ -175,6 +209,28 @@ class IMGTool(QWidget):
         png2img_group.setLayout(png2img_layout)
         layout.addWidget(png2img_group)
 
+        # Parallel jobs selection (shared by both conversions)
+        jobs_layout = QHBoxLayout()
+        jobs_label = QLabel("Parallel Jobs:")
+        jobs_label.setStyleSheet("font-weight: bold; color: #495057;")
+        jobs_layout.addWidget(jobs_label)
+
+        self.jobs_spin = QSpinBox()
+        self.jobs_spin.setRange(0, max(64, IMGBatch.default_pool_size()))
+        self.jobs_spin.setSpecialValueText("Auto")
+        self.jobs_spin.setValue(0)
+        self.jobs_spin.setToolTip("Concurrent conversions (Auto = sized from CPU cores)")
+        jobs_layout.addWidget(self.jobs_spin)
+        jobs_layout.addStretch()
+
+        self.cancel_btn = QPushButton("⏹️ Cancel")
+        self.cancel_btn.setToolTip("Stop the running conversion")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_conversion)
+        jobs_layout.addWidget(self.cancel_btn)
+
+        layout.addLayout(jobs_layout)
+
         # Progress bar - compact
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
@@ -224,11 +280,8 @@ class IMGTool(QWidget):
             QMessageBox.warning(self, "Warning", "Please select source and destination directories")
             return
 
-        self.progress_bar.setValue(0)
-        self.worker = WorkerThread(self._convert_img_to_png, source, target)
-        self.worker.progress_signal.connect(self.update_progress)
-        self.worker.finished_signal.connect(self.command_finished)
-        self.worker.start()
+        pool = IMGBatch.CompressonatorPool(self.jobs_spin.value() or None, IMGBatch.DECODE_THREADS_PER_PROCESS)
+        self.run_conversion(self._convert_img_to_png, source, target, pool, self.decoder_combo.currentData())
 
     def convert_png_to_img(self):
         """Convert PNG files to IMG format with BC7 compression (batch processing)"""
@@ -238,152 +291,51 @@ class IMGTool(QWidget):
             QMessageBox.warning(self, "Warning", "Please select source and destination directories")
             return
 
+        pool = IMGBatch.CompressonatorPool(self.jobs_spin.value() or None, IMGBatch.ENCODE_THREADS_PER_PROCESS)
+        self.run_conversion(self._convert_png_to_img, source, target, pool, self.cache_check.isChecked())
+
+    def clear_encode_cache(self):
+        """Delete the PNG to IMG conversion cache"""
+        try:
+            freed = IMGBatch.clear_encode_cache()
+            QMessageBox.information(self, "Success", f"Conversion cache cleared ({freed / (1024 * 1024):.1f} MB freed)")
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Cannot clear conversion cache: {str(e)}")
+
+    def run_conversion(self, func, source, target, pool, *options):
+        """Execute a conversion in worker thread with progress monitoring"""
+        self.pool = pool
         self.progress_bar.setValue(0)
-        self.worker = WorkerThread(self._convert_png_to_img, source, target)
+        self.cancel_btn.setEnabled(True)
+        self.worker = WorkerThread(func, source, target, pool, *options)
         self.worker.progress_signal.connect(self.update_progress)
+        self.worker.output_signal.connect(self.update_output)
         self.worker.finished_signal.connect(self.command_finished)
         self.worker.start()
 
+    def cancel_conversion(self):
+        """Skip remaining files and kill running conversions"""
+        self.cancel_btn.setEnabled(False)
+        self.pool.cancel()
+
     # ============================================================================
     # Conversion Implementation Methods
     # ============================================================================
 
-    def _convert_img_to_png(self, worker, source, target):
-        """Convert IMG files to PNG format using Compressonator CLI"""
-        worker.progress_signal.emit(5)  # Starting
-        worker.progress_signal.emit(10)  # Initializing
-
-        # Step 1: Add .dds extension to files
-        worker.progress_signal.emit(15)  # Preparing files
-        self._add_dds_extension(source)
-        worker.progress_signal.emit(25)  # Files prepared
-
-        # Step 2: Convert DDS to PNG using compressonatorcli
-        # TODO: Update to use get_tools_path() when available
-        compressonator_path = os.path.join(os.getcwd(), "Tools", "compressonator", "compressonatorcli.exe")
-
-        # Check if compressonatorcli exists
-        if not os.path.exists(compressonator_path):
-            return f"Error: compressonatorcli.exe not found at {compressonator_path}"
-
-        worker.progress_signal.emit(30)  # Tool verified, scanning files
-
-        # For batch processing with DDS files, use -fd with decompression or direct conversion
-        # Try a different approach - convert each DDS file individually
-        dds_files = [f for f in os.listdir(source) if f.lower().endswith('.dds')]
-
-        if not dds_files:
-            return "Error: No DDS files found in source directory"
-
-        worker.progress_signal.emit(35)  # Files found, starting conversion
-
-        # Convert each DDS file to PNG individually
-        success_count = 0
-        total_files = len(dds_files)
-
-        for i, dds_file in enumerate(dds_files):
-            progress = 35 + int((i / total_files) * 50)  # Progress from 35% to 85%
-            worker.progress_signal.emit(progress)
-
-            dds_path = os.path.join(source, dds_file)
-            png_filename = dds_file[:-4] + '.png'  # Remove .dds and add .png
-            png_path = os.path.join(target, png_filename)
-
-            # Use single file conversion
-            cmd = [compressonator_path, dds_path, png_path]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(compressonator_path))
-
-            if result.returncode == 0:
-                success_count += 1
-                worker.output_signal.emit(f"Converted: {dds_file} → {png_filename}")
-            else:
-                worker.output_signal.emit(f"Conversion error {dds_file}: {result.stderr}")
-
-        if success_count == 0:
-            return f"Error: Could not convert any files. Check DDS file format."
-
-        # Step 3: Remove .dds extension
-        worker.progress_signal.emit(90)  # Conversion complete, cleaning up
-        self._remove_dds_extension(source)
+    def _convert_img_to_png(self, worker, source, target, pool, decoder):
+        """Convert IMG files to PNG format with the selected decoder"""
+        result = IMGBatch.convert_img_to_png(source, target, worker.progress_signal.emit,
+                                             worker.output_signal.emit, pool, decoder)
         worker.progress_signal.emit(95)  # Cleanup complete
+        return IMGBatch.format_result(result, "IMG to PNG", "DDS")
 
-        return f"Conversion completed {success_count}/{total_files} file IMG to PNG"
-
-    def _convert_png_to_img(self, worker, source, target):
+    def _convert_png_to_img(self, worker, source, target, pool, use_cache):
         """Convert PNG files to IMG format with BC7 compression using Compressonator CLI"""
-        worker.progress_signal.emit(5)  # Starting
-        worker.progress_signal.emit(10)  # Initializing
-
-        # Step 1: Convert PNG to DDS using compressonatorcli
-        compressonator_path = os.path.join(os.getcwd(), "Tools", "compressonator", "compressonatorcli.exe")
-
-        # Check if compressonatorcli exists
-        if not os.path.exists(compressonator_path):
-            return f"Error: compressonatorcli.exe not found at {compressonator_path}"
-
-        worker.progress_signal.emit(15)  # Tool verified, scanning files
-
-        # Convert each PNG file to DDS individually
-        png_files = [f for f in os.listdir(source) if f.lower().endswith('.png')]
-
-        if not png_files:
-            return "Error: No PNG files found in source directory"
-
-        worker.progress_signal.emit(20)  # Files found, starting conversion
-
-        # Convert each PNG file to DDS with BC7 compression
-        success_count = 0
-        total_files = len(png_files)
-
-        for i, png_file in enumerate(png_files):
-            progress = 20 + int((i / total_files) * 65)  # Progress from 20% to 85%
-            worker.progress_signal.emit(progress)
-
-            png_path = os.path.join(source, png_file)
-            dds_filename = png_file[:-4] + '.dds'  # Remove .png and add .dds
-            dds_path = os.path.join(target, dds_filename)
-
-            # Use single file conversion with BC7 compression
-            cmd = [compressonator_path, "-fd", "BC7", png_path, dds_path]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(compressonator_path))
-
-            if result.returncode == 0:
-                success_count += 1
-                worker.output_signal.emit(f"Converted: {png_file} → {dds_filename}")
-            else:
-                worker.output_signal.emit(f"Conversion error {png_file}: {result.stderr}")
-
-        if success_count == 0:
-            return f"Error: Could not convert any files. Check PNG file format."
-
-        # Step 2: Remove .dds extension
-        worker.progress_signal.emit(90)  # Conversion complete, cleaning up
-        self._remove_dds_extension(target)
+        cache = IMGBatch.open_encode_cache() if use_cache else None
+        result = IMGBatch.convert_png_to_img(source, target, worker.progress_signal.emit,
+                                             worker.output_signal.emit, pool, cache)
         worker.progress_signal.emit(95)  # Cleanup complete
-
-        return f"Conversion completed {success_count}/{total_files} file PNG to IMG"
-
-    # ============================================================================
-    # File Management Helper Methods
-    # ============================================================================
-
-    def _add_dds_extension(self, folder):
-        """Add .dds extension to all files in folder for Compressonator compatibility"""
-        for filename in os.listdir(folder):
-            filepath = os.path.join(folder, filename)
-            if os.path.isfile(filepath) and not filename.lower().endswith('.dds'):
-                new_filepath = filepath + '.dds'
-                os.rename(filepath, new_filepath)
-
-    def _remove_dds_extension(self, folder):
-        """Remove .dds extension from all files in folder to restore original names"""
-        for filename in os.listdir(folder):
-            if filename.lower().endswith('.dds'):
-                filepath = os.path.join(folder, filename)
-                new_filepath = filepath[:-4]  # Remove .dds
-                os.rename(filepath, new_filepath)
+        return IMGBatch.format_result(result, "PNG to IMG", "PNG")
 
     # ============================================================================
     # Progress and UI Update Methods
@@ -393,8 +345,14 @@ class IMGTool(QWidget):
         """Update progress bar value"""
         self.progress_bar.setValue(value)
 
+    def update_output(self, line):
+        """Show the latest per-file result next to the percentage"""
+        self.progress_bar.setFormat(f"%p% - {line}")
+
     def command_finished(self, success, message):
         """Handle conversion completion with user notification"""
+        self.cancel_btn.setEnabled(False)
+        self.progress_bar.setFormat("%p%")
         self.progress_bar.setValue(100)
         if success:
             QMessageBox.information(self, "Success", message)
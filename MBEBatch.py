@@ -0,0 +1,366 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from AppPaths import get_tools_path
+from ContentCache import ContentCache, DEFAULT_CACHE_LIMIT, file_state, hash_file, load_manifest, save_manifest
+
+# ============================================================================
+# Tool Location Helpers
+# ============================================================================
+
+def get_mbe_parser_path():
+    """Get the THL-MBE-Parser directory path"""
+    return os.path.join(get_tools_path(), "THL-MBE-Parser")
+
+def _ensure_mbe_parser_path():
+    """Make MBE_Parser.py and MBE_Repacker.py importable"""
+    tools_path = get_mbe_parser_path()
+    if tools_path not in sys.path:
+        sys.path.append(tools_path)
+
+def import_mbe_parser():
+    """Import the MBE_Parser module (raises ImportError if missing)"""
+    _ensure_mbe_parser_path()
+    import MBE_Parser  # type: ignore  # IDE may not recognize dynamic import
+    return MBE_Parser
+
+def import_mbe_repacker():
+    """Import the MBE_Repacker module (raises ImportError if missing)"""
+    _ensure_mbe_parser_path()
+    import MBE_Repacker  # type: ignore  # IDE may not recognize dynamic import
+    return MBE_Repacker
+
+# ============================================================================
+# Single File Operations
+# ============================================================================
+
+def _last_log_line(messages):
+    """Return the last non-empty line logged by the parser/repacker"""
+    lines = [line for line in "\n".join(messages).splitlines() if line.strip()]
+    return lines[-1].strip() if lines else "Unknown error"
+
+def extract_output_dir(mbe_path, target_dir):
+    """CSV output directory of an MBE file: <target_dir>/<mbe name>"""
+    return os.path.join(target_dir, os.path.splitext(os.path.basename(mbe_path))[0])
+
+def extract_mbe_file(mbe_path, target_dir):
+    """
+    Extract one MBE file to <target_dir>/<mbe name>/ as CSV files.
+
+    Streams rows straight to CSV in-process (memory bounded by the string
+    table) and collects the parser's messages instead of printing them.
+
+    Returns:
+        int: Number of source bytes processed
+    """
+    parser = import_mbe_parser()
+    output_dir = extract_output_dir(mbe_path, target_dir)
+
+    messages = []
+    sheet_count = parser.stream_mbe_to_csv(mbe_path, output_dir, log=messages.append)
+    if sheet_count is None:
+        raise RuntimeError(_last_log_line(messages))
+    return os.path.getsize(mbe_path)
+
+def repack_mbe_dir(input_dir, output_filepath):
+    """
+    Repack one CSV directory into an MBE file.
+
+    Returns:
+        int: Number of bytes written
+    """
+    repacker = import_mbe_repacker()
+
+    messages = []
+    repacked = repacker.repack_mbe_buffered(input_dir, output_filepath, log=messages.append)
+    if not repacked:
+        raise RuntimeError(_last_log_line(messages))
+    return os.path.getsize(output_filepath)
+
+# ============================================================================
+# Command Builders
+# ============================================================================
+
+def scan_mbe_files(source_dir):
+    """Scan for MBE files in the source directory"""
+    return [f for f in os.listdir(source_dir) if f.lower().endswith('.mbe')]
+
+def build_extract_commands(mbe_files, source_dir, target_dir):
+    """Build [mbe path, target dir] commands for extract_mbe_file"""
+    return [[os.path.join(source_dir, mbe_file), target_dir] for mbe_file in mbe_files]
+
+def scan_csv_directories(source_dir):
+    """Scan for directories containing CSV files"""
+    csv_dirs = []
+    for item in os.listdir(source_dir):
+        item_path = os.path.join(source_dir, item)
+        if os.path.isdir(item_path):
+            # Check if directory contains CSV files
+            if any(f.lower().endswith('.csv') for f in os.listdir(item_path)):
+                csv_dirs.append(item_path)
+    return csv_dirs
+
+def build_repack_commands(csv_dirs, target_dir):
+    """Build [csv dir, <target_dir>/<dir name>.mbe] commands for repack_mbe_dir"""
+    commands = []
+    for csv_dir in csv_dirs:
+        dir_name = os.path.basename(os.path.normpath(csv_dir))
+        commands.append([csv_dir, os.path.join(target_dir, dir_name + ".mbe")])
+    return commands
+
+# ============================================================================
+# Batch Execution
+# ============================================================================
+
+def default_jobs():
+    """Default number of worker processes (one per CPU core)"""
+    return os.cpu_count() or 1
+
+def run_batch(batch_func, commands, jobs=1, progress_callback=None):
+    """
+    Run batch_func(*command) for every command and collect the results.
+
+    With jobs > 1 the commands are fanned out over a process pool. A failing
+    file never aborts the batch; its error is recorded in 'failures'.
+
+    Args:
+        batch_func: Module-level function (must be picklable for jobs > 1)
+        commands: List of argument lists, the first item names the file
+        jobs: Number of worker processes, 1 runs in the calling thread (None: default_jobs())
+        progress_callback: Called as (done, total, command, error) in completion order
+
+    Returns:
+        dict: 'processed', 'bytes', 'failures' [(name, message)] and 'elapsed'
+    """
+    if jobs is None:
+        jobs = default_jobs()
+    total = len(commands)
+    result = {'processed': 0, 'bytes': 0, 'failures': [], 'elapsed': 0.0}
+    start_time = time.perf_counter()
+
+    def record(command, size, error):
+        if error is None:
+            result['processed'] += 1
+            result['bytes'] += size or 0
+        else:
+            result['failures'].append((command[0], error))
+        if progress_callback:
+            done = result['processed'] + len(result['failures'])
+            progress_callback(done, total, command, error)
+
+    if jobs <= 1 or total <= 1:
+        for command in commands:
+            try:
+                record(command, batch_func(*command), None)
+            except Exception as e:
+                record(command, 0, str(e))
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, total)) as executor:
+            futures = {executor.submit(batch_func, *command): command for command in commands}
+            for future in as_completed(futures):
+                try:
+                    record(futures[future], future.result(), None)
+                except Exception as e:
+                    record(futures[future], 0, str(e))
+
+    result['elapsed'] = time.perf_counter() - start_time
+    return result
+
+# ============================================================================
+# Incremental Repack
+# ============================================================================
+
+REPACK_MANIFEST_NAME = ".mbe_repack_manifest.json"
+
+class RepackManifest:
+    """
+    Persistent record of what each output .mbe was built from.
+
+    Stored as JSON next to the outputs and keyed by output file name. Every
+    entry keeps the source directory, [size, mtime_ns, sha256] of each CSV
+    sheet and of the output file itself.
+    """
+    def __init__(self, target_dir):
+        self.path = os.path.join(target_dir, REPACK_MANIFEST_NAME)
+        self.entries = load_manifest(self.path)  # Missing or unreadable manifest - everything gets rebuilt
+
+    def snapshot_sources(self, csv_dir, output_filepath):
+        """Return the current {csv name: state} of a CSV directory"""
+        recorded = self.entries.get(os.path.basename(output_filepath), {}).get('csvs', {})
+        return {
+            name: file_state(os.path.join(csv_dir, name), recorded.get(name))
+            for name in sorted(os.listdir(csv_dir)) if name.endswith('.csv')
+        }
+
+    def is_up_to_date(self, csv_dir, output_filepath, sources):
+        """Check whether output_filepath was built from exactly these CSV sheets"""
+        entry = self.entries.get(os.path.basename(output_filepath))
+        if not entry or entry.get('source') != os.path.abspath(csv_dir):
+            return False
+        # Added, deleted or renamed sheets change the key set
+        recorded = entry.get('csvs', {})
+        if set(recorded) != set(sources):
+            return False
+        if any(recorded[name][2] != state[2] for name, state in sources.items()):
+            return False
+        # The output must still be the file we wrote
+        if not os.path.isfile(output_filepath):
+            return False
+        output_state = file_state(output_filepath, entry.get('output'))
+        return output_state[2] == entry.get('output', [None, None, None])[2]
+
+    def record(self, csv_dir, output_filepath, sources, rebuilt=True):
+        """Remember that output_filepath is built from these CSV sheets"""
+        name = os.path.basename(output_filepath)
+        # A rebuilt output is always re-hashed; a skipped one only refreshes its stat
+        recorded_output = None if rebuilt else self.entries.get(name, {}).get('output')
+        self.entries[name] = {
+            'source': os.path.abspath(csv_dir),
+            'csvs': sources,
+            'output': file_state(output_filepath, recorded_output),
+        }
+
+    def save(self):
+        """Write the manifest atomically"""
+        save_manifest(self.path, self.entries)
+
+def run_incremental_repack(commands, jobs=1, progress_callback=None):
+    """
+    Repack only the CSV directories whose sheets or output changed.
+
+    Same arguments and result as run_batch(batch_func=repack_mbe_dir), plus a
+    'skipped' count. Manifests are updated for every successful repack.
+    """
+    start_time = time.perf_counter()
+    total = len(commands)
+    manifests = {}
+    pending = []
+    sources_by_output = {}
+    skipped = 0
+
+    for command in commands:
+        csv_dir, output_filepath = command
+        target_dir = os.path.dirname(os.path.abspath(output_filepath))
+        manifest = manifests.setdefault(target_dir, RepackManifest(target_dir))
+        sources = manifest.snapshot_sources(csv_dir, output_filepath)
+        if manifest.is_up_to_date(csv_dir, output_filepath, sources):
+            manifest.record(csv_dir, output_filepath, sources, rebuilt=False)
+            skipped += 1
+            if progress_callback:
+                progress_callback(skipped, total, command, None)
+        else:
+            pending.append(command)
+            sources_by_output[output_filepath] = (manifest, sources)
+
+    def on_progress(done, _total, command, error):
+        if error is None:
+            manifest, sources = sources_by_output[command[1]]
+            manifest.record(command[0], command[1], sources)
+        if progress_callback:
+            progress_callback(skipped + done, total, command, error)
+
+    result = run_batch(repack_mbe_dir, pending, jobs, on_progress)
+    for manifest in manifests.values():
+        manifest.save()
+
+    result['skipped'] = skipped
+    result['elapsed'] = time.perf_counter() - start_time
+    return result
+
+# ============================================================================
+# Extraction Cache
+# ============================================================================
+
+EXTRACT_CACHE_NAME = "mbe_extract"
+# Bump when the CSV output format or what an entry holds changes so old entries stop
+# matching (mbe-csv-1 entries could hold files the extraction did not write)
+EXTRACT_CACHE_VERSION = "mbe-csv-2"
+
+def open_extract_cache(max_bytes=DEFAULT_CACHE_LIMIT):
+    """Open the per-user MBE extraction cache"""
+    return ContentCache(EXTRACT_CACHE_NAME, max_bytes)
+
+def clear_extract_cache():
+    """Delete the MBE extraction cache and return the number of bytes freed"""
+    return open_extract_cache().clear()
+
+def run_cached_extract(commands, jobs=1, progress_callback=None, cache=None):
+    """
+    Extract MBE files, restoring CSV output from the cache when the source
+    file content was extracted before.
+
+    Same arguments and result as run_batch(batch_func=extract_mbe_file), plus
+    'cache_hits'. Cache lookups and stores happen in this process only.
+    """
+    start_time = time.perf_counter()
+    cache = cache or open_extract_cache()
+    total = len(commands)
+    pending = []
+    keys = {}
+    hits = 0
+    hit_bytes = 0
+
+    for command in commands:
+        mbe_path, target_dir = command
+        try:
+            key = ContentCache.make_key(hash_file(mbe_path), EXTRACT_CACHE_VERSION)
+        except OSError:
+            pending.append(command)  # Let the extractor report the error
+            continue
+        if cache.contains(key):
+            try:
+                cache.restore(key, extract_output_dir(mbe_path, target_dir))
+            except OSError:
+                keys[mbe_path] = key
+                pending.append(command)  # Cache unusable for this file; extract it again
+                continue
+            hits += 1
+            hit_bytes += os.path.getsize(mbe_path)
+            if progress_callback:
+                progress_callback(hits, total, command, None)
+        else:
+            keys[mbe_path] = key
+            pending.append(command)
+
+    def on_progress(done, _total, command, error):
+        if error is None and command[0] in keys:
+            try:
+                # Only the CSVs of this MBE, not whatever else is in its output directory
+                files = import_mbe_parser().list_csv_files(command[0])
+                cache.store(keys[command[0]], extract_output_dir(*command),
+                            {'source': os.path.basename(command[0])}, files)
+            except (OSError, ValueError):
+                pass  # Not cached; extracted again next time
+        if progress_callback:
+            progress_callback(hits + done, total, command, error)
+
+    result = run_batch(extract_mbe_file, pending, jobs, on_progress)
+    cache.save()
+
+    result['processed'] += hits
+    result['bytes'] += hit_bytes
+    result['cache_hits'] = hits
+    result['elapsed'] = time.perf_counter() - start_time
+    return result
+
+# ============================================================================
+# Reporting Helpers
+# ============================================================================
+
+def format_throughput(file_count, byte_count, elapsed):
+    """Format a throughput summary such as '12 file(s) in 0.50s (24.0 files/s, 3.10 MB/s)'"""
+    elapsed = max(elapsed, 1e-6)
+    files_per_sec = file_count / elapsed
+    mb_per_sec = byte_count / (1024 * 1024) / elapsed
+    return f"{file_count} file(s) in {elapsed:.2f}s ({files_per_sec:.1f} files/s, {mb_per_sec:.2f} MB/s)"
+
+def format_failure_report(failures, limit=10):
+    """Format collected per-file failures, listing at most `limit` of them"""
+    lines = [f"{len(failures)} file(s) failed:"]
+    for name, message in failures[:limit]:
+        lines.append(f"- {os.path.basename(os.path.normpath(name))}: {message}")
+    if len(failures) > limit:
+        lines.append(f"... and {len(failures) - limit} more")
+    return "\n".join(lines)
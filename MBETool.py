@@ -1,127 +1,53 @@
-import os
-import subprocess
-import sys
-import signal
-import atexit
+from functools import partial
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QLineEdit, QFileDialog, QProgressBar, QMessageBox, QGroupBox
+    QLineEdit, QFileDialog, QProgressBar, QMessageBox, QGroupBox, QSpinBox,
+    QCheckBox
 )
 from PyQt6.QtCore import QThread, pyqtSignal
 
-# Global list to track running processes
-running_processes = []
-
-def cleanup_processes():
-    """Cleanup function to terminate all running processes when application exits"""
-    for process in running_processes[:]:  # Copy list to avoid modification during iteration
-        try:
-            if process.poll() is None:  # Process is still running
-                process.terminate()
-                # Wait a bit for graceful termination
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    # Force kill if it doesn't terminate gracefully
-                    process.kill()
-                    process.wait()
-            running_processes.remove(process)
-        except Exception:
-            pass
-
-# Register cleanup function
-atexit.register(cleanup_processes)
-
-# Handle application exit signals
-def signal_handler(signum, frame):
-    cleanup_processes()
-    sys.exit(0)
-
-signal.signal(signal.SIGTERM, signal_handler)
-signal.signal(signal.SIGINT, signal_handler)
+import MBEBatch
 
 class WorkerThread(QThread):
     progress_signal = pyqtSignal(int)
     finished_signal = pyqtSignal(bool, str)
 
-    def __init__(self, commands, cwd=None, repack_func=None, total_files=0):
+    def __init__(self, commands, batch_runner, total_files=0, jobs=1):
         super().__init__()
         self.commands = commands if isinstance(commands, list) else [commands]
-        self.cwd = cwd
-        self.repack_func = repack_func
+        self.batch_runner = batch_runner
         self.total_files = total_files
+        self.jobs = jobs
 
     def run(self):
         try:
             self.progress_signal.emit(5)  # Starting
+            self.progress_signal.emit(10)  # Ready to process
 
-            if self.repack_func:
-                # Direct function call for MBE repacker - no process tracking needed
-                total_commands = len(self.commands)
-                self.progress_signal.emit(10)  # Ready to process
-
-                for i, (input_dir, output_filepath) in enumerate(self.commands):
-                    progress = 10 + int((i / total_commands) * 85)  # 10% to 95%
-                    self.progress_signal.emit(progress)
-
-                    try:
-                        self.repack_func(input_dir, output_filepath)
-                    except Exception as e:
-                        self.progress_signal.emit(100)
-                        self.finished_signal.emit(False, f"Error processing {input_dir}: {str(e)}")
-                        return
-            else:
-                # Subprocess calls - track processes for cleanup
-                total_commands = len(self.commands)
-                self.progress_signal.emit(10)  # Ready to process
-
-                for i, command in enumerate(self.commands):
-                    progress = 10 + int((i / total_commands) * 85)  # 10% to 95%
-                    self.progress_signal.emit(progress)
-
-                    process = subprocess.Popen(
-                        command,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,
-                        text=True,
-                        cwd=self.cwd
-                    )
-
-                    # Add process to global tracking list
-                    running_processes.append(process)
-
-                    # Wait for completion with progress updates
-                    import time
-                    start_time = time.time()
-                    while True:
-                        if process.poll() is not None:
-                            break
-                        # Small progress increment while waiting
-                        elapsed = time.time() - start_time
-                        if elapsed > 1.0:  # After 1 second, add small increment
-                            current_progress = 10 + int((i / total_commands) * 85)
-                            self.progress_signal.emit(min(95, current_progress + 2))
-                        time.sleep(0.1)
-
-                    rc = process.poll()
-                    # Remove process from tracking list when done
-                    if process in running_processes:
-                        running_processes.remove(process)
-
-                    if rc != 0:
-                        self.progress_signal.emit(100)
-                        self.finished_signal.emit(False, f"Error with command: {' '.join(command)}, Exit code {rc}")
-                        return
+            # In-process calls, fanned out over a process pool when jobs > 1
+            result = self.batch_runner(self.commands, self.jobs, self._report_progress)
+            summary = MBEBatch.format_throughput(result['processed'], result['bytes'], result['elapsed'])
+            if result.get('skipped'):
+                summary += f", {result['skipped']} unchanged file(s) skipped"
+            if result.get('cache_hits'):
+                summary += f", {result['cache_hits']} restored from cache"
 
             self.progress_signal.emit(100)
-            if self.total_files > 0:
-                self.finished_signal.emit(True, f"Completed successfully - {self.total_files} file(s) processed")
+            if result['failures']:
+                report = MBEBatch.format_failure_report(result['failures'])
+                self.finished_signal.emit(False, f"Completed with errors - {summary}\n\n{report}")
+            elif self.total_files > 0:
+                self.finished_signal.emit(True, f"Completed successfully - {summary}")
             else:
                 self.finished_signal.emit(True, "Completed successfully")
         except Exception as e:
             self.progress_signal.emit(100)
             self.finished_signal.emit(False, f"Error: {str(e)}")
 
+    def _report_progress(self, done, total, command, error):
+        """Advance the progress bar as files complete"""
+        self.progress_signal.emit(10 + int((done / total) * 85))  # 10% to 95%
+
 class MBETool(QWidget):
     """
     MBE Tools widget for batch processing MBE files.
@@ -130,7 +56,10 @@ class MBETool(QWidget):
     - Extract MBE files to CSV format (batch processing)
     - Repack CSV directories back to MBE format (batch processing)
     - Progress monitoring with real-time updates
-    - Process management for clean application exit
+    - In-process parsing/repacking with a throughput summary
+    - Parallel execution across CPU cores with per-file error reports
+    - Incremental repack that skips tables whose CSV files are unchanged
+    - Extraction cache keyed by MBE content hash (LRU, size limited)
     """
     def __init__(self):
         super().__init__()
@@ -197,6 +126,20 @@ class MBETool(QWidget):
 
         parse_layout.addLayout(parse_target_layout)
 
+        parse_options_layout = QHBoxLayout()
+        self.cache_check = QCheckBox("Use extraction cache")
+        self.cache_check.setChecked(True)
+        self.cache_check.setToolTip("Restore CSV output of MBE files extracted before instead of parsing them again")
+        parse_options_layout.addWidget(self.cache_check)
+        parse_options_layout.addStretch()
+
+        clear_cache_btn = QPushButton("🗑️ Clear Cache")
+        clear_cache_btn.setToolTip("Delete all cached MBE extraction results")
+        clear_cache_btn.clicked.connect(self.clear_extract_cache)
+        parse_options_layout.addWidget(clear_cache_btn)
+
+        parse_layout.addLayout(parse_options_layout)
+
         parse_btn = QPushButton("🚀 Extract Files")
         parse_btn.setToolTip("Start extracting MBE files to CSV")
         parse_btn.clicked.connect(self.parse_mbe)
@@ -262,6 +205,13 @@ class MBETool(QWidget):
 
         repack_layout.addLayout(repack_target_layout)
 
+        self.incremental_check = QCheckBox("Incremental (skip tables whose CSV files are unchanged)")
+        self.incremental_check.setChecked(True)
+        self.incremental_check.setToolTip(
+            "Keep a manifest of CSV/MBE hashes in the target directory and only rebuild changed tables"
+        )
+        repack_layout.addWidget(self.incremental_check)
+
         repack_btn = QPushButton("🔧 Repack Files")
         repack_btn.setToolTip("Start repacking CSV directories to MBE files")
         repack_btn.clicked.connect(self.repack_mbe)
@@ -270,6 +220,21 @@ class MBETool(QWidget):
         repack_group.setLayout(repack_layout)
         layout.addWidget(repack_group)
 
+        # Parallel jobs selection (shared by extract and repack)
+        jobs_layout = QHBoxLayout()
+        jobs_label = QLabel("Parallel Jobs:")
+        jobs_label.setStyleSheet("font-weight: bold; color: #495057;")
+        jobs_layout.addWidget(jobs_label)
+
+        self.jobs_spin = QSpinBox()
+        self.jobs_spin.setRange(1, max(64, MBEBatch.default_jobs()))
+        self.jobs_spin.setValue(MBEBatch.default_jobs())
+        self.jobs_spin.setToolTip("Number of worker processes (1 = process files one at a time)")
+        jobs_layout.addWidget(self.jobs_spin)
+        jobs_layout.addStretch()
+
+        layout.addLayout(jobs_layout)
+
         # Progress bar - compact
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
@@ -321,9 +286,24 @@ class MBETool(QWidget):
             QMessageBox.warning(self, "Warning", "No .MBE files found in source directory")
             return
 
-        commands = self._build_parse_commands(mbe_files, source)
-        self.run_command(commands, cwd=target, total_files=len(mbe_files))
+        extract_func = self._import_extract_function()
+        if not extract_func:
+            return
+
+        commands = self._build_parse_commands(mbe_files, source, target)
+        if self.cache_check.isChecked():
+            batch_runner = MBEBatch.run_cached_extract
+        else:
+            batch_runner = partial(MBEBatch.run_batch, extract_func)
+        self.run_command(commands, batch_runner, total_files=len(mbe_files))
 
+    def clear_extract_cache(self):
+        """Delete the MBE extraction cache"""
+        try:
+            freed = MBEBatch.clear_extract_cache()
+            QMessageBox.information(self, "Success", f"Extraction cache cleared ({freed / (1024 * 1024):.1f} MB freed)")
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Cannot clear extraction cache: {str(e)}")
 
     def repack_mbe(self):
         """Repack CSV directories to MBE format (batch processing)"""
@@ -343,51 +323,20 @@ class MBETool(QWidget):
             return
 
         commands = self._build_repack_commands(csv_dirs, target)
-        self.run_command(commands, repack_func=repack_func, total_files=len(csv_dirs))
-
-    def _scan_csv_directories(self, source_dir):
-        """Scan for directories containing CSV files"""
-        csv_dirs = []
-        for item in os.listdir(source_dir):
-            item_path = os.path.join(source_dir, item)
-            if os.path.isdir(item_path):
-                # Check if directory contains CSV files
-                if any(f.lower().endswith('.csv') for f in os.listdir(item_path)):
-                    csv_dirs.append(item_path)
-        return csv_dirs
-
-    def _import_repack_function(self):
-        """Import the MBE repack function"""
-        # TODO: Update to use get_tools_path() when available
-        tools_path = os.path.join(os.getcwd(), "Tools", "THL-MBE-Parser")
-        if tools_path not in sys.path:
-            sys.path.append(tools_path)
-        try:
-            from MBE_Repacker import repack_mbe  # type: ignore  # IDE may not recognize dynamic import
-            return repack_mbe
-        except ImportError as e:
-            QMessageBox.critical(self, "Error", f"Cannot import MBE_Repacker.py: {str(e)}")
-            return None
-
-    def _build_repack_commands(self, csv_dirs, target_dir):
-        """Build command list for repacking CSV directories"""
-        commands = []
-        for csv_dir in csv_dirs:
-            # Calculate output filepath in target directory
-            dir_name = os.path.basename(os.path.normpath(csv_dir))
-            output_filename = dir_name + ".mbe"
-            output_filepath = os.path.join(target_dir, output_filename)
-            commands.append([csv_dir, output_filepath])
-        return commands
+        if self.incremental_check.isChecked():
+            batch_runner = MBEBatch.run_incremental_repack
+        else:
+            batch_runner = partial(MBEBatch.run_batch, repack_func)
+        self.run_command(commands, batch_runner, total_files=len(csv_dirs))
 
     # ============================================================================
     # Command Execution and Progress Management
     # ============================================================================
 
-    def run_command(self, commands, cwd=None, repack_func=None, total_files=0):
-        """Execute commands in worker thread with progress monitoring"""
+    def run_command(self, commands, batch_runner, total_files=0):
+        """Execute batch commands in worker thread with progress monitoring"""
         self.progress_bar.setValue(0)
-        self.worker = WorkerThread(commands, cwd, repack_func, total_files)
+        self.worker = WorkerThread(commands, batch_runner, total_files, self.jobs_spin.value())
         self.worker.progress_signal.connect(self.update_progress)
         self.worker.finished_signal.connect(self.command_finished)
         self.worker.start()
@@ -414,47 +363,34 @@ class MBETool(QWidget):
 
     def _scan_mbe_files(self, source_dir):
         """Scan for MBE files in the source directory"""
-        return [f for f in os.listdir(source_dir) if f.lower().endswith('.mbe')]
+        return MBEBatch.scan_mbe_files(source_dir)
 
-    def _build_parse_commands(self, mbe_files, source_dir):
+    def _build_parse_commands(self, mbe_files, source_dir, target_dir):
         """Build command list for parsing MBE files"""
-        commands = []
-        tools_dir = os.path.join(os.getcwd(), "Tools", "THL-MBE-Parser")
-        for mbe_file in mbe_files:
-            full_path = os.path.join(source_dir, mbe_file)
-            commands.append([sys.executable, os.path.join(tools_dir, "MBE_Parser.py"), full_path])
-        return commands
+        return MBEBatch.build_extract_commands(mbe_files, source_dir, target_dir)
+
+    def _import_extract_function(self):
+        """Import the MBE parser and return the in-process extract function"""
+        try:
+            MBEBatch.import_mbe_parser()
+            return MBEBatch.extract_mbe_file
+        except ImportError as e:
+            QMessageBox.critical(self, "Error", f"Cannot import MBE_Parser.py: {str(e)}")
+            return None
 
     def _scan_csv_directories(self, source_dir):
         """Scan for directories containing CSV files"""
-        csv_dirs = []
-        for item in os.listdir(source_dir):
-            item_path = os.path.join(source_dir, item)
-            if os.path.isdir(item_path):
-                # Check if directory contains CSV files
-                if any(f.lower().endswith('.csv') for f in os.listdir(item_path)):
-                    csv_dirs.append(item_path)
-        return csv_dirs
+        return MBEBatch.scan_csv_directories(source_dir)
 
     def _import_repack_function(self):
-        """Import the MBE repack function"""
-        tools_path = os.path.join(os.getcwd(), "Tools", "THL-MBE-Parser")
-        if tools_path not in sys.path:
-            sys.path.append(tools_path)
+        """Import the MBE repacker and return the in-process repack function"""
         try:
-            from MBE_Repacker import repack_mbe  # type: ignore  # IDE may not recognize dynamic import
-            return repack_mbe
+            MBEBatch.import_mbe_repacker()
+            return MBEBatch.repack_mbe_dir
         except ImportError as e:
             QMessageBox.critical(self, "Error", f"Cannot import MBE_Repacker.py: {str(e)}")
             return None
 
     def _build_repack_commands(self, csv_dirs, target_dir):
         """Build command list for repacking CSV directories"""
-        commands = []
-        for csv_dir in csv_dirs:
-            # Calculate output filepath in target directory
-            dir_name = os.path.basename(os.path.normpath(csv_dir))
-            output_filename = dir_name + ".mbe"
-            output_filepath = os.path.join(target_dir, output_filename)
-            commands.append([csv_dir, output_filepath])
-        return commands
\ No newline at end of file
+        return MBEBatch.build_repack_commands(csv_dirs, target_dir)
@@ -0,0 +1,561 @@
+import os
+import time
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from ArchiveExtract import MappedArchive
+from ToolProgress import counter_snapshot
+
+try:
+    import lz4.block as lz4_block  # Optional: faster decompression, and compression when packing
+except ImportError:
+    lz4_block = None
+
+class MVGLFormatError(ValueError):
+    """File is not an MVGL archive the reader understands"""
+
+# ============================================================================
+# Encryption
+# ============================================================================
+
+# XOR key tables of DSCSTools; keystream byte at file position p is
+# KEY_A[p % 997] ^ KEY_B[p % 991], so it repeats every 997 * 991 bytes
+KEY_A = bytes.fromhex(
+    "d353d285dc8777a716fa8d459d14603b9b7bdaed25fdf58d44d0eb8bab4b6a3e012863a3e32363a3e2556da57ca8e4f0"
+    "8baa7d74409c47369aaeb119603b9aade4efbe8276daed25fdf58d459c473767d6b981a8e3229679409c480490ab4b6b"
+    "0a5ea14803c3834235cd85dd556cd78776d920fc2863a2152d646f3e02f65a6da57d743fce5139005c08c382750cf8f3"
+    "f226ca1e62d5ed2430ccb8b3b3b2e68911f9c01bfa8e12c6e9f158d420fb5b3b9aade4f08baa7d74409c47369aade4f0"
+    "8c77a716fa8d459c473699e0bb1bfb5b3b9b7a0e9178737372a57d750cf726c9513834005c08c4506cd786aa7d750cf7"
+    "26c9506b0b2afec2b619603c68a4b04c383332653d34005c07f659a07ca716f9c1e8242fff8e12c6e9f08c7874409b7a"
+    "0e9179416971d920fb5b3b9aaeb2e68ade2295ac189312c51d95ac1893139312c6eabdb54c3834005b3b9aade5bdb54c"
+    "3834ff8e11f8f4c01bfb5b3b9aaeb2e5bdb54d055dd5ed2430ccb8b47f0f5ea2152d646f3e02f659a14803c2b61a2e31"
+    "98139312c51d95ade4f08c77a716f9c1e9f158d420fb5b3acd84102c98145f6e72a57ca8e4efbe81a9b04b6b0a5dd420"
+    "fc27974737660990ab4a9ee2556cd8549faeb2e68911f9c01cc7b61a2e32660991794168a4b04b6a3e02f659a1480490"
+    "ab4b6a3e012863a3e25639012863a216f9c01bfa8e11f9c1e9f159a14803c38276d920fc279679409b7bdaeef159a07c"
+    "a717c7b7e68911f9c1e9f159a07ca716fa8d44cf1e62d5ed25fdf4bf4ed1b8b3b2e5bce757062afec2b54d048fde2296"
+    "79409b7bdaed25fc2864700cf72797466a3d35ccb7e7563acd840f5ea1480490ac1894dfeef159a149d1b980dc884303"
+    "c38276d920fb5b3ace520629319814603c67d786aa7e4235cd85dd556da57d750dc51d94e0bb1a2d646f3e012930cbea"
+    "be81a9b04c3834ff8fde2295ade5bdb54c3766099179409c473767d786aa7d74409c4737660990ab4b6b0a5dd5ec58d3"
+    "53d353d352062930ccb8b47f0f5f6f3e02f58d459d145f6f3e0129319813931392459d145f6e71d854a07bdbba4d055c"
+    "08c382750dc44f9faeb119603c68a4af7f0e92459d14603c67d786a9b04c3767d6ba4d0490ab4a9d145f6e72a649d1b9"
+    "80dbbb1bfa8d44cf1e62d6b980dc8777a649d1b980dbbb1bfa8d44d0eb8ade21c8840f5ea149d1b8b480dc884303c383"
+    "4235cd840f5ea148048fdfeef159a07ca717c7b6196108c44f9faeb1189312c6eabdb480dc8844d0eb8bab4b6b0b2afe"
+    "c2b61a2d653d35ccb8b480dc884303c2b54d048fdfefbe81a8e32363a216f9c01bfa8e11f9c1e9f08baa7e4235cd8410"
+    "2c974669700cf727974737660a5ea149d0ec58d420fc28646f3e012863a2152c9814603b9b"
+)
+KEY_B = bytes.fromhex(
+    "92851dd4607b1b3bdbface92851dd52da4f0cb2a3d74801b3bdbfacdc55c4777e79787b65aad246f7e82b65aad253d75"
+    "4c78b4c05b7b1a6de42f3e42761a6de4300c37a75747761a6eb159e1c991b9c128a322d52cd7c7f69921080302350c38"
+    "73b3f26649106c17066a7e82b58cb8f4009c87b659e1c990ec9787b7260a9e2109d1f90168e42f3f0f9fefffce9286e9"
+    "31d894203bdbface92851c08030236d9607ce863e362156de5fd343f0f9feffe0236da2da4effe0169b159e0fb9bba8d"
+    "851dd4607b1b3bdbfb9aee32a5bc28a323a323a323a322d6face9286e9300c38747f4fdf2f3e41a823a323a322d52da4"
+    "f0ccf767163940dbfb9bba8d844fde62163940dcc7f699210804d02cd8941f6f7e82b58d851c0804d02cd8935312059c"
+    "88844fde6148440f9e22d52da5bc28a4f0cb2b0a9d55ac5814a0bc28a322d6f9009bba8e5245dcc7f767170669b15813"
+    "d2c6297118d45faef19854e0fc68e42f3f0ed1f90169b158149fee32a5bdf4ffce91b9c05b7b1b3a0d059c87b65aaef2"
+    "657ce863e362156c170736d96148434342754c78b3f33372e6ca5ee1c8c3c3c3c2f699210804d02cd8941f6eb2260a9e"
+    "22d52da4efffcf5fafbec2f5ccf7664ade6149113941a824704c77e79786eafd3440dbface9286e931d8935246aabdf5"
+    "cdc55d14a0bb5aaef2657ce79786eafd343f0ed2c55d156de5fd350c37a7574777e79787b659e1c8c48f1ea255ad2470"
+    "4c77e796b9c05c47761a6de42f3e41a9f19853120669b08cb7260a9d54df2e72e5fd343f0f9fee32a5bdf4ffcf5ee1c9"
+    "91b9c05c484342754c78b3f2657ce796b9c128a322d52da5bc27d6f90169b15813d2c62a3d754d45dcc7f6992109d02c"
+    "d7c7f767163941a8246f7e82b659e1c990ec985312059c87b65aad253ca824704c77e6ca5ee295ed64b08bebcb2b0a9d"
+    "55ac5813d39286eafd343f0ed1f83440dcc8c48f1ea18950ab8a1dd52da4f0cb2b0a9d55ac5746a9f0ccf767170736da"
+    "2e7119a18883838382b65aad253d74801c0804cf5fafbf8e5178b3f332a5bdf5cdc490ec9787b727d7c629704bab8beb"
+    "cb2a3d747f4fde62156de5fd3440dbfacdc490ebca5ee1c991b9c128a4efffce92851dd45faef2657db58d8450ac5747"
+    "761a6eb159e0fb9bbb5b7a4d45dd95ed657db4bf8f1f6f7e81e9300c37a68950ac5746aabdf5ccf7664ade614844106c"
+    "18d45fafbec128a323a255ac5814a0bc28a4efffcf5ee1c8c48f1ea1888382b58cb727d6f9009c87b659e1c990ec9853"
+    "13d3935312066a7db58cb8f4ffcf5fafbec2f5cdc48f1f6eb159e1c8c490ebca5ee295ed64afbec128a323a323a323a2"
+    "55ad253d747f4fde62163940dcc7f767170669b15813d3935313d2c55c4777"
+)
+KEY_PERIOD = len(KEY_A) * len(KEY_B)
+
+_keystream = None
+
+def _get_keystream():
+    """One full period of the keystream, built on first use"""
+    global _keystream
+    if _keystream is None:
+        a = int.from_bytes(KEY_A * len(KEY_B), 'little')
+        b = int.from_bytes(KEY_B * len(KEY_A), 'little')
+        _keystream = (a ^ b).to_bytes(KEY_PERIOD, 'little')
+    return _keystream
+
+def crypt(data, position):
+    """
+    Encrypt or decrypt data stored at `position` of an archive file.
+
+    The cipher is a plain XOR, so the same call does both. The XOR runs on
+    whole integers instead of byte by byte.
+    """
+    if not data:
+        return b''
+    stream = _get_keystream()
+    start = position % KEY_PERIOD
+    end = start + len(data)
+    key = stream[start:end] if end <= KEY_PERIOD else (stream * (end // KEY_PERIOD + 1))[start:end]
+    return (int.from_bytes(data, 'little') ^ int.from_bytes(key, 'little')).to_bytes(len(data), 'little')
+
+# ============================================================================
+# LZ4 Decompression
+# ============================================================================
+
+def decompress_lz4(data, size):
+    """
+    Decompress an LZ4 block (no frame header) of known decompressed size.
+
+    Uses the lz4 package when installed, otherwise a pure Python decoder
+    that copies literals and back-references as slices.
+    """
+    if lz4_block is not None:
+        try:
+            return lz4_block.decompress(data, uncompressed_size=size)
+        except lz4_block.LZ4BlockError as e:
+            raise MVGLFormatError(f"Corrupt LZ4 data: {e}")
+
+    output = bytearray()
+    position = 0
+    end = len(data)
+    try:
+        while True:
+            token = data[position]
+            position += 1
+            length = token >> 4
+            if length == 15:
+                while True:
+                    extra = data[position]
+                    position += 1
+                    length += extra
+                    if extra != 255:
+                        break
+            output += data[position:position + length]
+            position += length
+            if position >= end:
+                break  # The last sequence has literals only
+
+            distance = data[position] | (data[position + 1] << 8)
+            position += 2
+            length = token & 15
+            if length == 15:
+                while True:
+                    extra = data[position]
+                    position += 1
+                    length += extra
+                    if extra != 255:
+                        break
+            length += 4
+            start = len(output) - distance
+            if distance == 0 or start < 0:
+                raise MVGLFormatError("Corrupt LZ4 data: invalid match offset")
+            if length <= distance:
+                output += output[start:start + length]
+            else:
+                # Overlapping match: repeats the last `distance` bytes
+                chunk = output[start:]
+                output += (chunk * (length // distance + 1))[:length]
+    except IndexError:
+        raise MVGLFormatError("Truncated LZ4 data")
+    if len(output) != size:
+        raise MVGLFormatError(f"LZ4 data decompressed to {len(output)} bytes, expected {size}")
+    return bytes(output)
+
+def decode_entry(data, position, encrypted, compressed, extract_size):
+    """Decrypt (if needed) and decompress the stored bytes of an entry found at `position`"""
+    if encrypted:
+        data = crypt(data, position)
+    if compressed:
+        data = decompress_lz4(data, extract_size)
+    return data
+
+# ============================================================================
+# MDB1 Layout
+# ============================================================================
+
+MDB1_MAGIC = b'MDB1'
+
+# magic, tree node count, name count, data entry count, data start, file size
+HEADER = struct.Struct('<4s3I2Q')
+# compare bit, data index, left node, right node
+TREE_NODE = struct.Struct('<4I')
+# offset (relative to data start), size, stored size
+DATA_ENTRY = struct.Struct('<3Q')
+# 4-byte extension (3-letter extensions padded with a space) and name
+NAME_SIZE = 0x80
+EXTENSION_SIZE = 4
+
+NO_NODE = 0xFFFFFFFF
+
+def _decode_name(raw):
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('cp932', errors='replace')
+
+def split_name_entry(raw):
+    """Archive path ('/' separators) of a 0x80-byte name entry"""
+    extension = raw[:EXTENSION_SIZE].split(b'\0', 1)[0].rstrip(b' ')
+    name = raw[EXTENSION_SIZE:].split(b'\0', 1)[0]
+    path = _decode_name(name).replace('\\', '/')
+    return f"{path}.{_decode_name(extension)}" if extension else path
+
+def make_name_entry(path):
+    """
+    The 0x80-byte name entry DSCSTools writes for an archive path.
+
+    Raises:
+        MVGLFormatError: If the extension or name does not fit
+    """
+    directory, _, file_name = path.rpartition('/')
+    stem, dot, extension = file_name.rpartition('.')
+    if not dot or not stem:
+        stem, extension = file_name, ''
+    name = f"{directory}/{stem}" if directory else stem
+    extension = extension.encode('utf-8')
+    name = name.replace('/', '\\').encode('utf-8')
+    if len(extension) > EXTENSION_SIZE:
+        raise MVGLFormatError(f"{path}: extension longer than {EXTENSION_SIZE} characters")
+    if len(name) > NAME_SIZE - EXTENSION_SIZE:
+        raise MVGLFormatError(f"{path}: name longer than {NAME_SIZE - EXTENSION_SIZE} bytes")
+    if len(extension) == 3:
+        extension += b' '
+    return extension.ljust(EXTENSION_SIZE, b'\0') + name.ljust(NAME_SIZE - EXTENSION_SIZE, b'\0')
+
+def _tree_key(name_entry):
+    """Lookup key of a name entry: its bytes up to the first NUL"""
+    return name_entry.split(b'\0', 1)[0]
+
+def _bit(key, bit):
+    """Bit of a key, least significant bit of each byte first; zero past the end"""
+    index = bit >> 3
+    return (key[index] >> (bit & 7)) & 1 if index < len(key) else 0
+
+# ============================================================================
+# MVGL Archives
+# ============================================================================
+
+class MVGLEntry:
+    """One file of an MVGL archive"""
+    __slots__ = ('path', 'id', 'node', 'offset', 'size', 'extract_size')
+
+    def __init__(self, path, entry_id, node, offset, size, extract_size):
+        self.path = path
+        self.id = entry_id                # Data entry index
+        self.node = node                  # Tree node (and name entry) index
+        self.offset = offset              # Absolute offset in the archive
+        self.size = size                  # Stored (possibly compressed) size
+        self.extract_size = extract_size  # Size after decompression
+
+    @property
+    def compressed(self):
+        return self.size != self.extract_size
+
+    def __repr__(self):
+        return f"MVGLEntry({self.path!r}, offset=0x{self.offset:x}, size={self.size}, extract_size={self.extract_size})"
+
+class MVGLArchive(MappedArchive):
+    """Read-only, memory-mapped MVGL (MDB1) archive, plain or encrypted (see MappedArchive)"""
+    format_name = "MVGL"
+    format_error = MVGLFormatError
+    decode = staticmethod(decode_entry)
+
+    # ============================================================================
+    # File Table
+    # ============================================================================
+
+    def _read_tables(self):
+        header = self._map[:HEADER.size]
+        if header[:4] == MDB1_MAGIC:
+            self.encrypted = False
+        elif crypt(header[:4], 0) == MDB1_MAGIC:
+            self.encrypted = True
+            header = crypt(header, 0)
+        else:
+            raise MVGLFormatError("Not an MVGL (MDB1) archive")
+        _magic, node_count, name_count, data_count, self.data_start, _file_size = HEADER.unpack(header)
+
+        names_start = HEADER.size + node_count * TREE_NODE.size
+        data_entries_start = names_start + name_count * NAME_SIZE
+        tables_end = data_entries_start + data_count * DATA_ENTRY.size
+        if tables_end > len(self._map) or name_count < node_count:
+            raise MVGLFormatError("Truncated MVGL file table")
+        tables = self._map[HEADER.size:tables_end]
+        if self.encrypted:
+            tables = crypt(tables, HEADER.size)
+
+        self.nodes = list(TREE_NODE.iter_unpack(tables[:names_start - HEADER.size]))
+        self.name_entries = [tables[offset:offset + NAME_SIZE] for offset in
+                             range(names_start - HEADER.size, data_entries_start - HEADER.size, NAME_SIZE)]
+        data_entries = list(DATA_ENTRY.iter_unpack(tables[data_entries_start - HEADER.size:]))
+
+        self.entries = []
+        for index, (compare_bit, data_id, _left, _right) in enumerate(self.nodes):
+            if compare_bit == NO_NODE or data_id == NO_NODE:
+                continue  # Root node
+            if data_id >= data_count:
+                raise MVGLFormatError(f"Tree node {index} refers to missing data entry {data_id}")
+            offset, size, stored_size = data_entries[data_id]
+            self.entries.append(MVGLEntry(split_name_entry(self.name_entries[index]), data_id, index,
+                                          self.data_start + offset, stored_size, size))
+
+    def lookup(self, path):
+        """
+        Entry with this path found through the archive's name tree (the way
+        the game finds files), or None.
+        """
+        try:
+            key = _tree_key(make_name_entry(path))
+        except MVGLFormatError:
+            return None
+        if len(self.nodes) < 2:
+            return None
+        # Descend from the first real node until a link points back up
+        node = 1
+        while True:
+            compare_bit, _, left, right = self.nodes[node]
+            child = right if _bit(key, compare_bit) else left
+            if child >= len(self.nodes):
+                return None
+            if self.nodes[child][0] <= compare_bit:
+                break
+            node = child
+        if _tree_key(self.name_entries[child]) != key:
+            return None
+        return next((entry for entry in self.entries if entry.node == child), None)
+
+# ============================================================================
+# Name Tree
+# ============================================================================
+
+def _first_difference(keys, start):
+    """
+    First bit >= start on which the (sorted) keys do not all agree.
+
+    Keys passed here always agree on every bit below start, so the bit is in
+    the first byte where the smallest and largest key differ.
+    """
+    first, last = keys[0], keys[-1]
+    index = 0
+    limit = min(len(first), len(last))
+    while index < limit and first[index] == last[index]:
+        index += 1
+    reference = first[index] if index < len(first) else 0
+    differing = 0
+    for key in keys:
+        differing |= (key[index] if index < len(key) else 0) ^ reference
+    bit = index * 8 + (differing & -differing).bit_length() - 1
+    if bit < start:
+        raise MVGLFormatError("Name tree keys are not consistent")
+    return bit
+
+def build_name_tree(keys):
+    """
+    Build the name tree (a PATRICIA trie) the way DSCSTools does.
+
+    Node 0 is the root; node 1 holds the first key and tests bit 0. Each
+    further node tests the first bit on which the keys below it differ and
+    holds one key not already held above it; links that point back up to
+    the node holding a key end a lookup.
+
+    Args:
+        keys: Distinct lookup keys in ascending order
+
+    Returns:
+        list: [compare bit, left, right, key] per node, the root first
+    """
+    nodes = [[NO_NODE, 0, 0, b'']]
+    node_of_key = {}
+    # (parent node, parent bit, keys below, keys held by nodes above, is left link)
+    queue = deque([(0, NO_NODE, keys, frozenset(), False)])
+    while queue:
+        parent, parent_bit, subset, held, is_left = queue.popleft()
+        link = 1 if is_left else 2
+        unheld = [key for key in subset if key not in held]
+        if not unheld:
+            nodes[parent][link] = node_of_key[subset[0]]
+            continue
+
+        start = (parent_bit + 1) & NO_NODE
+        with_node = [key for key in subset if key in held]
+        if not with_node:
+            compare_bit, key = start, unheld[0]
+        else:
+            compare_bit = _first_difference(subset, start)
+            values = {_bit(held_key, compare_bit) for held_key in with_node}
+            if len(values) > 1:
+                key = unheld[0]
+            else:
+                key = next(key for key in unheld if _bit(key, compare_bit) not in values)
+
+        index = len(nodes)
+        nodes[parent][link] = index
+        node_of_key[key] = index
+        nodes.append([compare_bit, 0, 0, key])
+        held = held | {key}
+        left = [subset_key for subset_key in subset if not _bit(subset_key, compare_bit)]
+        right = [subset_key for subset_key in subset if _bit(subset_key, compare_bit)]
+        if left:
+            queue.append((index, compare_bit, left, held, True))
+        if right:
+            queue.append((index, compare_bit, right, held, False))
+    return nodes
+
+# ============================================================================
+# Packing
+# ============================================================================
+
+# Largest block encrypted and written at once
+WRITE_BLOCK = 8 * 1024 * 1024
+
+# Files loaded (and compressed) ahead of the writer, per worker
+READ_AHEAD_PER_WORKER = 4
+
+# Minimum seconds between progress callbacks
+PROGRESS_INTERVAL = 0.1
+
+def collect_files(input_dir):
+    """Files below input_dir as (archive path, file path), sorted by archive path"""
+    files = []
+    for root, _, names in os.walk(input_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            files.append((os.path.relpath(path, input_dir).replace(os.sep, '/'), path))
+    return sorted(files)
+
+def _load_file(path, compress):
+    """Read a file and LZ4-compress it if that makes it smaller; runs in a worker"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if compress and data:
+        packed = lz4_block.compress(data, mode='high_compression', store_size=False)
+        if len(packed) < len(data):
+            return packed, len(data)
+    return data, len(data)
+
+def pack_mvgl(input_dir, output_path, encrypt=True, compress=True, on_progress=None, is_cancelled=None, jobs=None):
+    """
+    Pack a directory into an MVGL archive (same layout as DSCSTools writes).
+
+    Files are read on a thread pool and written in sorted order. Files are
+    stored uncompressed unless compress is set and the lz4 package is
+    installed (stored files are valid MVGL entries, like DSCSToolsCLI
+    --disable-compression produces).
+
+    Args:
+        encrypt: Encrypt the archive (DSCSTools does unless --disable-crypt)
+        compress: LZ4-compress files when the lz4 package is available
+        on_progress: Called with a ToolProgress snapshot dict while packing
+        is_cancelled: Callable returning True to stop (no output is written)
+        jobs: Number of reader threads (default: CPU count)
+
+    Returns:
+        dict: 'processed', 'total', 'failures' (always empty), 'cancelled',
+              'compressed' (number of LZ4-compressed files), 'elapsed' and the final 'snapshot'
+
+    Raises:
+        MVGLFormatError: If the directory is empty or a path cannot be stored
+        OSError: If a file cannot be read or the archive cannot be written
+    """
+    start_time = time.perf_counter()
+    jobs = jobs or os.cpu_count() or 1
+    is_cancelled = is_cancelled or (lambda: False)
+    compress = compress and lz4_block is not None
+    result = {'processed': 0, 'total': 0, 'failures': [], 'cancelled': False, 'compressed': 0, 'elapsed': 0.0}
+
+    files = collect_files(input_dir)
+    if not files:
+        raise MVGLFormatError("No files to pack")
+    name_entries = [make_name_entry(archive_path) for archive_path, _ in files]
+    # The game looks files up by the name entry up to its first NUL, so
+    # extensions shorter than 3 characters hide the rest of the name
+    keys = [_tree_key(name_entry) for name_entry in name_entries]
+    seen = {}
+    for (archive_path, _), key in zip(files, keys):
+        if not key:
+            raise MVGLFormatError(f"{archive_path}: files need an extension")
+        if key in seen:
+            raise MVGLFormatError(f"{archive_path} and {seen[key]} cannot both be looked up"
+                                  " (extensions of 1-2 characters)")
+        seen[key] = archive_path
+    data_index = {key: index for index, key in enumerate(keys)}
+    nodes = build_name_tree(sorted(keys))
+
+    count = len(files)
+    result['total'] = count
+    data_start = HEADER.size + (count + 1) * (TREE_NODE.size + NAME_SIZE) + count * DATA_ENTRY.size
+    bytes_total = sum(os.path.getsize(path) for _, path in files)
+    bytes_done = 0
+    last_report = 0.0
+
+    def snapshot():
+        return counter_snapshot(result['processed'], count, bytes_done, bytes_total,
+                                time.perf_counter() - start_time)
+
+    data_entries = []
+    temp_path = f"{output_path}.tmp{os.getpid()}"
+    try:
+        with open(temp_path, 'wb') as target, ThreadPoolExecutor(max_workers=jobs) as readers:
+            position = data_start
+            target.seek(position)
+            pending = deque()
+            queued = iter(files)
+
+            def submit_next():
+                next_file = next(queued, None)
+                if next_file is not None:
+                    pending.append(readers.submit(_load_file, next_file[1], compress))
+
+            for _ in range(jobs * READ_AHEAD_PER_WORKER):
+                submit_next()
+            while pending:
+                if is_cancelled():
+                    result['cancelled'] = True
+                    for future in pending:
+                        future.cancel()
+                    break
+                data, size = pending.popleft().result()
+                submit_next()
+                data_entries.append((position - data_start, size, len(data)))
+                for block in range(0, len(data), WRITE_BLOCK):
+                    chunk = data[block:block + WRITE_BLOCK]
+                    target.write(crypt(chunk, position + block) if encrypt else chunk)
+                position += len(data)
+                result['processed'] += 1
+                result['compressed'] += len(data) != size
+                bytes_done += size
+                now = time.perf_counter()
+                if on_progress and now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    on_progress(snapshot())
+
+            if not result['cancelled']:
+                tables = bytearray(HEADER.pack(MDB1_MAGIC, count + 1, count + 1, count, data_start, position))
+                for compare_bit, left, right, key in nodes:
+                    data_id = data_index[key] if key else NO_NODE
+                    tables += TREE_NODE.pack(compare_bit, data_id, left, right)
+                entry_of_key = dict(zip(keys, name_entries))
+                for node in nodes:
+                    tables += entry_of_key[node[3]] if node[3] else bytes(NAME_SIZE)
+                for entry in data_entries:
+                    tables += DATA_ENTRY.pack(*entry)
+                target.seek(0)
+                target.write(crypt(tables, 0) if encrypt else tables)
+
+        if not result['cancelled']:
+            _verify(temp_path, [archive_path for archive_path, _ in files])
+            os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    result['snapshot'] = snapshot()
+    result['elapsed'] = time.perf_counter() - start_time
+    return result
+
+def _verify(path, archive_paths):
+    """Re-open the written archive and look every file up through its name tree"""
+    with MVGLArchive(path) as archive:
+        if len(archive.entries) != len(archive_paths):
+            raise MVGLFormatError("Packed archive failed verification: entry count differs")
+        for archive_path in archive_paths:
+            entry = archive.lookup(archive_path)
+            if entry is None or entry.path != archive_path:
+                raise MVGLFormatError(f"Packed archive failed verification: {archive_path}")
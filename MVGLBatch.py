@@ -0,0 +1,99 @@
+import os
+
+from AppPaths import get_dscstools_path, get_tool_working_dir
+from ArchiveExtract import extract_entries, parse_patterns, format_listing
+from MVGLArchive import MVGLArchive, MVGLFormatError, pack_mvgl
+from ProcessRunner import ProcessRunner
+from ToolProgress import ProgressTracker, parser_for_command, run_with_progress
+
+# ============================================================================
+# Command Builders
+# ============================================================================
+
+def extract_command(source, target):
+    """Build the extract command: DSCSToolsCLI.exe --extract <MVGL> <OUT_FOLDER>"""
+    return [get_dscstools_path(), "--extract", source, target]
+
+def pack_command(source, target):
+    """Build the pack command: DSCSToolsCLI.exe --pack <IN_FOLDER> <MVGL>"""
+    return [get_dscstools_path(), "--pack", source, target]
+
+# ============================================================================
+# Headless Execution
+# ============================================================================
+
+def make_progress_tracker(command):
+    """Progress tracker for a command built by this module (input/output paths from its arguments)"""
+    return ProgressTracker(parser_for_command(command), command[2], command[3])
+
+def run_command(command, on_output=None, timeout=None, on_progress=None):
+    """
+    Run a DSCSToolsCLI command to completion, streaming its output.
+
+    Args:
+        on_output: Called with each output line
+        timeout: Seconds after which the tool is killed
+        on_progress: Called periodically with a ToolProgress snapshot dict
+
+    Returns:
+        tuple: (returncode, final progress snapshot)
+
+    Raises:
+        TimeoutError: If the tool ran longer than `timeout` seconds
+    """
+    if not os.path.exists(command[0]):
+        raise FileNotFoundError(f"DSCSToolsCLI.exe not found at {command[0]}")
+    runner = ProcessRunner(command, cwd=get_tool_working_dir(), on_output=on_output,
+                           merge_stderr=True, timeout=timeout)
+    snapshot = run_with_progress(runner, make_progress_tracker(command), on_progress)
+    if runner.timed_out:
+        raise TimeoutError(f"{os.path.basename(command[0])} timed out after {timeout}s")
+    return runner.returncode, snapshot
+
+# ============================================================================
+# Built-in Reader
+# ============================================================================
+
+def list_entries(input_file, patterns=None):
+    """
+    List the files of an MVGL archive without extracting anything.
+
+    Returns:
+        list: MVGLEntry objects in archive order, filtered by glob patterns
+    """
+    with MVGLArchive(input_file) as archive:
+        return archive.find(patterns)
+
+def extract_native(input_file, output_dir, patterns=None, on_progress=None, is_cancelled=None, jobs=None):
+    """
+    Extract files with the built-in MVGL reader (no external tool).
+
+    See ArchiveExtract.extract_entries for the arguments and the returned dict.
+
+    Raises:
+        MVGLFormatError: If the archive cannot be read
+    """
+    with MVGLArchive(input_file) as archive:
+        return extract_entries(archive, output_dir, patterns, on_progress, is_cancelled, jobs)
+
+# ============================================================================
+# Built-in Packer
+# ============================================================================
+
+def pack_native(input_dir, output_file, encrypt=True, on_progress=None, is_cancelled=None, jobs=None):
+    """
+    Pack a folder into an MVGL archive with the built-in packer (no external tool).
+
+    Creates the output file's directory if it doesn't exist. See
+    MVGLArchive.pack_mvgl for the arguments and the returned dict.
+
+    Raises:
+        MVGLFormatError: If the folder cannot be packed
+    """
+    if not os.path.isdir(input_dir):
+        raise MVGLFormatError(f"Folder not found: {input_dir}")
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    return pack_mvgl(input_dir, output_file, encrypt=encrypt, on_progress=on_progress,
+                     is_cancelled=is_cancelled, jobs=jobs)
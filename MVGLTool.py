@@ -1,108 +1,124 @@
 import os
-import subprocess
-import sys
-import signal
-import atexit
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QLineEdit, QFileDialog, QProgressBar, QMessageBox, QGroupBox
+    QLineEdit, QFileDialog, QProgressBar, QMessageBox, QGroupBox, QCheckBox
 )
 from PyQt6.QtCore import QThread, pyqtSignal
 
-# Global list to track running processes
-running_processes = []
+import MVGLBatch
+from AppPaths import get_tool_working_dir
+from ProcessRunner import ProcessRunner, install_signal_handlers
+from ToolProgress import run_with_progress, format_status, format_summary
 
-def cleanup_processes():
-    """Cleanup function to terminate all running processes when application exits"""
-    for process in running_processes[:]:  # Copy list to avoid modification during iteration
-        try:
-            if process.poll() is None:  # Process is still running
-                process.terminate()
-                # Wait a bit for graceful termination
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    # Force kill if it doesn't terminate gracefully
-                    process.kill()
-                    process.wait()
-            running_processes.remove(process)
-        except Exception:
-            pass
-
-# Register cleanup function
-atexit.register(cleanup_processes)
-
-# Handle application exit signals
-def signal_handler(signum, frame):
-    cleanup_processes()
-    sys.exit(0)
-
-signal.signal(signal.SIGTERM, signal_handler)
-signal.signal(signal.SIGINT, signal_handler)
+# Terminate running tools when the application is interrupted
+install_signal_handlers()
+
+# Seconds between progress updates
+PROGRESS_INTERVAL = 0.25
 
 class WorkerThread(QThread):
     progress_signal = pyqtSignal(int)
+    status_signal = pyqtSignal(str)
     finished_signal = pyqtSignal(bool, str)
 
-    def __init__(self, command):
+    def __init__(self, command, tracker):
         super().__init__()
         self.command = command
+        self.tracker = tracker
+        self.runner = None
+        self.cancel_requested = False
 
     def run(self):
-        process = None
         try:
             self.progress_signal.emit(5)  # Starting process
-            process = subprocess.Popen(
-                self.command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                cwd=os.path.dirname(sys.executable) if hasattr(sys, '_MEIPASS') else None
-            )
-
-            # Add process to global tracking list
-            running_processes.append(process)
+            self.runner = ProcessRunner(self.command, cwd=get_tool_working_dir(), merge_stderr=True)
+            if self.cancel_requested:
+                self.runner.cancel()  # Cancelled before the runner existed; it will not start
 
             self.progress_signal.emit(15)  # Process started
+            snapshot = run_with_progress(self.runner, self.tracker, self._report_progress, PROGRESS_INTERVAL)
+            rc = self.runner.returncode
 
-            # Monitor process with more granular progress
-            import time
-            start_time = time.time()
-            estimated_duration = 300.0  # Assume 300 seconds for typical operations
-
-            while True:
-                if process.poll() is not None:
-                    break
-
-                # Calculate progress based on elapsed time
-                elapsed = time.time() - start_time
-                time_progress = min(70, int((elapsed / estimated_duration) * 70))
-                self.progress_signal.emit(15 + time_progress)
+            self.progress_signal.emit(100)
+            self.status_signal.emit("")
+            if self.runner.cancelled:
+                self.finished_signal.emit(False, "Cancelled")
+            elif rc == 0:
+                self.finished_signal.emit(True, f"Completed successfully - {format_summary(snapshot)}")
+            else:
+                self.finished_signal.emit(False, f"Error: Exit code {rc}")
+        except Exception as e:
+            self.progress_signal.emit(100)
+            self.finished_signal.emit(False, f"Error: {str(e)}")
 
-                # Read output to prevent blocking
-                output = process.stdout.readline()
-                if output:
-                    # Could parse output for more specific progress if available
-                    pass
+    def _report_progress(self, snapshot):
+        """Map tool progress to 15% - 95%"""
+        if snapshot['fraction'] is not None:
+            self.progress_signal.emit(15 + int(snapshot['fraction'] * 80))
+        self.status_signal.emit(format_status(snapshot))
+
+    def cancel(self):
+        """Kill the running tool"""
+        self.cancel_requested = True
+        if self.runner:
+            self.runner.cancel()
+
+def describe_extract(result):
+    """Completion state and message of MVGLBatch.extract_native"""
+    summary = format_summary(result['snapshot'])
+    if result['total'] == 0:
+        return False, "No files in the archive match the selected patterns"
+    if result['failures']:
+        report = "\n".join(f"- {path}: {message}" for path, message in result['failures'][:10])
+        return False, f"Completed with errors - {summary}\n\n{report}"
+    return True, f"Completed successfully - {summary}"
+
+def describe_pack(result):
+    """Completion state and message of MVGLBatch.pack_native"""
+    summary = format_summary(result['snapshot'])
+    if result['compressed']:
+        summary += f" ({result['compressed']} compressed)"
+    return True, f"Packed successfully - {summary}"
+
+class NativeThread(QThread):
+    """Run a built-in MVGL operation; same signals as WorkerThread"""
+    progress_signal = pyqtSignal(int)
+    status_signal = pyqtSignal(str)
+    finished_signal = pyqtSignal(bool, str)
 
-                time.sleep(0.1)  # Small delay to prevent CPU overuse
+    def __init__(self, task, describe, *args, **kwargs):
+        super().__init__()
+        self.task = task
+        self.describe = describe
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
 
-            rc = process.poll()
-            self.progress_signal.emit(95)  # Almost done
+    def run(self):
+        try:
+            self.progress_signal.emit(5)  # Reading archive tables or folder
+            result = self.task(*self.args, **self.kwargs, on_progress=self._report_progress,
+                               is_cancelled=lambda: self.cancelled)
 
-            if rc == 0:
-                self.progress_signal.emit(100)
-                self.finished_signal.emit(True, "Completed successfully")
+            self.progress_signal.emit(100)
+            self.status_signal.emit("")
+            if result['cancelled']:
+                self.finished_signal.emit(False, "Cancelled")
             else:
-                self.progress_signal.emit(100)
-                self.finished_signal.emit(False, f"Error: Exit code {rc}")
+                self.finished_signal.emit(*self.describe(result))
         except Exception as e:
             self.progress_signal.emit(100)
             self.finished_signal.emit(False, f"Error: {str(e)}")
-        finally:
-            # Remove process from tracking list when done
-            if process and process in running_processes:
-                running_processes.remove(process)
+
+    def _report_progress(self, snapshot):
+        """Map operation progress to 5% - 95%"""
+        if snapshot['fraction'] is not None:
+            self.progress_signal.emit(5 + int(snapshot['fraction'] * 90))
+        self.status_signal.emit(format_status(snapshot))
+
+    def cancel(self):
+        """Stop before the next file"""
+        self.cancelled = True
 
 class MVGLTool(QWidget):
     """
@@ -110,10 +126,12 @@ class MVGLTool(QWidget):
 
     Features:
     - Extract MVGL files to individual files
-    - Repack individual files back into MVGL format
-    - Progress monitoring with real-time updates
+    - Built-in MVGL reader: list contents and extract glob-selected files without DSCSTools
+      (works on Linux too), decompressing on all CPU cores
+    - Repack individual files back into MVGL format, with a built-in packer or DSCSTools
+    - Progress monitoring with real-time updates and a Cancel button
     - Process management for clean application exit
-    - Uses DSCSTools CLI for high-quality conversions
+    - Uses DSCSTools CLI when the built-in reader/packer is turned off
     """
     def __init__(self):
         super().__init__()
@@ -180,6 +198,30 @@ class MVGLTool(QWidget):
 
         extract_layout.addLayout(target_layout)
 
+        # File selection (built-in reader only)
+        files_layout = QHBoxLayout()
+        files_label = QLabel("Files:")
+        files_label.setStyleSheet("font-weight: bold; color: #495057;")
+        files_layout.addWidget(files_label)
+
+        self.extract_files_edit = QLineEdit()
+        self.extract_files_edit.setPlaceholderText("Glob patterns, e.g. text/*.mbe; images/*.img (empty = all files)")
+        self.extract_files_edit.setToolTip("Only extract files whose path in the archive matches one of these patterns")
+        files_layout.addWidget(self.extract_files_edit)
+
+        list_files_btn = QPushButton("📋 List Files")
+        list_files_btn.setToolTip("Show the files of the MVGL (matching the patterns) without extracting")
+        list_files_btn.clicked.connect(self.list_files)
+        files_layout.addWidget(list_files_btn)
+
+        extract_layout.addLayout(files_layout)
+
+        self.native_extract_check = QCheckBox("Use built-in reader")
+        self.native_extract_check.setChecked(True)
+        self.native_extract_check.setToolTip("Read the MVGL directly instead of running DSCSTools (needed for file patterns)")
+        self.native_extract_check.toggled.connect(self.extract_files_edit.setEnabled)
+        extract_layout.addWidget(self.native_extract_check)
+
         extract_btn = QPushButton("🚀 Extract Files")
         extract_btn.setToolTip("Start extracting MVGL file")
         extract_btn.clicked.connect(self.extract)
@@ -245,6 +287,21 @@ class MVGLTool(QWidget):
 
         pack_layout.addLayout(pack_target_layout)
 
+        pack_options_layout = QHBoxLayout()
+        self.native_pack_check = QCheckBox("Use built-in packer")
+        self.native_pack_check.setChecked(True)
+        self.native_pack_check.setToolTip("Write the MVGL directly instead of running DSCSTools")
+        pack_options_layout.addWidget(self.native_pack_check)
+
+        self.encrypt_check = QCheckBox("Encrypt archive")
+        self.encrypt_check.setChecked(True)
+        self.encrypt_check.setToolTip("Encrypt the MVGL like DSCSTools does (built-in packer only)")
+        self.native_pack_check.toggled.connect(self.encrypt_check.setEnabled)
+        pack_options_layout.addWidget(self.encrypt_check)
+        pack_options_layout.addStretch()
+
+        pack_layout.addLayout(pack_options_layout)
+
         pack_btn = QPushButton("🔧 Repack Files")
         pack_btn.setToolTip("Start repacking files into MVGL")
         pack_btn.clicked.connect(self.pack)
@@ -253,6 +310,18 @@ class MVGLTool(QWidget):
         pack_group.setLayout(pack_layout)
         layout.addWidget(pack_group)
 
+        # Cancel (shared by all operations)
+        cancel_layout = QHBoxLayout()
+        cancel_layout.addStretch()
+
+        self.cancel_btn = QPushButton("⏹️ Cancel")
+        self.cancel_btn.setToolTip("Stop the running operation")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_operation)
+        cancel_layout.addWidget(self.cancel_btn)
+
+        layout.addLayout(cancel_layout)
+
         # Progress bar - compact
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
@@ -305,11 +374,33 @@ class MVGLTool(QWidget):
             QMessageBox.warning(self, "Warning", "Please select source file and destination directory")
             return
 
-        tools_dir = os.path.join(os.getcwd(), "Tools", "DSCSTools")
-        # TODO: Update to use get_tools_path() when available
-        command = [os.path.join(tools_dir, "DSCSToolsCLI.exe"), "--extract", source, target]
+        if self.native_extract_check.isChecked():
+            patterns = MVGLBatch.parse_patterns(self.extract_files_edit.text())
+            self.start_worker(NativeThread(MVGLBatch.extract_native, describe_extract, source, target, patterns))
+            return
+
+        command = MVGLBatch.extract_command(source, target)
         self.run_command(command)
 
+    def list_files(self):
+        """Show the archive's files matching the patterns"""
+        source = self.extract_source_edit.text()
+        if not source:
+            QMessageBox.warning(self, "Warning", "Please select source file")
+            return
+
+        try:
+            entries = MVGLBatch.list_entries(source, MVGLBatch.parse_patterns(self.extract_files_edit.text()))
+        except (OSError, MVGLBatch.MVGLFormatError) as e:
+            QMessageBox.critical(self, "Error", f"Cannot read MVGL file: {str(e)}")
+            return
+
+        box = QMessageBox(self)
+        box.setWindowTitle("MVGL Contents")
+        box.setText(f"{len(entries)} file(s) in {os.path.basename(source)}")
+        box.setDetailedText(MVGLBatch.format_listing(entries))
+        box.exec()
+
     def pack(self):
         """Pack files into MVGL archive"""
         source = self.pack_source_edit.text()
@@ -318,8 +409,12 @@ class MVGLTool(QWidget):
             QMessageBox.warning(self, "Warning", "Please select source directory and destination file")
             return
 
-        tools_dir = os.path.join(os.getcwd(), "Tools", "DSCSTools")
-        command = [os.path.join(tools_dir, "DSCSToolsCLI.exe"), "--pack", source, target]
+        if self.native_pack_check.isChecked():
+            self.start_worker(NativeThread(MVGLBatch.pack_native, describe_pack, source, target,
+                                           encrypt=self.encrypt_check.isChecked()))
+            return
+
+        command = MVGLBatch.pack_command(source, target)
         self.run_command(command)
 
     # ============================================================================
@@ -328,12 +423,23 @@ class MVGLTool(QWidget):
 
     def run_command(self, command):
         """Execute command in worker thread with progress monitoring"""
+        self.start_worker(WorkerThread(command, MVGLBatch.make_progress_tracker(command)))
+
+    def start_worker(self, worker):
+        """Connect a worker's signals and start it"""
         self.progress_bar.setValue(0)
-        self.worker = WorkerThread(command)
+        self.cancel_btn.setEnabled(True)
+        self.worker = worker
         self.worker.progress_signal.connect(self.update_progress)
+        self.worker.status_signal.connect(self.update_status)
         self.worker.finished_signal.connect(self.command_finished)
         self.worker.start()
 
+    def cancel_operation(self):
+        """Kill the running tool or stop the built-in operation before its next file"""
+        self.cancel_btn.setEnabled(False)
+        self.worker.cancel()
+
     # ============================================================================
     # Progress and UI Update Methods
     # ============================================================================
@@ -342,8 +448,13 @@ class MVGLTool(QWidget):
         """Update progress bar value"""
         self.progress_bar.setValue(value)
 
+    def update_status(self, status):
+        """Show entries, bytes and ETA next to the percentage"""
+        self.progress_bar.setFormat(f"%p% - {status}" if status else "%p%")
+
     def command_finished(self, success, message):
         """Handle command completion with user notification"""
+        self.cancel_btn.setEnabled(False)
         self.progress_bar.setValue(100)
         if success:
             QMessageBox.information(self, "Success", message)
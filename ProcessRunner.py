@@ -0,0 +1,189 @@
+import sys
+import signal
+import atexit
+import threading
+import subprocess
+
+# Hide console windows of external tools on Windows
+if sys.platform == 'win32':
+    CREATE_NO_WINDOW = subprocess.CREATE_NO_WINDOW
+else:
+    CREATE_NO_WINDOW = 0
+
+# Runners whose process has not exited yet
+_active_runners = set()
+_active_lock = threading.Lock()
+
+class ProcessRunner:
+    """
+    Run an external tool and stream its output without polling.
+
+    stdout and stderr are drained line by line on background threads, so a
+    chatty tool can never block on a full pipe. A waiter thread blocks in
+    the OS until the process exits and then signals wait(), so completion
+    is seen immediately instead of on the next poll tick.
+
+    Callbacks run on the reader threads; they must be thread-safe (Qt
+    signal emits are).
+    """
+    def __init__(self, command, cwd=None, on_output=None, on_error=None,
+                 merge_stderr=False, timeout=None, capture=False):
+        """
+        Args:
+            command: Argument list of the tool to run
+            cwd: Working directory of the process
+            on_output: Called with each stdout line (without line ending)
+            on_error: Called with each stderr line; defaults to on_output
+            merge_stderr: Redirect stderr into stdout (keeps relative order)
+            timeout: Seconds after which the process is killed, None for no limit
+            capture: Keep all output lines in self.output / self.errors
+        """
+        self.command = command
+        self.cwd = cwd
+        self.on_output = on_output
+        self.on_error = on_error or on_output
+        self.merge_stderr = merge_stderr
+        self.timeout = timeout
+        self.capture = capture
+
+        self.process = None
+        self.output = []
+        self.errors = []
+        self.cancelled = False
+        self.timed_out = False
+        self._done = threading.Event()
+        self._threads = []
+        self._timer = None
+
+    # ============================================================================
+    # Lifecycle
+    # ============================================================================
+
+    def start(self):
+        """Start the process (raises OSError if the tool cannot be launched)"""
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if self.merge_stderr else subprocess.PIPE,
+            text=True,
+            errors='replace',
+            cwd=self.cwd,
+            creationflags=CREATE_NO_WINDOW
+        )
+        with _active_lock:
+            _active_runners.add(self)
+        if self.cancelled:
+            self._kill()  # Cancelled while launching
+
+        self._threads = [self._spawn(self._read_pipe, self.process.stdout, self.on_output, self.output)]
+        if not self.merge_stderr:
+            self._threads.append(self._spawn(self._read_pipe, self.process.stderr, self.on_error, self.errors))
+
+        if self.timeout is not None:
+            self._timer = threading.Timer(self.timeout, self._on_timeout)
+            self._timer.daemon = True
+            self._timer.start()
+
+        self._spawn(self._wait_for_exit)
+        return self
+
+    def wait(self, timeout=None):
+        """
+        Block until the process has exited and all output was delivered.
+
+        Returns:
+            bool: True if finished, False if `timeout` seconds elapsed first
+        """
+        return self._done.wait(timeout)
+
+    def run(self):
+        """Start the process, wait for it and return its exit code"""
+        self.start()
+        self.wait()
+        return self.returncode
+
+    def cancel(self):
+        """Kill the process; wait() returns as soon as it is gone"""
+        self.cancelled = True
+        self._kill()
+
+    @property
+    def returncode(self):
+        """Exit code, or None while running"""
+        return self.process.returncode if self._done.is_set() else None
+
+    @property
+    def running(self):
+        return self.process is not None and not self._done.is_set()
+
+    # ============================================================================
+    # Background Threads
+    # ============================================================================
+
+    @staticmethod
+    def _spawn(target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
+
+    def _read_pipe(self, pipe, callback, lines):
+        with pipe:
+            for line in pipe:
+                line = line.rstrip('\r\n')
+                if self.capture:
+                    lines.append(line)
+                if callback:
+                    callback(line)
+
+    def _wait_for_exit(self):
+        self.process.wait()
+        if self._timer:
+            self._timer.cancel()
+        for thread in self._threads:
+            thread.join()
+        with _active_lock:
+            _active_runners.discard(self)
+        self._done.set()
+
+    def _on_timeout(self):
+        self.timed_out = True
+        self._kill()
+
+    def _kill(self):
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.process.kill()
+            except OSError:
+                pass  # Already exited
+
+# ============================================================================
+# Application Exit Handling
+# ============================================================================
+
+def cleanup_processes():
+    """Terminate all running processes when application exits"""
+    with _active_lock:
+        runners = list(_active_runners)
+    for runner in runners:
+        try:
+            runner.process.terminate()
+            # Wait a bit for graceful termination
+            try:
+                runner.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                # Force kill if it doesn't terminate gracefully
+                runner.process.kill()
+        except Exception:
+            pass
+
+atexit.register(cleanup_processes)
+
+def _signal_handler(signum, frame):
+    cleanup_processes()
+    sys.exit(0)
+
+def install_signal_handlers():
+    """Terminate running tools on SIGTERM/SIGINT (call from the main thread)"""
+    signal.signal(signal.SIGTERM, _signal_handler)
+    signal.signal(signal.SIGINT, _signal_handler)
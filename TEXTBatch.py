@@ -0,0 +1,612 @@
+import io
+import os
+import csv
+import time
+import fnmatch
+import contextlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from ArchiveExtract import parse_patterns
+from ContentCache import file_state, hash_file, load_manifest, save_manifest
+from ToolProgress import counter_snapshot, format_bytes
+from TSVIndex import TSVIndex, build_index, read_spans, remove_index, index_path
+
+# Rows between progress updates while streaming a file
+PROGRESS_ROWS = 4096
+
+# CSV files kept open at once while splitting a TSV
+MAX_OPEN_WRITERS = 64
+
+# Read-ahead of a parallel merge: CSV files read but not yet written, limited
+# in number per reader thread and in total (source) bytes
+READ_AHEAD_PER_READER = 4
+READ_AHEAD_BYTES = 64 * 1024 * 1024
+
+def default_merge_readers():
+    """Reader threads of a merge; opening and reading files is I/O bound, so more than the cores"""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+def _noop_progress(value):
+    pass
+
+# ============================================================================
+# Merge CSV to TSV
+# ============================================================================
+
+def merge_csv_to_tsv(source, target, progress=None, jobs=None, index=False):
+    """Merge multiple CSV files from subdirectories into a single TSV file"""
+    result = merge_csv_files(source, target, progress, jobs, index)
+    if result['error']:
+        return result['error']
+    snapshot = result['snapshot']
+    elapsed = max(result['elapsed'], 1e-6)
+    return (f"Merge completed - {result['rows']} rows from {result['files']} files,"
+            f" {format_bytes(snapshot['bytes_done'])} in {elapsed:.1f}s"
+            f" ({snapshot['bytes_done'] / (1024 * 1024) / elapsed:.1f} MB/s)"
+            + (", index written" if result['indexed'] else ""))
+
+def merge_csv_files(source, target, progress=None, jobs=None, index=False):
+    """
+    Merge the CSV files of source's subdirectories into one TSV file.
+
+    With one job, rows are streamed from each CSV through line-break
+    escaping straight into the TSV writer, so memory use does not grow with
+    the input. With more, reader threads open and parse whole files ahead
+    of the writer (at most READ_AHEAD_PER_READER files each and
+    READ_AHEAD_BYTES in total, so memory stays bounded), which hides
+    the latency of slow or network drives; the writer still takes files in
+    order, so the TSV is byte-identical either way. The TSV is only created
+    once a first row has been read.
+
+    Args:
+        progress: Called with a percentage (15-95) while merging
+        jobs: Number of reader threads (default: default_merge_readers(), 1 = read in this thread)
+        index: Also write a sidecar index (<target>.idx, see TSVIndex) so
+               split_tsv_files can read single files without a full scan;
+               otherwise an existing index of target is deleted
+
+    Returns:
+        dict: 'files', 'rows' (without header), 'error' (None or a message),
+              'indexed', 'elapsed' and the final 'snapshot' (files and bytes read)
+    """
+    start_time = time.perf_counter()
+    progress = progress or _noop_progress
+    result = {'files': 0, 'rows': 0, 'error': None, 'indexed': False, 'elapsed': 0.0,
+              'snapshot': counter_snapshot(0, 0, 0, 0, 0.0)}
+    progress(15)  # Starting scan
+
+    csv_dirs = scan_csv_directories(source)
+    if not csv_dirs:
+        result['error'] = "No directories containing CSV files found"
+        return result
+
+    progress(25)  # Scan complete, starting processing
+
+    csv_files = [(f"{dir_name}/{csv_file}", os.path.join(dir_path, csv_file))
+                 for dir_name, dir_path, files in csv_dirs for csv_file in files]
+    jobs = min(jobs or default_merge_readers(), len(csv_files))
+    bytes_total = 0
+    bytes_done = 0
+
+    def report(files_done, file_bytes):
+        nonlocal bytes_done
+        bytes_done = file_bytes
+        result['files'] = files_done
+        if bytes_total:
+            progress(25 + int((bytes_done / bytes_total) * 70))  # 25% to 95%
+
+    tsv_index = TSVIndex() if index else None
+    if jobs <= 1:
+        bytes_total = sum(os.path.getsize(csv_path) for _, csv_path in csv_files)
+        rows = escape_line_breaks(iter_merged_rows(csv_files, result, report))
+        first_row = next(rows, None)
+        written = first_row is not None
+        if written:
+            write_tsv_file(target, rows, first_row, tsv_index)
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as readers:
+            sizes = list(readers.map(os.path.getsize, [csv_path for _, csv_path in csv_files]))
+            bytes_total = sum(sizes)
+            written = _merge_parallel(readers, jobs, csv_files, sizes, target, result, report, tsv_index)
+
+    if written:
+        if tsv_index is not None:
+            tsv_index.save(target)
+            result['indexed'] = True
+        else:
+            remove_index(target)  # It would describe an older TSV
+
+    progress(95)  # Write complete
+    result['elapsed'] = time.perf_counter() - start_time
+    result['snapshot'] = counter_snapshot(result['files'], len(csv_files), bytes_done, bytes_total,
+                                          result['elapsed'])
+    return result
+
+# ============================================================================
+# Split TSV to CSV
+# ============================================================================
+
+def split_tsv_to_csv(tsv_path, target_dir, progress=None, patterns=None, incremental=False):
+    """Split TSV file into multiple CSV files organized by subdirectories"""
+    result = split_tsv_files(tsv_path, target_dir, progress, patterns, incremental)
+    if result['error']:
+        return result['error']
+    snapshot = result['snapshot']
+    elapsed = max(result['elapsed'], 1e-6)
+    return (f"Split completed - {result['rows']} rows into {result['files']} files,"
+            f" {format_bytes(snapshot['bytes_done'])} in {elapsed:.1f}s"
+            f" ({snapshot['bytes_done'] / (1024 * 1024) / elapsed:.1f} MB/s)"
+            + (", read through the index" if result['indexed'] else "")
+            + (f" ({result['written']} written, {result['skipped']} skipped, {result['removed']} removed)"
+               if incremental else ""))
+
+def split_tsv_files(tsv_path, target_dir, progress=None, patterns=None, incremental=False):
+    """
+    Split a merged TSV back into CSV files organized by subdirectories.
+
+    The TSV is read once; each row goes straight to the CSV writer of its
+    metadata ('dir/file.csv'), and at most MAX_OPEN_WRITERS files are kept
+    open (see CSVWriterPool), so memory does not grow with the TSV size.
+
+    With patterns, only the matching files are written. If the TSV has an
+    up-to-date sidecar index (see TSVIndex) their rows are read directly
+    from the indexed byte ranges instead of scanning the whole TSV.
+
+    Incremental splits write each file to a temporary file first and only
+    replace CSV files whose content changed, so unchanged files keep their
+    modification time and a following incremental MBE repack skips them.
+    A full incremental split also removes the CSV files an earlier split of
+    the same TSV produced for groups that are no longer in it (see
+    SplitManifest).
+
+    Args:
+        progress: Called with a percentage (15-95) from the bytes read
+        patterns: Glob patterns on the metadata ('dir/file.csv') of the files to write (None or empty: all)
+        incremental: Leave CSV files with unchanged content untouched
+
+    Returns:
+        dict: 'files' (CSV files produced), 'rows' (without headers), 'error'
+              (None or a message), 'indexed' (read through the index),
+              'written', 'skipped' (unchanged) and 'removed' file counts,
+              'elapsed' and the final 'snapshot'
+    """
+    start_time = time.perf_counter()
+    progress = progress or _noop_progress
+    result = {'files': 0, 'rows': 0, 'error': None, 'indexed': False,
+              'written': 0, 'skipped': 0, 'removed': 0, 'elapsed': 0.0,
+              'snapshot': counter_snapshot(0, 0, 0, 0, 0.0)}
+    progress(15)  # Starting read
+
+    manifest = SplitManifest(target_dir) if incremental else None
+    tsv_index = TSVIndex.load(tsv_path) if patterns else None
+    if tsv_index is not None and tsv_index.header and 'metadata' in tsv_index.header:
+        bytes_done, bytes_total = _split_indexed(tsv_path, tsv_index, patterns, target_dir, result, progress,
+                                                 manifest)
+    else:
+        bytes_done, bytes_total = _split_scan(tsv_path, patterns, target_dir, result, progress, manifest)
+
+    if result['error'] is None and patterns and not result['files']:
+        result['error'] = "No rows in the TSV match the selected patterns"
+    if result['error']:
+        return result
+
+    if manifest is not None:
+        if not patterns:
+            result['removed'] = manifest.remove_stale(tsv_path)
+        manifest.save()
+
+    progress(95)  # Write complete
+    result['elapsed'] = time.perf_counter() - start_time
+    result['snapshot'] = counter_snapshot(result['files'], result['files'], bytes_done, bytes_total,
+                                          result['elapsed'])
+    return result
+
+def _split_scan(tsv_path, patterns, target_dir, result, progress, manifest=None):
+    """Split by reading the whole TSV; returns (bytes done, bytes total)"""
+    bytes_total = os.path.getsize(tsv_path)
+    bytes_done = 0
+    selected = {}  # metadata -> matches patterns
+
+    with open(tsv_path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter='\t')
+        headers = next(reader, None)
+        if headers is None:
+            result['error'] = "TSV file is empty"
+            return 0, bytes_total
+        if 'metadata' not in headers:
+            result['error'] = "TSV file does not have metadata column"
+            return 0, bytes_total
+
+        metadata_idx = headers.index('metadata')
+        headers_no_meta = headers[:-1]  # Remove metadata column
+
+        progress(25)  # Validation complete, starting split
+
+        with CSVWriterPool(target_dir, headers_no_meta, manifest=manifest, source=tsv_path) as writers:
+            for rows_read, row in enumerate(reader, 1):
+                if rows_read % PROGRESS_ROWS == 0:
+                    bytes_done = f.buffer.tell()
+                    progress(25 + int((bytes_done / bytes_total) * 70))  # 25% to 95%
+                metadata = row[metadata_idx]
+                if patterns:
+                    if metadata not in selected:
+                        selected[metadata] = any(fnmatch.fnmatchcase(metadata, pattern) for pattern in patterns)
+                    if not selected[metadata]:
+                        continue
+                writers.write(metadata, unescape_line_breaks(row[:-1]))
+                result['rows'] += 1
+        writers.update_result(result)
+    return bytes_total, bytes_total
+
+def _split_indexed(tsv_path, tsv_index, patterns, target_dir, result, progress, manifest=None):
+    """Split only the indexed rows of the groups matching patterns; returns (bytes done, bytes total)"""
+    groups = tsv_index.find(patterns)
+    bytes_total = sum(tsv_index.size(metadata) for metadata in groups)
+    bytes_done = 0
+    result['indexed'] = True
+
+    progress(25)  # Index loaded, starting split
+
+    with CSVWriterPool(target_dir, tsv_index.header[:-1], manifest=manifest, source=tsv_path) as writers:
+        for metadata in groups:
+            for row in read_spans(tsv_path, tsv_index.groups[metadata]):
+                writers.write(metadata, unescape_line_breaks(row[:-1]))
+                result['rows'] += 1
+            bytes_done += tsv_index.size(metadata)
+            if bytes_total:
+                progress(25 + int((bytes_done / bytes_total) * 70))  # 25% to 95%
+    writers.update_result(result)
+    return bytes_done, bytes_total
+
+# ============================================================================
+# TSV Index
+# ============================================================================
+
+def index_tsv_file(tsv_path, progress=None):
+    """
+    Build (or rebuild) the sidecar index of a TSV, e.g. after it was edited.
+
+    Returns:
+        dict: 'files' (groups), 'rows', 'error' (None or a message), 'path'
+              of the index, 'elapsed' and the final 'snapshot'
+    """
+    start_time = time.perf_counter()
+    progress = progress or _noop_progress
+    result = {'files': 0, 'rows': 0, 'error': None, 'path': index_path(tsv_path), 'elapsed': 0.0,
+              'snapshot': counter_snapshot(0, 0, 0, 0, 0.0)}
+    progress(15)  # Starting scan
+
+    try:
+        tsv_index = build_index(tsv_path)
+    except ValueError as e:
+        result['error'] = str(e)
+        return result
+    tsv_index.save(tsv_path)
+
+    progress(95)  # Index written
+    result['files'] = len(tsv_index.groups)
+    result['rows'] = sum(tsv_index.rows(metadata) for metadata in tsv_index.groups)
+    result['elapsed'] = time.perf_counter() - start_time
+    size = os.path.getsize(tsv_path)
+    result['snapshot'] = counter_snapshot(result['files'], result['files'], size, size, result['elapsed'])
+    return result
+
+# ============================================================================
+# Helper Functions
+# ============================================================================
+
+def scan_csv_directories(source_dir):
+    """Scan for directories containing CSV files"""
+    csv_dirs = []
+    for item in os.listdir(source_dir):
+        item_path = os.path.join(source_dir, item)
+        if os.path.isdir(item_path):
+            csv_files = [f for f in os.listdir(item_path) if f.lower().endswith('.csv')]
+            if csv_files:
+                csv_dirs.append((item, item_path, csv_files))
+    return csv_dirs
+
+def iter_merged_rows(csv_files, counters, report=None):
+    """
+    Yield the merged rows of CSV files one at a time: the first file's
+    header plus a 'metadata' column, then every data row tagged with its
+    file's metadata ('dir/file.csv').
+
+    Args:
+        csv_files: (metadata, path) pairs in output order
+        counters: Dict whose 'rows' count is increased per data row
+        report: Called with (files done, bytes read) while reading
+    """
+    header_written = False
+    bytes_before = 0
+    for files_done, (metadata, csv_path) in enumerate(csv_files):
+        with open(csv_path, 'r', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is not None:
+                if not header_written:
+                    header_written = True
+                    yield header + ['metadata']
+                for row_count, row in enumerate(reader, 1):
+                    row.append(metadata)
+                    yield row
+                    if report and row_count % PROGRESS_ROWS == 0:
+                        report(files_done, bytes_before + f.buffer.tell())
+                    counters['rows'] += 1
+        bytes_before += os.path.getsize(csv_path)
+        if report:
+            report(files_done + 1, bytes_before)
+
+def _format_csv_file(metadata, csv_path):
+    """
+    Read one CSV and format its tagged, escaped data rows as TSV text; runs
+    on a reader thread of a parallel merge.
+
+    Returns:
+        tuple: (escaped header row with 'metadata' or None if the file is empty,
+                TSV text of the data rows, number of data rows)
+    """
+    with open(csv_path, 'r', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return None, '', 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter='\t')
+        row_count = 0
+        for row in escape_line_breaks(row + [metadata] for row in reader):
+            writer.writerow(row)
+            row_count += 1
+    return next(escape_line_breaks([header + ['metadata']])), buffer.getvalue(), row_count
+
+def _merge_parallel(readers, jobs, csv_files, sizes, target, result, report, tsv_index=None):
+    """
+    Write the files formatted by the reader threads to the TSV in their original order.
+
+    Returns:
+        bool: True if the TSV was written (some file had rows)
+    """
+    pending = deque()
+    max_pending = jobs * READ_AHEAD_PER_READER
+    pending_bytes = 0
+    next_file = 0
+
+    def submit_more():
+        # Always keep one file in flight so a file larger than the limit is still read
+        nonlocal pending_bytes, next_file
+        while next_file < len(csv_files) and len(pending) < max_pending and (
+                not pending or pending_bytes + sizes[next_file] <= READ_AHEAD_BYTES):
+            pending.append(readers.submit(_format_csv_file, *csv_files[next_file]))
+            pending_bytes += sizes[next_file]
+            next_file += 1
+
+    submit_more()
+
+    target_file = None
+    bytes_before = 0
+    try:
+        for files_done, ((metadata, _), size) in enumerate(zip(csv_files, sizes), 1):
+            header, text, row_count = pending.popleft().result()
+            pending_bytes -= size
+            submit_more()
+            if header is not None:
+                if target_file is None:
+                    target_file = open(target, 'w', newline='', encoding='utf-8')
+                    csv.writer(target_file, delimiter='\t').writerow(header)
+                    if tsv_index is not None:
+                        tsv_index.header = header
+                start = target_file.tell() if tsv_index is not None else 0
+                target_file.write(text)
+                if tsv_index is not None and row_count:
+                    tsv_index.add(metadata, start, target_file.tell(), row_count)
+                result['rows'] += row_count
+            bytes_before += size
+            report(files_done, bytes_before)
+    finally:
+        for future in pending:
+            future.cancel()
+        if target_file is not None:
+            target_file.close()
+    return target_file is not None
+
+def escape_line_breaks(rows):
+    """Escape line breaks in CSV data for TSV compatibility (yields rows as they are consumed)"""
+    for row in rows:
+        # Replace actual line breaks with \n
+        yield [str(cell).replace('\n', '\\n').replace('\r', '') for cell in row]
+
+def write_tsv_file(target_path, rows, first_row=None, tsv_index=None):
+    """
+    Write rows (any iterable, consumed lazily) to TSV file, after first_row if given.
+
+    With a TSVIndex, first_row is the header and the byte range of each run
+    of rows with the same last (metadata) column is recorded in it.
+    """
+    with open(target_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter='\t')
+        if first_row is not None:
+            writer.writerow(first_row)
+        if tsv_index is None:
+            writer.writerows(rows)
+            return
+
+        tsv_index.header = first_row
+        metadata = None
+        start = row_count = 0
+        for row in rows:
+            if row[-1] != metadata:
+                if row_count:
+                    tsv_index.add(metadata, start, f.tell(), row_count)
+                metadata, start, row_count = row[-1], f.tell(), 0
+            writer.writerow(row)
+            row_count += 1
+        if row_count:
+            tsv_index.add(metadata, start, f.tell(), row_count)
+
+def unescape_line_breaks(row):
+    """Turn escaped \\n sequences of a TSV row back into line breaks"""
+    return [cell.replace('\\n', '\n') for cell in row]
+
+class CSVWriterPool:
+    """
+    CSV writers of a split, one per metadata ('dir/file.csv') below target_dir.
+
+    At most max_open files are open at once; the least recently used one is
+    closed when another is needed and reopened for appending if more of its
+    rows follow, so rows of a file may be spread over the whole TSV. Each
+    file is truncated and gets the header the first time it is written.
+
+    With a SplitManifest, every file is written to a temporary file next to
+    it and only replaces the CSV file on close if its content differs.
+    """
+    def __init__(self, target_dir, headers, max_open=None, manifest=None, source=None):
+        self.target_dir = target_dir
+        self.headers = headers
+        self.max_open = max_open or MAX_OPEN_WRITERS
+        self.manifest = manifest
+        self.source = source  # TSV recorded in the manifest
+        self.open_files = OrderedDict()  # metadata -> (file, csv writer), least recently used first
+        self.started = set()
+        self.written = 0
+        self.skipped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(commit=exc_type is None)
+
+    @property
+    def files(self):
+        """Number of CSV files written so far"""
+        return len(self.started)
+
+    def update_result(self, result):
+        """Copy the file counts into a split result"""
+        result['files'] = self.files
+        result['written'] = self.written
+        result['skipped'] = self.skipped
+
+    def write(self, metadata, row):
+        entry = self.open_files.get(metadata)
+        if entry is None:
+            entry = self._open(metadata)
+        else:
+            self.open_files.move_to_end(metadata)
+        entry[1].writerow(row)
+
+    def _output_path(self, metadata):
+        dir_name, file_name = metadata.split('/', 1)
+        return os.path.join(self.target_dir, dir_name, file_name)
+
+    def _write_path(self, metadata):
+        output_path = self._output_path(metadata)
+        return output_path if self.manifest is None else f"{output_path}.tmp{os.getpid()}"
+
+    def _open(self, metadata):
+        if len(self.open_files) >= self.max_open:
+            _, (f, _) = self.open_files.popitem(last=False)
+            f.close()
+        first_write = metadata not in self.started
+        if first_write:
+            os.makedirs(os.path.dirname(self._output_path(metadata)), exist_ok=True)
+            self.started.add(metadata)
+        f = open(self._write_path(metadata), 'w' if first_write else 'a', newline='', encoding='utf-8')
+        writer = csv.writer(f)
+        if first_write:
+            writer.writerow(self.headers)
+        self.open_files[metadata] = (f, writer)
+        return f, writer
+
+    def close(self, commit=True):
+        """Close all files; an incremental pool then keeps or replaces each CSV file (or, without commit, discards them)"""
+        while self.open_files:
+            _, (f, _) = self.open_files.popitem(last=False)
+            f.close()
+        if self.manifest is None:
+            self.written = self.files
+            return
+        for metadata in sorted(self.started):
+            temp_path = self._write_path(metadata)
+            if not commit:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(temp_path)
+                continue
+            output_path = self._output_path(metadata)
+            digest = hash_file(temp_path)
+            if self.manifest.has_content(metadata, output_path, os.path.getsize(temp_path), digest):
+                os.remove(temp_path)
+                self.skipped += 1
+            else:
+                os.replace(temp_path, output_path)
+                self.written += 1
+            self.manifest.record(metadata, output_path, self.source, digest)
+
+# ============================================================================
+# Incremental Split
+# ============================================================================
+
+SPLIT_MANIFEST_NAME = ".tsv_split_manifest.json"
+
+class SplitManifest:
+    """
+    Persistent record of the CSV files a split produced below target_dir.
+
+    Stored as JSON in target_dir and keyed by metadata ('dir/file.csv'). Every
+    entry keeps the TSV the file was split from and [size, mtime_ns, sha256]
+    of the file as written, so unchanged files are recognized without being
+    re-read and files of groups dropped from the TSV can be removed.
+    """
+    def __init__(self, target_dir):
+        self.target_dir = target_dir
+        self.path = os.path.join(target_dir, SPLIT_MANIFEST_NAME)
+        self.entries = load_manifest(self.path)  # Missing or unreadable manifest - existing files are hashed instead
+        self.recorded = set()  # metadata recorded during this split
+
+    def has_content(self, metadata, output_path, size, digest):
+        """Check whether output_path exists with exactly this size and hash"""
+        try:
+            if os.path.getsize(output_path) != size:
+                return False
+            return file_state(output_path, self.entries.get(metadata, {}).get('output'))[2] == digest
+        except OSError:
+            return False
+
+    def record(self, metadata, output_path, source, digest):
+        """Remember that output_path holds the rows of metadata split from source"""
+        stat = os.stat(output_path)
+        self.entries[metadata] = {
+            'source': os.path.abspath(source),
+            'output': [stat.st_size, stat.st_mtime_ns, digest],
+        }
+        self.recorded.add(metadata)
+
+    def remove_stale(self, tsv_path):
+        """
+        Delete the files split from tsv_path before whose group was not
+        written this time. Files edited since they were written are kept.
+
+        Returns:
+            int: Number of files removed
+        """
+        source = os.path.abspath(tsv_path)
+        removed = 0
+        for metadata, entry in list(self.entries.items()):
+            if metadata in self.recorded or entry.get('source') != source:
+                continue
+            output_path = os.path.join(self.target_dir, *metadata.split('/', 1))
+            try:
+                if file_state(output_path, entry.get('output'))[2] == entry.get('output', [None, None, None])[2]:
+                    os.remove(output_path)
+                    removed += 1
+                    with contextlib.suppress(OSError):
+                        os.rmdir(os.path.dirname(output_path))  # Only succeeds once the directory is empty
+            except FileNotFoundError:
+                pass
+            del self.entries[metadata]
+        return removed
+
+    def save(self):
+        """Write the manifest atomically"""
+        save_manifest(self.path, self.entries)
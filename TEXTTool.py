@@ -1,11 +1,11 @@
-import os
-import csv
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QLineEdit, QFileDialog, QProgressBar, QMessageBox, QGroupBox
+    QLineEdit, QFileDialog, QProgressBar, QMessageBox, QGroupBox, QSpinBox, QCheckBox
 )
 from PyQt6.QtCore import QThread, pyqtSignal
 
+import TEXTBatch
+
 class WorkerThread(QThread):
     progress_signal = pyqtSignal(int)
     finished_signal = pyqtSignal(bool, str)
@@ -100,6 +100,26 @@ class TEXTTool(QWidget):
 
         merge_layout.addLayout(merge_target_layout)
 
+        # Parallel readers selection
+        merge_jobs_layout = QHBoxLayout()
+        merge_jobs_label = QLabel("Parallel Readers:")
+        merge_jobs_label.setStyleSheet("font-weight: bold; color: #495057;")
+        merge_jobs_layout.addWidget(merge_jobs_label)
+
+        self.merge_jobs_spin = QSpinBox()
+        self.merge_jobs_spin.setRange(0, 64)
+        self.merge_jobs_spin.setSpecialValueText("Auto")
+        self.merge_jobs_spin.setValue(0)
+        self.merge_jobs_spin.setToolTip("CSV files read at once (Auto = sized for I/O, 1 = one file at a time)")
+        merge_jobs_layout.addWidget(self.merge_jobs_spin)
+
+        self.merge_index_check = QCheckBox("Write index (.idx)")
+        self.merge_index_check.setToolTip("Write a sidecar index next to the TSV so single files can be split out without reading the whole TSV")
+        merge_jobs_layout.addWidget(self.merge_index_check)
+        merge_jobs_layout.addStretch()
+
+        merge_layout.addLayout(merge_jobs_layout)
+
         merge_btn = QPushButton("🔄 Merge to TSV")
         merge_btn.setToolTip("Start merging CSV files to TSV")
         merge_btn.clicked.connect(self.merge_csv_to_tsv)
@@ -165,6 +185,25 @@ class TEXTTool(QWidget):
 
         split_layout.addLayout(split_target_layout)
 
+        # File selection
+        split_files_layout = QHBoxLayout()
+        split_files_label = QLabel("Files:")
+        split_files_label.setStyleSheet("font-weight: bold; color: #495057;")
+        split_files_layout.addWidget(split_files_label)
+
+        self.split_files_edit = QLineEdit()
+        self.split_files_edit.setPlaceholderText("Glob patterns, e.g. item_name/*.csv; message/0_talk.csv (empty = all files)")
+        self.split_files_edit.setToolTip("Only write CSV files whose metadata (dir/file.csv) matches one of these patterns; "
+                                         "uses the TSV's index when it has an up-to-date one")
+        split_files_layout.addWidget(self.split_files_edit)
+
+        split_layout.addLayout(split_files_layout)
+
+        self.split_incremental_check = QCheckBox("Only rewrite changed files")
+        self.split_incremental_check.setToolTip("Keep CSV files whose content is unchanged (and their modification time) "
+                                                "so an incremental MBE repack skips them; removes files of groups no longer in the TSV")
+        split_layout.addWidget(self.split_incremental_check)
+
         split_btn = QPushButton("🔄 Split to CSV")
         split_btn.setToolTip("Start splitting TSV file to CSV files")
         split_btn.clicked.connect(self.split_tsv_to_csv)
@@ -223,7 +262,8 @@ class TEXTTool(QWidget):
             return
 
         self.progress_bar.setValue(0)
-        self.worker = WorkerThread(self._merge_batch, source, target)
+        self.worker = WorkerThread(self._merge_batch, source, target, self.merge_jobs_spin.value() or None,
+                                   self.merge_index_check.isChecked())
         self.worker.progress_signal.connect(self.update_progress)
         self.worker.finished_signal.connect(self.command_finished)
         self.worker.start()
@@ -237,7 +277,8 @@ class TEXTTool(QWidget):
             return
 
         self.progress_bar.setValue(0)
-        self.worker = WorkerThread(self._split_tsv, source, target)
+        self.worker = WorkerThread(self._split_tsv, source, target, TEXTBatch.parse_patterns(self.split_files_edit.text()),
+                                   self.split_incremental_check.isChecked())
         self.worker.progress_signal.connect(self.update_progress)
         self.worker.finished_signal.connect(self.command_finished)
         self.worker.start()
@@ -246,162 +287,13 @@ class TEXTTool(QWidget):
     # Processing Implementation Methods
     # ============================================================================
 
-    def _merge_batch(self, worker, source, target):
+    def _merge_batch(self, worker, source, target, jobs, index):
         """Merge multiple CSV files from subdirectories into a single TSV file"""
-        worker.progress_signal.emit(15)  # Starting scan
-
-        csv_dirs = self._scan_csv_directories(source)
-        if not csv_dirs:
-            return "No directories containing CSV files found"
-
-        worker.progress_signal.emit(25)  # Scan complete, starting processing
-
-        all_rows = []
-        headers = None
-        total_files = sum(len(csv_files) for _, _, csv_files in csv_dirs)
-        processed_files = 0
-
-        for dir_name, dir_path, csv_files in csv_dirs:
-            for csv_file in csv_files:
-                csv_path = os.path.join(dir_path, csv_file)
-                with open(csv_path, 'r', encoding='utf-8-sig') as f:
-                    reader = csv.reader(f)
-                    file_rows = list(reader)
-                    if file_rows:
-                        if headers is None:
-                            headers = file_rows[0] + ['metadata']
-                            all_rows.append(headers)
-                        # Add metadata to each row
-                        metadata = f"{dir_name}/{csv_file}"
-                        for row in file_rows[1:]:  # Skip header
-                            all_rows.append(row + [metadata])
-
-                processed_files += 1
-                progress = 25 + int((processed_files / total_files) * 50)  # 25% to 75%
-                worker.progress_signal.emit(progress)
-
-        worker.progress_signal.emit(80)  # Processing complete, starting write
-
-        if all_rows:
-            escaped_rows = self._escape_line_breaks(all_rows)
-            self._write_tsv_file(target, escaped_rows)
-
-        worker.progress_signal.emit(95)  # Write complete
-        return "Merge completed"
-
-    # ============================================================================
-    # Helper Methods
-    # ============================================================================
+        return TEXTBatch.merge_csv_to_tsv(source, target, worker.progress_signal.emit, jobs, index)
 
-    def _scan_csv_directories(self, source_dir):
-        """Scan for directories containing CSV files"""
-        csv_dirs = []
-        for item in os.listdir(source_dir):
-            item_path = os.path.join(source_dir, item)
-            if os.path.isdir(item_path):
-                csv_files = [f for f in os.listdir(item_path) if f.lower().endswith('.csv')]
-                if csv_files:
-                    csv_dirs.append((item, item_path, csv_files))
-        return csv_dirs
-
-    def _escape_line_breaks(self, rows):
-        """Escape line breaks in CSV data for TSV compatibility"""
-        escaped_rows = []
-        for row in rows:
-            escaped_row = []
-            for cell in row:
-                # Replace actual line breaks with \n
-                escaped_cell = str(cell).replace('\n', '\\n').replace('\r', '')
-                escaped_row.append(escaped_cell)
-            escaped_rows.append(escaped_row)
-        return escaped_rows
-
-    def _write_tsv_file(self, target_path, rows):
-        """Write rows to TSV file"""
-        with open(target_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f, delimiter='\t')
-            writer.writerows(rows)
-
-    def _read_tsv_file(self, tsv_path):
-        """Read TSV file and return rows"""
-        with open(tsv_path, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f, delimiter='\t')
-            return list(reader)
-
-    def _group_rows_by_metadata(self, rows, metadata_idx):
-        """Group rows by metadata column"""
-        grouped_data = {}
-        for row in rows[1:]:  # Skip header
-            metadata = row[metadata_idx]
-            row_no_meta = row[:-1]  # Remove metadata
-            # Unescape line breaks
-            unescaped_row = []
-            for cell in row_no_meta:
-                unescaped_cell = cell.replace('\\n', '\n')
-                unescaped_row.append(unescaped_cell)
-
-            if metadata not in grouped_data:
-                grouped_data[metadata] = []
-            grouped_data[metadata].append(unescaped_row)
-        return grouped_data
-
-    def _write_grouped_csv_files(self, grouped_data, headers, target_dir, worker):
-        """Write grouped data to CSV files organized by subdirectories"""
-        total_groups = len(grouped_data)
-        processed_groups = 0
-
-        for metadata, data_rows in grouped_data.items():
-            dir_name, file_name = metadata.split('/', 1)
-            output_dir = os.path.join(target_dir, dir_name)
-            os.makedirs(output_dir, exist_ok=True)
-
-            csv_path = os.path.join(output_dir, file_name)
-            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(headers)
-                writer.writerows(data_rows)
-
-            processed_groups += 1
-            progress = 80 + int((processed_groups / total_groups) * 15)  # 80% to 95%
-            worker.progress_signal.emit(progress)
-
-    def _split_tsv(self, worker, tsv_path, target_dir):
+    def _split_tsv(self, worker, tsv_path, target_dir, patterns, incremental):
         """Split TSV file into multiple CSV files organized by subdirectories"""
-        worker.progress_signal.emit(15)  # Starting read
-
-        rows = self._read_tsv_file(tsv_path)
-        if not rows:
-            return "TSV file is empty"
-
-        worker.progress_signal.emit(25)  # Read complete, starting validation
-
-        headers = rows[0]
-        if 'metadata' not in headers:
-            return "TSV file does not have metadata column"
-
-        metadata_idx = headers.index('metadata')
-        headers_no_meta = headers[:-1]  # Remove metadata column
-
-        worker.progress_signal.emit(35)  # Validation complete, starting grouping
-
-        # Group rows by metadata
-        grouped_data = self._group_rows_by_metadata(rows, metadata_idx)
-        total_rows = len(rows) - 1  # Exclude header
-
-        # Update progress during grouping
-        processed_rows = 0
-        for row in rows[1:]:  # Skip header
-            processed_rows += 1
-            progress = 35 + int((processed_rows / total_rows) * 40)  # 35% to 75%
-            worker.progress_signal.emit(progress)
-
-        worker.progress_signal.emit(80)  # Grouping complete, starting write
-
-        # Create directories and files
-        self._write_grouped_csv_files(grouped_data, headers_no_meta, target_dir, worker)
-
-        worker.progress_signal.emit(95)  # Write complete
-        return "Split completed"
+        return TEXTBatch.split_tsv_to_csv(tsv_path, target_dir, worker.progress_signal.emit, patterns, incremental)
 
     # ============================================================================
     # Progress and UI Update Methods
@@ -0,0 +1,137 @@
+import io
+import os
+import csv
+import json
+import fnmatch
+
+# Sidecar file next to the TSV: <file.tsv>.idx
+INDEX_SUFFIX = '.idx'
+INDEX_FORMAT = 'dststools-tsv-index'
+INDEX_VERSION = 1
+
+def index_path(tsv_path):
+    """Path of the sidecar index of a TSV file"""
+    return tsv_path + INDEX_SUFFIX
+
+def remove_index(tsv_path):
+    """Delete the sidecar index of a TSV file if there is one"""
+    try:
+        os.remove(index_path(tsv_path))
+    except FileNotFoundError:
+        pass
+
+class TSVIndex:
+    """
+    Byte ranges of the rows of each metadata group ('dir/file.csv') of a
+    merged TSV, so the rows of a few CSV files can be read without scanning
+    the whole TSV.
+
+    Stored as JSON next to the TSV together with the TSV's size and
+    modification time; load() ignores an index whose TSV has changed since.
+    """
+    def __init__(self, header=None):
+        self.header = header  # TSV header row (with the metadata column)
+        self.groups = {}      # metadata -> [[offset, size, rows], ...] in file order
+
+    def add(self, metadata, start, end, rows):
+        """Record that bytes start..end of the TSV hold `rows` rows of a group"""
+        spans = self.groups.setdefault(metadata, [])
+        if spans and spans[-1][0] + spans[-1][1] == start:
+            spans[-1][1] += end - start
+            spans[-1][2] += rows
+        else:
+            spans.append([start, end - start, rows])
+
+    def find(self, patterns):
+        """Groups matching any of the glob patterns (case-sensitive), in TSV order"""
+        return [metadata for metadata in self.groups
+                if any(fnmatch.fnmatchcase(metadata, pattern) for pattern in patterns)]
+
+    def rows(self, metadata):
+        """Number of rows of a group"""
+        return sum(rows for _, _, rows in self.groups.get(metadata, ()))
+
+    def size(self, metadata):
+        """Number of TSV bytes holding a group's rows"""
+        return sum(size for _, size, _ in self.groups.get(metadata, ()))
+
+    def save(self, tsv_path):
+        """Write the index next to tsv_path, stamped with the TSV's current size and mtime"""
+        stat = os.stat(tsv_path)
+        data = {'format': INDEX_FORMAT, 'version': INDEX_VERSION,
+                'tsv_size': stat.st_size, 'tsv_mtime_ns': stat.st_mtime_ns,
+                'header': self.header, 'groups': self.groups}
+        path = index_path(tsv_path)
+        temp_path = f"{path}.tmp{os.getpid()}"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, tsv_path):
+        """
+        Index of tsv_path, or None if there is none, it cannot be read or the
+        TSV was modified after it was written.
+        """
+        try:
+            with open(index_path(tsv_path), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            stat = os.stat(tsv_path)
+        except (OSError, ValueError):
+            return None
+        if (not isinstance(data, dict) or data.get('format') != INDEX_FORMAT
+                or data.get('version') != INDEX_VERSION or data.get('tsv_size') != stat.st_size
+                or data.get('tsv_mtime_ns') != stat.st_mtime_ns):
+            return None
+        index = cls(data.get('header'))
+        index.groups = data.get('groups') or {}
+        return index
+
+def build_index(tsv_path):
+    """
+    Index an existing TSV (e.g. one edited after merging) in one pass.
+
+    Returns:
+        TSVIndex: Not saved yet
+
+    Raises:
+        ValueError: If the TSV is empty or has no metadata column
+    """
+    with open(tsv_path, 'rb') as f:
+        position = 0
+
+        def lines():
+            # The csv reader pulls exactly the lines of one record at a time,
+            # so `position` is the end of the row just returned
+            nonlocal position
+            for line in f:
+                position += len(line)
+                text = line.decode('utf-8')
+                yield text[:-2] + '\n' if text.endswith('\r\n') else text
+
+        reader = csv.reader(lines(), delimiter='\t')
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("TSV file is empty")
+        if 'metadata' not in header:
+            raise ValueError("TSV file does not have metadata column")
+        metadata_idx = header.index('metadata')
+
+        index = TSVIndex(header)
+        start = position
+        for row in reader:
+            index.add(row[metadata_idx], start, position, 1)
+            start = position
+    return index
+
+def read_spans(tsv_path, spans):
+    """
+    Yield the rows (all columns) stored in byte ranges of a TSV.
+
+    Each range is parsed exactly as reading the whole file would parse it.
+    """
+    with open(tsv_path, 'rb') as f:
+        for offset, size, _ in spans:
+            f.seek(offset)
+            text = io.TextIOWrapper(io.BytesIO(f.read(size)), encoding='utf-8')
+            yield from csv.reader(text, delimiter='\t')
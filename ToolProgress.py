@@ -0,0 +1,311 @@
+import os
+import re
+import time
+import threading
+
+# ============================================================================
+# Output Parsers
+# ============================================================================
+
+PERCENT_RE = re.compile(r'(\d{1,3}(?:\.\d+)?)\s*%')
+# Counters only count at the start of a line ("12/340", "[12/340] ...", "12 of 340:"),
+# never inside paths such as "chara/0012/1234.img"
+COUNT_RE = re.compile(r'^\[?\s*(\d+)\s*(?:/|of)\s*(\d+)\s*\]?(?=[\s:]|$)')
+
+class OutputParser:
+    """
+    Turn a tool's log lines into progress.
+
+    The base parser understands the two generic forms most tools print:
+    percentages ("Processing 42.5%") and counters at the start of a line
+    ("12/340", "[12/340] file", "12 of 340").
+    Subclasses add tool-specific lines via parse_line().
+    """
+    def __init__(self):
+        self.fraction = None
+        self.entries_done = 0
+        self.entries_total = None
+        self.lock = threading.Lock()
+
+    def feed(self, line):
+        """Parse one output line (called from the runner's reader thread)"""
+        with self.lock:
+            self.parse_line(line.strip())
+
+    def parse_line(self, line):
+        if self.parse_counter(line):
+            return
+        self.parse_percent(line)
+
+    def parse_percent(self, line):
+        match = PERCENT_RE.search(line)
+        if match:
+            self.fraction = min(float(match.group(1)) / 100.0, 1.0)
+            return True
+        return False
+
+    def parse_counter(self, line):
+        match = COUNT_RE.search(line)
+        if match and 0 < int(match.group(2)) and int(match.group(1)) <= int(match.group(2)):
+            self.entries_done, self.entries_total = int(match.group(1)), int(match.group(2))
+            return True
+        return False
+
+    def snapshot(self):
+        """Return (fraction, entries_done, entries_total); fraction may be None"""
+        with self.lock:
+            fraction = self.fraction
+            if fraction is None and self.entries_total:
+                fraction = self.entries_done / self.entries_total
+            return fraction, self.entries_done, self.entries_total
+
+class DSCSToolsParser(OutputParser):
+    """
+    DSCSToolsCLI (MVGL/MDB1) output.
+
+    Packing announces "Start compressing files with <N> files..." and
+    numbered "File <i> of <N>" / "Start writing <i> of <N>" lines; other
+    lines (file names, errors) never count. Extraction prints generic
+    counters at most.
+    """
+    TOTAL_RE = re.compile(r'Start compressing files with\s+(\d+)\s+files', re.IGNORECASE)
+    FILE_RE = re.compile(r'^(?:File|Start writing)\s+(\d+)\s+of\s+(\d+)\b', re.IGNORECASE)
+    DONE_RE = re.compile(r'compressing files complete', re.IGNORECASE)
+
+    def parse_line(self, line):
+        match = self.TOTAL_RE.search(line)
+        if match:
+            self.entries_total = int(match.group(1))
+            self.entries_done = 0
+            return
+        match = self.FILE_RE.match(line)
+        if match and 0 < int(match.group(2)) and int(match.group(1)) <= int(match.group(2)):
+            self.entries_done, self.entries_total = int(match.group(1)), int(match.group(2))
+        elif self.DONE_RE.search(line):
+            self.fraction = 1.0
+        else:
+            super().parse_line(line)
+
+class YACpkToolParser(OutputParser):
+    """
+    YACpkTool (CpkMaker) output.
+
+    The tool reports "Status = <state> <progress>%" while CpkMaker works and
+    one "... extracted" / "... packed" line per entry. Entry lines carry the
+    entry's path, so they only count as one entry unless they start with a
+    counter.
+    """
+    ENTRY_RE = re.compile(r'\b(extracted|packed)\b', re.IGNORECASE)
+
+    def parse_line(self, line):
+        if line.startswith('Status ='):
+            self.parse_percent(line)
+        elif self.ENTRY_RE.search(line):
+            if not self.parse_counter(line):
+                self.entries_done += 1
+        else:
+            super().parse_line(line)
+
+class CompressonatorParser(OutputParser):
+    """compressonatorcli output: "Processing ... 42.00%" updates for the current file"""
+
+# Parsers by lower-case executable name; register_parser() adds more
+PARSERS = {
+    'dscstoolscli.exe': DSCSToolsParser,
+    'yacpktool.exe': YACpkToolParser,
+    'compressonatorcli.exe': CompressonatorParser,
+}
+
+def register_parser(executable_name, parser_class):
+    """Use parser_class for commands running executable_name"""
+    PARSERS[executable_name.lower()] = parser_class
+
+def parser_for_command(command):
+    """Create the output parser for a command (generic parser for unknown tools)"""
+    parser_class = PARSERS.get(os.path.basename(command[0]).lower(), OutputParser)
+    return parser_class()
+
+# ============================================================================
+# Size-Based Fallback
+# ============================================================================
+
+def path_size(path):
+    """Total size of a file or of all files below a directory (0 if missing)"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat().st_size
+        except OSError:
+            pass  # Directory not created yet or removed meanwhile
+    return total
+
+# ============================================================================
+# Progress Tracking
+# ============================================================================
+
+# Never report size-based progress as complete before the tool exits
+SIZE_PROGRESS_CAP = 0.99
+# Minimum seconds between output size samples (directory walks are not free)
+SIZE_SAMPLE_INTERVAL = 1.0
+
+class ProgressTracker:
+    """
+    Combine parsed tool output and output size into real progress.
+
+    Progress comes from the parser when the tool prints anything usable;
+    otherwise it falls back to the bytes written to `output_path` compared
+    with the size of `input_path`.
+    """
+    def __init__(self, parser, input_path=None, output_path=None):
+        self.parser = parser
+        self.input_path = input_path
+        self.output_path = output_path
+        self.bytes_total = None
+        self.bytes_done = 0
+        self.start_time = time.time()
+        self._last_sample = 0.0
+
+    def start(self):
+        """Measure the input and reset the clock (call right before the tool starts)"""
+        self.bytes_total = path_size(self.input_path) if self.input_path else None
+        self.start_time = time.time()
+
+    def feed(self, line):
+        """Runner on_output callback"""
+        self.parser.feed(line)
+
+    def _sample_output_size(self):
+        now = time.time()
+        if self.output_path and now - self._last_sample >= SIZE_SAMPLE_INTERVAL:
+            self._last_sample = now
+            self.bytes_done = path_size(self.output_path)
+
+    def snapshot(self):
+        """
+        Return the current progress.
+
+        Returns:
+            dict: 'fraction' (0-1 or None), 'entries_done', 'entries_total',
+                  'bytes_done', 'bytes_total', 'elapsed' and 'eta' (seconds or None)
+        """
+        self._sample_output_size()
+        fraction, entries_done, entries_total = self.parser.snapshot()
+        if fraction is None and self.bytes_total:
+            fraction = min(self.bytes_done / self.bytes_total, SIZE_PROGRESS_CAP)
+
+        elapsed = time.time() - self.start_time
+        eta = None
+        if fraction:
+            eta = max(elapsed * (1.0 - fraction) / fraction, 0.0)
+        return {
+            'fraction': fraction,
+            'entries_done': entries_done,
+            'entries_total': entries_total,
+            'bytes_done': self.bytes_done,
+            'bytes_total': self.bytes_total,
+            'elapsed': elapsed,
+            'eta': eta,
+        }
+
+    def finish(self):
+        """Take a final output size sample once the tool has exited"""
+        self._last_sample = 0.0
+        self._sample_output_size()
+        return self.snapshot()
+
+def counter_snapshot(entries_done, entries_total, bytes_done, bytes_total, elapsed):
+    """
+    Build a snapshot (same keys as ProgressTracker.snapshot) for in-process
+    work that counts its own entries and bytes.
+    """
+    fraction = None
+    if bytes_total:
+        fraction = min(bytes_done / bytes_total, 1.0)
+    elif entries_total:
+        fraction = entries_done / entries_total
+    eta = max(elapsed * (1.0 - fraction) / fraction, 0.0) if fraction else None
+    return {
+        'fraction': fraction,
+        'entries_done': entries_done,
+        'entries_total': entries_total,
+        'bytes_done': bytes_done,
+        'bytes_total': bytes_total,
+        'elapsed': elapsed,
+        'eta': eta,
+    }
+
+def run_with_progress(runner, tracker, on_progress=None, interval=0.25):
+    """
+    Start runner and call on_progress(snapshot) every `interval` seconds
+    until it exits. Waiting is event based, so this returns as soon as the
+    process is gone.
+
+    Returns:
+        dict: Final snapshot
+    """
+    runner.on_output = _chain(tracker.feed, runner.on_output)
+    runner.on_error = _chain(tracker.feed, runner.on_error)
+    tracker.start()
+    runner.start()
+    while not runner.wait(interval):
+        if on_progress:
+            on_progress(tracker.snapshot())
+    return tracker.finish()
+
+def _chain(first, second):
+    if second is None:
+        return first
+    def call_both(line):
+        first(line)
+        second(line)
+    return call_both
+
+# ============================================================================
+# Formatting Helpers
+# ============================================================================
+
+def format_bytes(size):
+    """Format a byte count as e.g. '3.4 GB'"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024.0
+
+def format_duration(seconds):
+    """Format seconds as M:SS or H:MM:SS"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def format_status(snapshot):
+    """Format a snapshot as e.g. '12/340 entries, 1.2 GB / 3.4 GB, ETA 0:42'"""
+    parts = []
+    if snapshot['entries_total']:
+        parts.append(f"{snapshot['entries_done']}/{snapshot['entries_total']} entries")
+    elif snapshot['entries_done']:
+        parts.append(f"{snapshot['entries_done']} entries")
+    if snapshot['bytes_total']:
+        parts.append(f"{format_bytes(snapshot['bytes_done'])} / {format_bytes(snapshot['bytes_total'])}")
+    elif snapshot['bytes_done']:
+        parts.append(format_bytes(snapshot['bytes_done']))
+    if snapshot['eta'] is not None:
+        parts.append(f"ETA {format_duration(snapshot['eta'])}")
+    return ", ".join(parts)
+
+def format_summary(snapshot):
+    """Format a final snapshot as e.g. '340 entries, 3.4 GB in 42.1s (80.5 MB/s)'"""
+    elapsed = max(snapshot['elapsed'], 1e-6)
+    parts = []
+    if snapshot['entries_done']:
+        parts.append(f"{snapshot['entries_done']} entries")
+    parts.append(f"{format_bytes(snapshot['bytes_done'])} in {elapsed:.1f}s")
+    return ", ".join(parts) + f" ({snapshot['bytes_done'] / (1024 * 1024) / elapsed:.1f} MB/s)"
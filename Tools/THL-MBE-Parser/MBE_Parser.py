@@ -2,6 +2,13 @@ import os
 import sys
 import struct
 import csv
+import mmap
+import bisect
+
+try:
+    import numpy as np  # Opcional: usado apenas por parse_mbe_columnar()
+except ImportError:
+    np = None
 
 # --- Definições de Colunas ---
 COLUMN_TYPES = {
@@ -13,6 +20,9 @@ COLUMN_TYPES = {
     0x8: {'name': 'StringID', 'size': 8, 'format': '<q'},
 }
 
+# Tipos NumPy equivalentes (modo colunar)
+NUMPY_FORMATS = {0x2: '<i4', 0x9: '<i4', 0x4: 'i1', 0x5: '<f4', 0x7: '<i8', 0x8: '<i8'}
+
 # --- Funções Auxiliares ---
 
 def read_string_with_padding(f, size):
@@ -144,6 +154,266 @@ def parse_mbe(filepath):
         traceback.print_exc()
         return None
 
+# --- Modo mmap (zero-copy) ---
+
+INT32 = struct.Struct('<i')
+INT32_PAIR = struct.Struct('<ii')
+
+def compile_row_layout(columns):
+    """
+    Compila o layout de uma Área EXPA (linha) em um único struct.Struct.
+    Colunas String/StringID viram padding ('8x'); elas são preenchidas depois pela seção CHNK.
+    Retorna (row_struct, column_offsets, string_columns).
+    """
+    fmt_parts = ['<']
+    column_offsets = []
+    string_columns = []
+    struct_end = 0
+    current_offset = 0
+
+    for col_idx, col_info in enumerate(columns):
+        alignment = 8 if col_info['size'] == 8 else 4
+        if col_info['size'] == 1: alignment = 1
+        current_offset = align_offset(current_offset, alignment)
+        column_offsets.append(current_offset)
+
+        if col_info['name'] in ('String', 'StringID'):
+            string_columns.append(col_idx)
+        else:
+            if current_offset > struct_end:
+                fmt_parts.append(f"{current_offset - struct_end}x")
+            fmt_parts.append(col_info['format'][1:])
+            struct_end = current_offset + col_info['size']
+
+        current_offset += col_info['size']
+
+    return struct.Struct(''.join(fmt_parts)), column_offsets, string_columns
+
+def decode_padded_string(view, offset, size):
+    """Equivalente a read_string_with_padding(), mas lendo direto de um buffer."""
+    if size <= 0:
+        return ""
+    return str(view[offset:offset + size], 'utf-8', 'ignore').rstrip('\x00')
+
+def scan_mbe_layout(view):
+    """
+    Percorre apenas os headers das Regiões EXPA, sem decodificar as linhas.
+    Como cada linha tem tamanho fixo, a posição de todas as linhas (e da seção CHNK)
+    pode ser calculada diretamente. Retorna (sheets, chnk_offset).
+    """
+    if view[0:4] != b'EXPA':
+        raise ValueError("Magic Number 'EXPA' não encontrado. O arquivo não é um MBE válido.")
+
+    num_expa_regions, = INT32.unpack_from(view, 4)
+    pos = 8
+    sheets = []
+
+    for sheet_idx in range(num_expa_regions):
+        sheet_name_size, = INT32.unpack_from(view, pos)
+        pos += 4
+        sheet_name = decode_padded_string(view, pos, sheet_name_size)
+        if sheet_name_size > 0:
+            pos += sheet_name_size
+
+        num_columns, = INT32.unpack_from(view, pos)
+        pos += 4
+        column_type_codes = struct.unpack_from(f'<{num_columns}i', view, pos)
+        pos += 4 * num_columns
+        columns = [COLUMN_TYPES[code] for code in column_type_codes]
+        column_headers = [f"{col['name']}_{idx}" for idx, col in enumerate(columns)]
+
+        expa_area_size, num_expa_areas = INT32_PAIR.unpack_from(view, pos)
+        pos += 8
+
+        row_struct, column_offsets, string_columns = compile_row_layout(columns)
+        if num_expa_areas > 0 and row_struct.size > expa_area_size:
+            raise ValueError(f"Planilha '{sheet_name}': colunas ocupam {row_struct.size} bytes, "
+                             f"mas a linha tem apenas {expa_area_size} bytes.")
+
+        # Cada linha começa em um offset divisível por 8
+        rows_offset = align_offset(pos, 8) if num_expa_areas > 0 else pos
+        row_stride = align_offset(expa_area_size, 8)
+        if num_expa_areas > 0:
+            pos = rows_offset + (num_expa_areas - 1) * row_stride + expa_area_size
+
+        sheets.append({
+            'name': sheet_name, 'columns': columns, 'headers': column_headers,
+            'type_codes': column_type_codes, 'area_size': expa_area_size,
+            'num_rows': num_expa_areas, 'rows_offset': rows_offset, 'row_stride': row_stride,
+            'row_struct': row_struct, 'column_offsets': column_offsets,
+            'string_columns': string_columns,
+            'string_offsets': {column_offsets[i]: i for i in string_columns},
+        })
+
+    return sheets, align_offset(pos, 8)
+
+def locate_string(sheets, sheet_starts, symbolic_offset):
+    """Converte um offset simbólico da CHNK em (sheet_idx, row_idx, col_idx), ou None."""
+    sheet_idx = bisect.bisect_right(sheet_starts, symbolic_offset) - 1
+    if sheet_idx < 0:
+        return None
+    sheet = sheets[sheet_idx]
+    if sheet['num_rows'] <= 0 or sheet['row_stride'] <= 0:
+        return None
+    row_idx, offset_in_row = divmod(symbolic_offset - sheet['rows_offset'], sheet['row_stride'])
+    col_idx = sheet['string_offsets'].get(offset_in_row)
+    if row_idx >= sheet['num_rows'] or col_idx is None:
+        return None
+    return sheet_idx, row_idx, col_idx
+
+def iter_chnk_strings(view, chnk_offset, verbose=True, log=print):
+    """Gera (symbolic_offset, string) para cada entrada da seção CHNK."""
+    if view[chnk_offset:chnk_offset + 4] != b'CHNK':
+        if verbose:
+            log("\nAviso: Seção 'CHNK' não encontrada após o fim das Regiões EXPA.")
+        return
+    num_strings, = INT32.unpack_from(view, chnk_offset + 4)
+    if verbose:
+        log(f"\n--- Analisando Seção CHNK e preenchendo strings ---")
+        log(f"Encontradas {num_strings} strings para processar.")
+
+    pos = chnk_offset + 8
+    for _ in range(num_strings):
+        symbolic_offset, string_size = INT32_PAIR.unpack_from(view, pos)
+        pos += 8
+        yield symbolic_offset, decode_padded_string(view, pos, string_size)
+        if string_size > 0:
+            pos += string_size
+
+def decode_sheet_rows(view, sheet):
+    """Decodifica todas as linhas de uma planilha (uma chamada unpack_from por linha)."""
+    unpack_from = sheet['row_struct'].unpack_from
+    string_columns = sheet['string_columns']
+    rows_offset = sheet['rows_offset']
+    row_stride = sheet['row_stride']
+
+    sheet_rows = []
+    for row_idx in range(sheet['num_rows']):
+        parsed_row = list(unpack_from(view, rows_offset + row_idx * row_stride))
+        for col_idx in string_columns:
+            parsed_row.insert(col_idx, '')  # Placeholder
+        sheet_rows.append(parsed_row)
+    return sheet_rows
+
+def parse_mbe_mmap(filepath, log=print):
+    """
+    Mesma saída de parse_mbe(), mas mapeia o arquivo em memória (mmap) e decodifica
+    cada linha com um struct.Struct pré-compilado via unpack_from, sem f.read() por campo.
+    As mensagens vão para log (padrão: print).
+    """
+    try:
+        with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                sheets, chnk_offset = scan_mbe_layout(view)
+                log(f"Arquivo MBE detectado. Encontradas {len(sheets)} planilhas (Regiões EXPA).")
+
+                all_sheets_data = []
+                for sheet_idx, sheet in enumerate(sheets):
+                    log(f"\n--- Analisando Planilha {sheet_idx+1}/{len(sheets)} ---")
+                    log(f"Nome da Planilha: '{sheet['name']}'")
+                    log(f"Colunas: {len(sheet['columns'])}, Linhas: {sheet['num_rows']}, Tamanho da Linha: {sheet['area_size']} bytes")
+                    all_sheets_data.append({
+                        'name': sheet['name'], 'columns': sheet['columns'],
+                        'headers': sheet['headers'], 'rows': decode_sheet_rows(view, sheet)
+                    })
+
+                sheet_starts = [sheet['rows_offset'] for sheet in sheets]
+                for symbolic_offset, string_value in iter_chnk_strings(view, chnk_offset, log=log):
+                    location = locate_string(sheets, sheet_starts, symbolic_offset)
+                    if location:
+                        sheet_idx, row_idx, col_idx = location
+                        all_sheets_data[sheet_idx]['rows'][row_idx][col_idx] = string_value
+                    else:
+                        log(f"Aviso: A string '{string_value}' com offset simbólico {symbolic_offset} não corresponde a nenhuma localização mapeada na seção EXPA.")
+
+            return all_sheets_data
+
+    except FileNotFoundError:
+        log(f"Erro: O arquivo '{filepath}' não foi encontrado.")
+        return None
+    except Exception as e:
+        log(f"Ocorreu um erro inesperado durante o parsing: {e}")
+        import traceback
+        log(traceback.format_exc().rstrip())
+        return None
+
+# --- Modo colunar (NumPy) ---
+
+def build_row_dtype(sheet):
+    """Monta o dtype estruturado NumPy de uma linha a partir dos códigos de tipo das colunas."""
+    return np.dtype({
+        'names': sheet['headers'],
+        'formats': [NUMPY_FORMATS[code] for code in sheet['type_codes']],
+        'offsets': sheet['column_offsets'],
+        'itemsize': sheet['area_size'],
+    })
+
+def join_string_column(sheet, col_idx, chnk_offsets, chnk_values):
+    """Preenche uma coluna String/StringID com as strings da CHNK (offsets ordenados)."""
+    num_rows = sheet['num_rows']
+    cell_offsets = (sheet['rows_offset'] + sheet['column_offsets'][col_idx]
+                    + np.arange(num_rows, dtype=np.int64) * sheet['row_stride'])
+    column = np.full(num_rows, '', dtype=object)
+    if len(chnk_offsets) == 0:
+        return column
+
+    # side='right' - 1: com offsets duplicados vale a última string, como no dict de parse_mbe()
+    idx = np.searchsorted(chnk_offsets, cell_offsets, side='right') - 1
+    found = idx >= 0
+    found[found] = chnk_offsets[idx[found]] == cell_offsets[found]
+    column[found] = chnk_values[idx[found]]
+    return column
+
+def parse_mbe_columnar(filepath):
+    """
+    Decodifica um arquivo .MBE em colunas NumPy, sem criar listas por célula.
+    Todas as linhas de uma planilha são lidas de uma vez com um dtype estruturado
+    (passo de linha alinhado em 8 bytes). Colunas numéricas são views sobre os bytes
+    do arquivo; colunas String/StringID são arrays de objetos montados a partir da CHNK.
+
+    Retorna uma lista de planilhas: {'name', 'columns', 'headers', 'num_rows', 'arrays'},
+    onde 'arrays' mapeia cada header (na ordem de 'headers') para um array de num_rows
+    elementos: int32 (Int/IntID), int8 (byte), float32 (float) ou object com str
+    (String/StringID, '' quando a célula não tem string na CHNK).
+    """
+    if np is None:
+        raise ImportError("NumPy é necessário para o modo colunar (pip install numpy).")
+
+    with open(filepath, 'rb') as f:
+        data = f.read()
+
+    view = memoryview(data)
+    sheets, chnk_offset = scan_mbe_layout(view)
+
+    chnk_entries = list(iter_chnk_strings(view, chnk_offset, verbose=False))
+    chnk_offsets = np.array([offset for offset, _ in chnk_entries], dtype=np.int64)
+    chnk_values = np.empty(len(chnk_entries), dtype=object)
+    chnk_values[:] = [value for _, value in chnk_entries]
+    order = np.argsort(chnk_offsets, kind='stable')
+    chnk_offsets, chnk_values = chnk_offsets[order], chnk_values[order]
+
+    result = []
+    for sheet in sheets:
+        num_rows = max(sheet['num_rows'], 0)
+        if num_rows > 0:
+            table = np.ndarray(shape=(num_rows,), dtype=build_row_dtype(sheet), buffer=data,
+                               offset=sheet['rows_offset'], strides=(sheet['row_stride'],))
+        else:
+            table = np.zeros(0, dtype=build_row_dtype(sheet))
+
+        arrays = {}
+        for col_idx, header in enumerate(sheet['headers']):
+            if col_idx in sheet['string_columns']:
+                arrays[header] = join_string_column(sheet, col_idx, chnk_offsets, chnk_values)
+            else:
+                arrays[header] = table[header]
+
+        result.append({
+            'name': sheet['name'], 'columns': sheet['columns'],
+            'headers': sheet['headers'], 'num_rows': num_rows, 'arrays': arrays
+        })
+    return result
+
 def create_csv_files(output_dir, sheets_data):
     if not sheets_data:
         print("Nenhum dado para gerar CSVs.")
@@ -157,10 +427,8 @@ def create_csv_files(output_dir, sheets_data):
     # **** REGRA DE NOMENCLATURA CORRIGIDA ****
     # Itera usando enumerate para obter o índice da planilha
     for idx, sheet in enumerate(sheets_data):
-        safe_sheet_name = "".join(c for c in sheet['name'] if c.isalnum() or c in (' ', '_', '-')).rstrip()
         # Adiciona o prefixo numérico ao nome do arquivo
-        csv_filename = f"{idx}_{safe_sheet_name}.csv"
-        csv_filepath = os.path.join(output_dir, csv_filename)
+        csv_filepath = os.path.join(output_dir, csv_filename_for_sheet(idx, sheet['name']))
 
         try:
             with open(csv_filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
@@ -173,17 +441,142 @@ def create_csv_files(output_dir, sheets_data):
         except IOError as e:
             print(f"Erro ao escrever o arquivo CSV '{csv_filepath}': {e}")
 
+# --- Modo streaming (memória limitada) ---
+
+def csv_filename_for_sheet(idx, sheet_name):
+    """Nome do CSV de uma planilha: '<índice>_<nome seguro>.csv' (mesma regra de create_csv_files)."""
+    safe_sheet_name = "".join(c for c in sheet_name if c.isalnum() or c in (' ', '_', '-')).rstrip()
+    return f"{idx}_{safe_sheet_name}.csv"
+
+def index_chnk_strings(view, sheets, chnk_offset, log=print):
+    """
+    1ª passada: lê apenas a seção CHNK e indexa offset simbólico -> string.
+    A memória usada é proporcional à tabela de strings, não ao número de linhas.
+    """
+    sheet_starts = [sheet['rows_offset'] for sheet in sheets]
+    strings_by_offset = {}
+    for symbolic_offset, string_value in iter_chnk_strings(view, chnk_offset, log=log):
+        if locate_string(sheets, sheet_starts, symbolic_offset):
+            strings_by_offset[symbolic_offset] = string_value
+        else:
+            log(f"Aviso: A string '{string_value}' com offset simbólico {symbolic_offset} não corresponde a nenhuma localização mapeada na seção EXPA.")
+    return strings_by_offset
+
+def stream_sheet_rows(view, sheet, strings_by_offset):
+    """2ª passada: gera as linhas de uma planilha já com as strings, uma por vez."""
+    unpack_from = sheet['row_struct'].unpack_from
+    string_columns = [(col_idx, sheet['column_offsets'][col_idx]) for col_idx in sheet['string_columns']]
+    row_offset = sheet['rows_offset']
+    row_stride = sheet['row_stride']
+
+    for _ in range(sheet['num_rows']):
+        parsed_row = list(unpack_from(view, row_offset))
+        for col_idx, column_offset in string_columns:
+            parsed_row.insert(col_idx, strings_by_offset.get(row_offset + column_offset, ''))
+        yield parsed_row
+        row_offset += row_stride
+
+def stream_mbe_to_csv(filepath, output_dir, log=print):
+    """
+    Converte um .MBE em CSVs sem manter todas as linhas em memória.
+    1ª passada: headers EXPA + índice da CHNK; 2ª passada: linhas direto para o csv.writer,
+    uma planilha por vez. Gera os mesmos arquivos que parse_mbe() + create_csv_files().
+    As mensagens vão para log (padrão: print). Retorna o número de planilhas, ou None em caso de erro.
+    """
+    try:
+        with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                sheets, chnk_offset = scan_mbe_layout(view)
+                log(f"Arquivo MBE detectado. Encontradas {len(sheets)} planilhas (Regiões EXPA).")
+
+                # Valida o arquivo inteiro antes de escrever qualquer CSV
+                for sheet in sheets:
+                    if sheet['num_rows'] > 0:
+                        rows_end = sheet['rows_offset'] + (sheet['num_rows'] - 1) * sheet['row_stride'] + sheet['row_struct'].size
+                        if rows_end > len(view):
+                            raise ValueError(f"Arquivo truncado na planilha '{sheet['name']}'.")
+                strings_by_offset = index_chnk_strings(view, sheets, chnk_offset, log)
+
+                if not sheets:
+                    log("Nenhum dado para gerar CSVs.")
+                    return 0
+
+                if not os.path.exists(output_dir):
+                    os.makedirs(output_dir)
+                    log(f"\nDiretório '{output_dir}' criado.")
+
+                log("\n--- Gerando arquivos CSV ---")
+                failed = []
+                for idx, sheet in enumerate(sheets):
+                    csv_filepath = os.path.join(output_dir, csv_filename_for_sheet(idx, sheet['name']))
+                    try:
+                        with open(csv_filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
+                            writer = csv.writer(csvfile)
+                            writer.writerow(sheet['headers'])
+                            writer.writerows(stream_sheet_rows(view, sheet, strings_by_offset))
+                        log(f"Arquivo '{csv_filepath}' gerado com sucesso.")
+                    except IOError as e:
+                        log(f"Erro ao escrever o arquivo CSV '{csv_filepath}': {e}")
+                        failed.append(os.path.basename(csv_filepath))
+
+                # Uma extração parcial é um erro: quem chama não deve tratá-la como completa
+                if failed:
+                    log(f"Erro: {len(failed)} de {len(sheets)} arquivo(s) CSV não puderam ser escritos: {', '.join(failed)}")
+                    return None
+
+            return len(sheets)
+
+    except FileNotFoundError:
+        log(f"Erro: O arquivo '{filepath}' não foi encontrado.")
+        return None
+    except Exception as e:
+        log(f"Ocorreu um erro inesperado durante o parsing: {e}")
+        import traceback
+        log(traceback.format_exc().rstrip())
+        return None
+
+def list_csv_files(filepath):
+    """
+    Nomes dos CSVs que stream_mbe_to_csv() gera para um .MBE, lendo apenas os
+    headers das Regiões EXPA (nenhuma linha ou string é decodificada).
+    """
+    with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            sheets, _ = scan_mbe_layout(view)
+            return [csv_filename_for_sheet(idx, sheet['name']) for idx, sheet in enumerate(sheets)]
+
+def print_columnar_summary(sheets):
+    """Mostra a estrutura devolvida por parse_mbe_columnar(): linhas e dtype de cada coluna."""
+    for sheet in sheets:
+        print(f"\nPlanilha '{sheet['name']}': {sheet['num_rows']} linhas")
+        for header in sheet['headers']:
+            print(f"  arrays['{header}']: {sheet['arrays'][header].dtype}")
+
 def main():
-    if len(sys.argv) != 2:
-        print("Uso: python parser_mbe.py <caminho_para_o_arquivo.mbe>")
+    args = sys.argv[1:]
+    columnar = '--columnar' in args
+    use_mmap = '--mmap' in args
+    args = [arg for arg in args if arg not in ('--columnar', '--mmap')]
+    if len(args) != 1 or (columnar and use_mmap):
+        print("Uso: python parser_mbe.py <caminho_para_o_arquivo.mbe> [--mmap | --columnar]")
+        print("  --mmap: gera os mesmos CSVs lendo o arquivo via mmap (parse_mbe_mmap)")
+        print("  --columnar: decodifica em colunas NumPy (parse_mbe_columnar) e mostra a estrutura, sem gerar CSVs")
         sys.exit(1)
 
-    input_filepath = sys.argv[1]
+    input_filepath = args[0]
     output_dir = os.path.splitext(os.path.basename(input_filepath))[0]
 
     print(f"Processando arquivo: {input_filepath}")
-    
-    sheets_data = parse_mbe(input_filepath)
+
+    if columnar:
+        try:
+            print_columnar_summary(parse_mbe_columnar(input_filepath))
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Erro: {e}")
+            sys.exit(1)
+        return
+
+    sheets_data = parse_mbe_mmap(input_filepath) if use_mmap else parse_mbe(input_filepath)
 
     if sheets_data:
         create_csv_files(output_dir, sheets_data)
@@ -47,26 +47,24 @@ def calculate_expa_area_size(columns):
 
 # --- Lógica Principal de Repack ---
 
-def repack_mbe(input_dir, output_filepath):
-    print(f"Iniciando repack da pasta '{input_dir}' para '{output_filepath}'")
-    
+def load_csv_sheets(input_dir, log=print):
+    """Lê os arquivos '0_nome.csv', '1_nome.csv', ... da pasta. Retorna a lista de planilhas ou None."""
     try:
         csv_files = sorted(
             [f for f in os.listdir(input_dir) if f.endswith('.csv')],
             key=lambda f: int(f.split('_')[0])
         )
     except (ValueError, IndexError):
-        print("Erro: os arquivos CSV na pasta não estão no formato '0_nome.csv', '1_nome.csv', etc.")
-        return
+        log("Erro: os arquivos CSV na pasta não estão no formato '0_nome.csv', '1_nome.csv', etc.")
+        return None
 
     if not csv_files:
-        print("Nenhum arquivo CSV encontrado na pasta.")
-        return
+        log("Nenhum arquivo CSV encontrado na pasta.")
+        return None
 
-    print(f"Arquivos encontrados e ordenados: {csv_files}")
+    log(f"Arquivos encontrados e ordenados: {csv_files}")
 
     all_sheets_data = []
-    chnk_strings_to_write = []
 
     for filename in csv_files:
         sheet_name = '_'.join(filename.split('_')[1:]).replace('.csv', '')
@@ -85,6 +83,17 @@ def repack_mbe(input_dir, output_filepath):
 
         all_sheets_data.append(sheet)
 
+    return all_sheets_data
+
+def repack_mbe(input_dir, output_filepath):
+    print(f"Iniciando repack da pasta '{input_dir}' para '{output_filepath}'")
+    
+    all_sheets_data = load_csv_sheets(input_dir)
+    if all_sheets_data is None:
+        return False
+
+    chnk_strings_to_write = []
+
     with open(output_filepath, 'wb') as f:
         f.write(b'EXPA')
         f.write(struct.pack('<i', len(all_sheets_data)))
@@ -166,6 +175,146 @@ def repack_mbe(input_dir, output_filepath):
             f.write(padded_string_bytes)
     
     print(f"\nRepack concluído. Arquivo '{output_filepath}' foi criado com sucesso.")
+    return True
+
+
+# --- Repack em buffer (um bytearray por planilha) ---
+
+def compile_row_packer(columns):
+    """
+    Compila o formato de uma Área EXPA (linha) em um único struct.Struct para pack_into.
+    Colunas String/StringID viram '8x' (zeros); o texto vai para a seção CHNK.
+    Retorna (row_struct, column_offsets, converters, value_slots).
+    """
+    fmt_parts = ['<']
+    column_offsets = []
+    converters = []
+    value_slots = []
+    current_offset = 0
+
+    for col_info in columns:
+        align = 8 if col_info['size'] == 8 else 4
+        if col_info['size'] == 1: align = 1
+        aligned_offset = (current_offset + align - 1) & ~(align - 1)
+        if aligned_offset > current_offset:
+            fmt_parts.append(f"{aligned_offset - current_offset}x")
+        column_offsets.append(aligned_offset)
+
+        if col_info['name'] in ('String', 'StringID'):
+            fmt_parts.append('8x')
+            converters.append(None)
+            value_slots.append(None)
+        else:
+            fmt_parts.append(col_info['format'][1:])
+            converters.append(float if col_info['name'] == 'float' else int)
+            value_slots.append(sum(1 for slot in value_slots if slot is not None))
+
+        current_offset = aligned_offset + col_info['size']
+
+    return struct.Struct(''.join(fmt_parts)), column_offsets, converters, value_slots
+
+def padded_string_bytes(text):
+    """Mesmo conteúdo que write_padded_string() escreveria."""
+    if not text:
+        return b'\x00\x00\x00\x00'
+    encoded_data = text.encode('utf-8') + b'\x00\x00'
+    padded_size = (len(encoded_data) + 3) & ~3
+    return encoded_data.ljust(padded_size, b'\x00')
+
+def build_sheet_buffer(sheet, sheet_offset, chnk_strings_to_write):
+    """
+    Monta header + todas as linhas de uma planilha em um único bytearray pré-alocado.
+    sheet_offset é a posição absoluta da planilha no arquivo (usada nos offsets simbólicos).
+    """
+    columns = sheet['columns']
+    rows = sheet['rows']
+    name_bytes = padded_string_bytes(sheet['name'])
+    expa_area_size = calculate_expa_area_size(columns)
+    column_codes = [col['code'] for col in columns]
+
+    header = b''.join([
+        struct.pack('<i', len(name_bytes)), name_bytes,
+        struct.pack('<i', len(columns)), struct.pack(f'<{len(column_codes)}i', *column_codes),
+        struct.pack('<ii', expa_area_size, len(rows)),
+    ])
+    if not rows:
+        return bytearray(header)
+
+    # Padding 0xCC antes de cada linha (alinhamento de 8); zeros dentro da linha
+    header_end = sheet_offset + len(header)
+    leading_padding = ((header_end + 7) & ~7) - header_end
+    row_stride = (expa_area_size + 7) & ~7
+    rows_start = len(header) + leading_padding
+    buffer_size = rows_start + (len(rows) - 1) * row_stride + expa_area_size
+
+    buffer = bytearray(buffer_size)
+    buffer[:len(header)] = header
+    buffer[len(header):rows_start] = b'\xcc' * leading_padding
+    for gap_byte in range(expa_area_size, row_stride):
+        gap_count = len(range(rows_start + gap_byte, buffer_size, row_stride))
+        buffer[rows_start + gap_byte:buffer_size:row_stride] = b'\xcc' * gap_count
+
+    row_struct, column_offsets, converters, value_slots = compile_row_packer(columns)
+    pack_into = row_struct.pack_into
+    num_values = sum(1 for slot in value_slots if slot is not None)
+    row_offset = rows_start
+
+    for row_data in rows:
+        values = [0] * num_values
+        for col_idx, value_str in enumerate(row_data):
+            converter = converters[col_idx]
+            if converter is None:
+                if value_str:
+                    chnk_strings_to_write.append((sheet_offset + row_offset + column_offsets[col_idx], value_str))
+            elif value_str:  # Células vazias ficam 0
+                values[value_slots[col_idx]] = converter(value_str)
+        pack_into(buffer, row_offset, *values)
+        row_offset += row_stride
+
+    return buffer
+
+def build_chnk_section(chnk_strings_to_write):
+    """Monta a seção CHNK inteira em um único bloco de bytes."""
+    parts = [b'CHNK', struct.pack('<i', len(chnk_strings_to_write))]
+    pack_entry = struct.Struct('<ii').pack
+    for symbolic_offset, text in chnk_strings_to_write:
+        string_bytes = padded_string_bytes(text)
+        parts.append(pack_entry(symbolic_offset, len(string_bytes)))
+        parts.append(string_bytes)
+    return b''.join(parts)
+
+def repack_mbe_buffered(input_dir, output_filepath, log=print):
+    """
+    Mesmo resultado (byte a byte) que repack_mbe(), mas cada planilha é montada em um
+    bytearray com struct.pack_into e o arquivo é gravado com poucas escritas grandes.
+    As mensagens vão para log (padrão: print).
+    """
+    log(f"Iniciando repack da pasta '{input_dir}' para '{output_filepath}'")
+
+    all_sheets_data = load_csv_sheets(input_dir, log)
+    if all_sheets_data is None:
+        return False
+
+    chnk_strings_to_write = []
+    chunks = [b'EXPA' + struct.pack('<i', len(all_sheets_data))]
+    position = len(chunks[0])
+
+    for sheet in all_sheets_data:
+        log(f"\n--- Empacotando planilha: {sheet['name']} ---")
+        sheet_buffer = build_sheet_buffer(sheet, position, chnk_strings_to_write)
+        chunks.append(sheet_buffer)
+        position += len(sheet_buffer)
+
+    chunks.append(b'\x00' * ((8 - position % 8) % 8))
+    log(f"\n--- Empacotando Seção CHNK com {len(chnk_strings_to_write)} strings ---")
+    chunks.append(build_chnk_section(chnk_strings_to_write))
+
+    with open(output_filepath, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+    log(f"\nRepack concluído. Arquivo '{output_filepath}' foi criado com sucesso.")
+    return True
 
 
 def main():
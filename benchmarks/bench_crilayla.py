@@ -0,0 +1,191 @@
+"""
+Benchmark: CPKReader.decompress_crilayla vs a bit-at-a-time reference decoder
+on a corpus of synthetic CRILAYLA payloads.
+
+Usage:
+    python benchmarks/bench_crilayla.py [payloads] [payload KB]   (default: 24 payloads of 256 KB)
+"""
+import os
+import sys
+import time
+import random
+import struct
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import CPKReader  # noqa: E402
+from CPKReader import CRILAYLA_MAGIC, CRILAYLA_HEADER_SIZE  # noqa: E402
+
+MAX_DISTANCE = 0x1FFF + 3
+MIN_MATCH = 3
+
+# ============================================================================
+# Synthetic Corpus
+# ============================================================================
+
+def make_payload(rnd, size):
+    """Mix of game-like content: text tables, fixed-size records and noise"""
+    words = [b'Agumon', b'Gabumon', b'Time Stranger', b'\x00\x00\x00\x00', b'HP', b'ATK', b'<color=red>', b'\r\n']
+    parts = []
+    total = 0
+    while total < size:
+        kind = rnd.random()
+        if kind < 0.5:
+            part = b' '.join(rnd.choice(words) for _ in range(rnd.randint(4, 64)))
+        elif kind < 0.85:
+            part = b''.join(struct.pack('<IIf', index, rnd.randint(0, 999), index * 0.5)
+                            for index in range(rnd.randint(8, 128)))
+        else:
+            part = rnd.randbytes(rnd.randint(16, 512))
+        parts.append(part)
+        total += len(part)
+    return b''.join(parts)[:size]
+
+def compress_crilayla(data):
+    """
+    Greedy CRILAYLA compressor (benchmark input only, not tuned for ratio).
+
+    Mirrors the decoder: positions are coded from the end of the data down
+    to CRILAYLA_HEADER_SIZE, each as a literal or a copy from higher up.
+    """
+    out_bytes = bytearray()
+    acc = 0
+    acc_bits = 0
+
+    def emit(value, count):
+        nonlocal acc, acc_bits
+        acc = (acc << count) | value
+        acc_bits += count
+        while acc_bits >= 8:
+            acc_bits -= 8
+            out_bytes.append((acc >> acc_bits) & 0xFF)
+        acc &= (1 << acc_bits) - 1
+
+    last_seen = {}  # 3-byte key ending at a position -> nearest such position above
+    registered = len(data)
+    write = len(data) - 1
+    while write >= CRILAYLA_HEADER_SIZE:
+        while registered > write + MIN_MATCH:
+            registered -= 1
+            last_seen[data[registered - 2:registered + 1]] = registered
+
+        length = 0
+        source = last_seen.get(data[write - 2:write + 1]) if write - 2 >= CRILAYLA_HEADER_SIZE else None
+        if source is not None and source - write <= MAX_DISTANCE:
+            limit = min(write - CRILAYLA_HEADER_SIZE + 1, 4096)
+            while length < limit and data[write - length] == data[source - length]:
+                length += 1
+
+        if length >= MIN_MATCH:
+            emit(1, 1)
+            emit(source - write - 3, 13)
+            remaining = length - 3
+            for level_bits in (2, 3, 5):
+                level = min(remaining, (1 << level_bits) - 1)
+                emit(level, level_bits)
+                remaining -= level
+                if level != (1 << level_bits) - 1:
+                    break
+            else:
+                while True:
+                    level = min(remaining, 0xFF)
+                    emit(level, 8)
+                    remaining -= level
+                    if level != 0xFF:
+                        break
+            write -= length
+        else:
+            emit(0, 1)
+            emit(data[write], 8)
+            write -= 1
+
+    if acc_bits:
+        out_bytes.append((acc << (8 - acc_bits)) & 0xFF)
+    out_bytes.reverse()
+    return (CRILAYLA_MAGIC + struct.pack('<II', len(data) - CRILAYLA_HEADER_SIZE, len(out_bytes))
+            + bytes(out_bytes) + data[:CRILAYLA_HEADER_SIZE])
+
+# ============================================================================
+# Reference Decoder
+# ============================================================================
+
+def decompress_reference(data):
+    """Straightforward decoder: one bit and one output byte at a time"""
+    uncompressed_size, header_offset = struct.unpack_from('<II', data, 8)
+    prefix_start = 0x10 + header_offset
+    output = bytearray(CRILAYLA_HEADER_SIZE + uncompressed_size)
+    output[:CRILAYLA_HEADER_SIZE] = data[prefix_start:prefix_start + CRILAYLA_HEADER_SIZE]
+    position = prefix_start - 1
+    bit_pool = 0
+    bits_left = 0
+
+    def read_bits(count):
+        nonlocal position, bit_pool, bits_left
+        value = 0
+        for _ in range(count):
+            if bits_left == 0:
+                bit_pool = data[position]
+                bits_left = 8
+                position -= 1
+            bits_left -= 1
+            value = (value << 1) | ((bit_pool >> bits_left) & 1)
+        return value
+
+    write = len(output) - 1
+    while write >= CRILAYLA_HEADER_SIZE:
+        if read_bits(1):
+            source = write + read_bits(13) + 3
+            length = 3
+            for level_bits in (2, 3, 5, 8):
+                level = read_bits(level_bits)
+                length += level
+                if level != (1 << level_bits) - 1:
+                    break
+            else:
+                level = 0xFF
+                while level == 0xFF:
+                    level = read_bits(8)
+                    length += level
+            for _ in range(length):
+                output[write] = output[source]
+                write -= 1
+                source -= 1
+        else:
+            output[write] = read_bits(8)
+            write -= 1
+    return bytes(output)
+
+# ============================================================================
+# Benchmark
+# ============================================================================
+
+def time_decoder(decode, corpus):
+    """Decode every payload and return (elapsed seconds, outputs)"""
+    start = time.perf_counter()
+    outputs = [decode(compressed) for compressed in corpus]
+    return time.perf_counter() - start, outputs
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    payload_size = (int(sys.argv[2]) if len(sys.argv) > 2 else 256) * 1024
+
+    rnd = random.Random(1234)
+    payloads = [make_payload(rnd, payload_size) for _ in range(count)]
+    corpus = [compress_crilayla(payload) for payload in payloads]
+
+    reference_time, reference_outputs = time_decoder(decompress_reference, corpus)
+    fast_time, fast_outputs = time_decoder(CPKReader.decompress_crilayla, corpus)
+
+    identical = fast_outputs == reference_outputs == payloads
+    raw_mb = sum(len(payload) for payload in payloads) / (1024 * 1024)
+    compressed_mb = sum(len(compressed) for compressed in corpus) / (1024 * 1024)
+
+    print(f"Payloads: {count} x {payload_size // 1024} KB, {raw_mb:.1f} MB -> {compressed_mb:.1f} MB"
+          f" compressed, identical: {identical}")
+    print(f"reference:            {reference_time:.2f}s ({raw_mb / reference_time:.1f} MB/s)")
+    print(f"decompress_crilayla:  {fast_time:.2f}s ({raw_mb / fast_time:.1f} MB/s,"
+          f" {reference_time / fast_time:.1f}x)")
+    if not identical:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
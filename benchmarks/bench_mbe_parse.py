@@ -0,0 +1,68 @@
+"""
+Benchmark: MBE_Parser.parse_mbe (row lists) vs parse_mbe_columnar (NumPy
+columns) on a synthetic table; checks that both decode the same values.
+
+Usage:
+    python benchmarks/bench_mbe_parse.py [rows]   (default: 200000 rows, needs NumPy)
+"""
+import os
+import sys
+import io
+import time
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Tools", "THL-MBE-Parser"))
+import MBE_Parser  # noqa: E402
+import MBE_Repacker  # noqa: E402
+from bench_mbe_repack import write_synthetic_table  # noqa: E402
+
+def time_parse(parse_func, mbe_path):
+    """Run one parse with console output suppressed and return (elapsed seconds, sheets)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sheets = parse_func(mbe_path)
+    if sheets is None:
+        raise RuntimeError(f"{parse_func.__name__} failed")
+    return time.perf_counter() - start, sheets
+
+def same_values(row_sheets, columnar_sheets):
+    """True if the columnar arrays hold the same values as the row lists"""
+    if len(row_sheets) != len(columnar_sheets):
+        return False
+    for row_sheet, columnar_sheet in zip(row_sheets, columnar_sheets):
+        if row_sheet['headers'] != columnar_sheet['headers']:
+            return False
+        for col_idx, header in enumerate(row_sheet['headers']):
+            column = [row[col_idx] for row in row_sheet['rows']]
+            if column != columnar_sheet['arrays'][header].tolist():
+                return False
+    return True
+
+def main():
+    if MBE_Parser.np is None:
+        print("NumPy is not installed (pip install numpy)")
+        sys.exit(1)
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_dir = os.path.join(work_dir, "synthetic")
+        os.makedirs(csv_dir)
+        write_synthetic_table(csv_dir, rows)
+        mbe_path = os.path.join(work_dir, "synthetic.mbe")
+        if not MBE_Repacker.repack_mbe_buffered(csv_dir, mbe_path, log=lambda message: None):
+            raise RuntimeError("repack_mbe_buffered failed")
+        size_mb = os.path.getsize(mbe_path) / (1024 * 1024)
+
+        row_time, row_sheets = time_parse(MBE_Parser.parse_mbe, mbe_path)
+        columnar_time, columnar_sheets = time_parse(MBE_Parser.parse_mbe_columnar, mbe_path)
+        identical = same_values(row_sheets, columnar_sheets)
+
+    print(f"Rows: {rows}, input: {size_mb:.1f} MB, same values: {identical}")
+    print(f"parse_mbe:          {row_time:.2f}s")
+    print(f"parse_mbe_columnar: {columnar_time:.2f}s ({row_time / columnar_time:.1f}x)")
+    if not identical:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: MBE_Repacker.repack_mbe vs repack_mbe_buffered on a synthetic table.
+
+Usage:
+    python benchmarks/bench_mbe_repack.py [rows]   (default: 200000 rows)
+"""
+import os
+import sys
+import csv
+import io
+import time
+import random
+import filecmp
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Tools", "THL-MBE-Parser"))
+import MBE_Repacker  # noqa: E402
+
+COLUMNS = ['IntID', 'Int', 'byte', 'float', 'String', 'StringID', 'byte', 'Int']
+
+def write_synthetic_table(csv_dir, rows, seed=1234):
+    """Write one sheet with a mix of every column type"""
+    rnd = random.Random(seed)
+    words = ['', 'Agumon', 'Gabumon', 'Time Stranger', 'línea\nnueva', 'x' * 40]
+    with open(os.path.join(csv_dir, '0_synthetic.csv'), 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow([f"{name}_{idx}" for idx, name in enumerate(COLUMNS)])
+        for row_idx in range(rows):
+            writer.writerow([
+                row_idx, rnd.randint(-100000, 100000), rnd.randint(-128, 127), rnd.choice(['0.5', '1.25', '']),
+                rnd.choice(words), f"id_{row_idx}", rnd.randint(0, 127), '',
+            ])
+
+def time_repack(repack_func, csv_dir, output_path):
+    """Run one repack with console output suppressed and return elapsed seconds"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not repack_func(csv_dir, output_path):
+            raise RuntimeError(f"{repack_func.__name__} failed")
+    return time.perf_counter() - start
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_dir = os.path.join(work_dir, "synthetic")
+        os.makedirs(csv_dir)
+        write_synthetic_table(csv_dir, rows)
+
+        reference_path = os.path.join(work_dir, "reference.mbe")
+        buffered_path = os.path.join(work_dir, "buffered.mbe")
+        reference_time = time_repack(MBE_Repacker.repack_mbe, csv_dir, reference_path)
+        buffered_time = time_repack(MBE_Repacker.repack_mbe_buffered, csv_dir, buffered_path)
+
+        identical = filecmp.cmp(reference_path, buffered_path, shallow=False)
+        size_mb = os.path.getsize(reference_path) / (1024 * 1024)
+
+    print(f"Rows: {rows}, output: {size_mb:.1f} MB, byte-identical: {identical}")
+    print(f"repack_mbe:          {reference_time:.2f}s")
+    print(f"repack_mbe_buffered: {buffered_time:.2f}s ({reference_time / buffered_time:.1f}x)")
+    if not identical:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
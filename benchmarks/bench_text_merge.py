@@ -0,0 +1,114 @@
+"""
+Benchmark: TEXTBatch.merge_csv_files (streaming, and with parallel readers)
+vs the former list-based merge on a synthetic CSV tree; reports time,
+throughput and peak memory.
+
+Usage:
+    python benchmarks/bench_text_merge.py [directories] [files per directory] [rows per file]
+    (default: 20 directories x 50 files x 400 rows)
+"""
+import os
+import sys
+import csv
+import time
+import random
+import filecmp
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import TEXTBatch  # noqa: E402
+
+# ============================================================================
+# Synthetic Corpus
+# ============================================================================
+
+def write_csv_tree(root, directories, files, rows, seed=1234):
+    """Write directories of CSV files shaped like extracted MBE text tables"""
+    rnd = random.Random(seed)
+    words = ['Agumon', 'Gabumon', 'Time Stranger', 'línea\nnueva', '<color=red>', '"quoted"', '']
+    for dir_idx in range(directories):
+        dir_path = os.path.join(root, f"table_{dir_idx:03d}")
+        os.makedirs(dir_path)
+        for file_idx in range(files):
+            with open(os.path.join(dir_path, f"{file_idx}_sheet.csv"), 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.writer(f)
+                writer.writerow(['IntID_0', 'String_1', 'String_2'])
+                for row_idx in range(rows):
+                    writer.writerow([row_idx, ' '.join(rnd.choice(words) for _ in range(rnd.randint(1, 12))),
+                                     rnd.choice(words)])
+
+# ============================================================================
+# Reference Merge
+# ============================================================================
+
+def merge_reference(source, target):
+    """The former merge: every row in one list, escaped into a second list, then written"""
+    all_rows = []
+    headers = None
+    for dir_name, dir_path, csv_files in TEXTBatch.scan_csv_directories(source):
+        for csv_file in csv_files:
+            with open(os.path.join(dir_path, csv_file), 'r', encoding='utf-8-sig') as f:
+                file_rows = list(csv.reader(f))
+                if file_rows:
+                    if headers is None:
+                        headers = file_rows[0] + ['metadata']
+                        all_rows.append(headers)
+                    metadata = f"{dir_name}/{csv_file}"
+                    for row in file_rows[1:]:
+                        all_rows.append(row + [metadata])
+    escaped_rows = [[str(cell).replace('\n', '\\n').replace('\r', '') for cell in row] for row in all_rows]
+    with open(target, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f, delimiter='\t').writerows(escaped_rows)
+
+# ============================================================================
+# Benchmark
+# ============================================================================
+
+def measure(merge, source, target):
+    """Run one merge and return (elapsed seconds, peak traced memory in MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    merge(source, target)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    directories = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rows = int(sys.argv[3]) if len(sys.argv) > 3 else 400
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = os.path.join(work_dir, "csv")
+        write_csv_tree(source, directories, files, rows)
+        reference_path = os.path.join(work_dir, "reference.tsv")
+        streaming_path = os.path.join(work_dir, "streaming.tsv")
+        parallel_path = os.path.join(work_dir, "parallel.tsv")
+        readers = TEXTBatch.default_merge_readers()
+
+        reference_time, reference_peak = measure(merge_reference, source, reference_path)
+        streaming_time, streaming_peak = measure(
+            lambda source, target: TEXTBatch.merge_csv_files(source, target, jobs=1), source, streaming_path)
+        parallel_time, parallel_peak = measure(
+            lambda source, target: TEXTBatch.merge_csv_files(source, target, jobs=readers), source, parallel_path)
+
+        identical = (filecmp.cmp(reference_path, streaming_path, shallow=False)
+                     and filecmp.cmp(reference_path, parallel_path, shallow=False))
+        input_mb = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(source) for name in names) / (1024 * 1024)
+
+    print(f"Input: {directories * files} files, {directories * files * rows} rows, {input_mb:.1f} MB,"
+          f" byte-identical: {identical}")
+    print(f"list-based:       {reference_time:.2f}s ({input_mb / reference_time:.1f} MB/s),"
+          f" peak {reference_peak:.1f} MB")
+    print(f"streaming:        {streaming_time:.2f}s ({input_mb / streaming_time:.1f} MB/s),"
+          f" peak {streaming_peak:.1f} MB")
+    print(f"{f'{readers} readers:':<18}{parallel_time:.2f}s"
+          f" ({input_mb / parallel_time:.1f} MB/s), peak {parallel_peak:.1f} MB")
+    if not identical:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Smoke run of the headless CLI: checks the --jobs default of every
+subcommand, then runs the self-contained subcommands (MBE, TEXT and MVGL
+with the built-in tools) on a small synthetic table without -j.
+
+Usage:
+    python benchmarks/smoke_cli.py
+"""
+import os
+import sys
+import csv
+import tempfile
+import contextlib
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dststools  # noqa: E402
+
+# Subcommands whose worker count is sized by the operation itself without --jobs
+AUTO_JOBS = {('text', 'merge'), ('img', 'to-png'), ('img', 'to-img')}
+
+def subcommands(parser):
+    """Yield (group, action, parser) for every subcommand"""
+    for group_action in parser._subparsers._group_actions:
+        for group, group_parser in group_action.choices.items():
+            for action_action in group_parser._subparsers._group_actions:
+                for action, action_parser in action_action.choices.items():
+                    yield group, action, action_parser
+
+def check_jobs_defaults():
+    """Return the subcommands whose --jobs default is wrong"""
+    errors = []
+    for group, action, action_parser in subcommands(dststools.build_parser()):
+        default = action_parser.get_default('jobs')
+        if (group, action) in AUTO_JOBS:
+            ok = default is None
+        else:
+            ok = isinstance(default, int) and default >= 1
+        if not ok:
+            errors.append(f"{group} {action}: --jobs default {default!r}")
+    return errors
+
+def write_csv_tree(root):
+    """Two tables of one sheet each, shaped like extracted MBE text tables"""
+    for table in ('item_name', 'message'):
+        table_dir = os.path.join(root, table)
+        os.makedirs(table_dir)
+        with open(os.path.join(table_dir, '0_sheet.csv'), 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(['IntID_0', 'String_1'])
+            for row_idx in range(20):
+                writer.writerow([row_idx, f"{table} {row_idx}\nline two"])
+
+def main():
+    failed = check_jobs_defaults()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.environ['XDG_CACHE_HOME'] = os.path.join(work_dir, "cache")  # Keep the extraction cache private
+        csv_dir = os.path.join(work_dir, "csv")
+        write_csv_tree(csv_dir)
+        mbe_dir = os.path.join(work_dir, "mbe")
+        tsv_path = os.path.join(work_dir, "text.tsv")
+        mvgl_path = os.path.join(work_dir, "text.mvgl")
+        runs = [
+            ['mbe', 'repack', csv_dir, mbe_dir],
+            ['mbe', 'repack', csv_dir, mbe_dir, '--full'],
+            ['mbe', 'extract', mbe_dir, os.path.join(work_dir, "extracted")],
+            ['mbe', 'extract', mbe_dir, os.path.join(work_dir, "extracted_no_cache"), '--no-cache'],
+            ['text', 'merge', csv_dir, tsv_path, '--index'],
+            ['text', 'split', tsv_path, os.path.join(work_dir, "split"), '--incremental'],
+            ['text', 'index', tsv_path],
+            ['mvgl', 'pack', csv_dir, mvgl_path],
+            ['mvgl', 'list', mvgl_path],
+            ['mvgl', 'extract', mvgl_path, os.path.join(work_dir, "unpacked")],
+        ]
+        for argv in runs:
+            with open(os.devnull, 'w') as devnull, \
+                    contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+                try:
+                    code = dststools.main(argv)
+                except Exception as e:
+                    code = f"{type(e).__name__}: {e}"
+            status = "ok" if code == 0 else f"FAILED ({code})"
+            print(f"{' '.join(argv[:2]):<14} {status}")
+            if code != 0:
+                failed.append(' '.join(argv[:2]))
+
+    for error in failed:
+        print(f"- {error}")
+    print("Smoke run passed" if not failed else f"{len(failed)} failure(s)")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+dststools - headless batch CLI for DSTSTools.
+
+Runs the same batch engines as the GUI tabs without importing Qt, so it can
+be used from scripts, CI and build pipelines.
+
+Usage:
+    dststools mbe extract <mbe dir|file.mbe> <csv dir> [--jobs N] [--no-cache]
+    dststools mbe repack <csv dirs> <mbe dir> [--jobs N] [--full]
+    dststools mbe cache-clear
+    dststools text merge <csv dirs> <file.tsv> [--jobs N] [--index]
+    dststools text split <file.tsv> <csv dir> [--files PATTERN ...] [--incremental]
+    dststools text index <file.tsv>
+    dststools img to-png <img dir> <png dir> [--decoder auto|native|compressonator]
+    dststools img to-img <png dir> <img dir> [--no-cache]
+    dststools img cache-clear
+    dststools cpk list <file.cpk> [--files PATTERN ...]
+    dststools cpk extract <file.cpk> <out dir> [--files PATTERN ...] [--reader builtin|yacpktool]
+    dststools cpk repack <in dir> <file.cpk>
+    dststools cpk patch <original.cpk> <changed files dir> <file.cpk>
+    dststools mvgl list <file.mvgl> [--files PATTERN ...]
+    dststools mvgl extract <file.mvgl> <out dir> [--files PATTERN ...] [--reader builtin|dscstools]
+    dststools mvgl pack <in dir> <file.mvgl> [--writer builtin|dscstools] [--no-encrypt]
+
+Every command accepts --json to print progress and the final summary as
+JSON lines on stdout. The exit code is 0 on success, 1 if any file failed
+and 2 on invalid arguments.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+# ============================================================================
+# Progress Reporting
+# ============================================================================
+
+class Reporter:
+    """Print progress and summaries as plain text or JSON lines"""
+    def __init__(self, operation, json_mode=False):
+        self.operation = operation
+        self.json_mode = json_mode
+
+    def _emit(self, event, **fields):
+        print(json.dumps(dict(event=event, operation=self.operation, **fields), ensure_ascii=False), flush=True)
+
+    def file_done(self, done, total, name, error=None):
+        """Report one finished file"""
+        name = os.path.basename(os.path.normpath(name))
+        if self.json_mode:
+            self._emit('progress', done=done, total=total, file=name, ok=error is None, error=error)
+        elif error is None:
+            print(f"[{done}/{total}] {name}", file=sys.stderr, flush=True)
+        else:
+            print(f"[{done}/{total}] FAILED {name}: {error}", file=sys.stderr, flush=True)
+
+    def percent(self, value):
+        """Report overall progress of single-step operations"""
+        if self.json_mode:
+            self._emit('progress', percent=value)
+
+    def tool_progress(self, snapshot):
+        """Report progress of an external tool (a ToolProgress snapshot)"""
+        from ToolProgress import format_status
+        if self.json_mode:
+            fraction = snapshot['fraction']
+            self._emit('progress', percent=None if fraction is None else round(fraction * 100, 1),
+                       entries_done=snapshot['entries_done'], entries_total=snapshot['entries_total'],
+                       bytes_done=snapshot['bytes_done'], bytes_total=snapshot['bytes_total'],
+                       eta=None if snapshot['eta'] is None else round(snapshot['eta'], 1))
+        elif sys.stderr.isatty():
+            print(f"\r{format_status(snapshot):<70}", end="", file=sys.stderr, flush=True)
+
+    def log(self, message):
+        """Report a free-form log line"""
+        if self.json_mode:
+            self._emit('log', message=message)
+        else:
+            print(message, file=sys.stderr, flush=True)
+
+    def summary(self, processed, failures, elapsed, **extra):
+        """Report the final result and return the process exit code"""
+        if self.json_mode:
+            self._emit('summary', processed=processed, failed=len(failures),
+                       failures=[{'file': name, 'error': message} for name, message in failures],
+                       elapsed=round(elapsed, 3), **extra)
+        else:
+            details = ", ".join(f"{key.replace('_', ' ')}: {value}" for key, value in extra.items())
+            print(f"{self.operation}: {processed} succeeded, {len(failures)} failed"
+                  f" in {elapsed:.2f}s" + (f" ({details})" if details else ""))
+            for name, message in failures:
+                print(f"- {os.path.basename(os.path.normpath(name))}: {message}")
+        return EXIT_FAILED if failures else EXIT_OK
+
+    def fatal(self, message):
+        """Report an error that stopped the operation and return the exit code"""
+        return self.summary(0, [(self.operation, message)], 0.0)
+
+# ============================================================================
+# MBE Commands
+# ============================================================================
+
+def cmd_mbe_extract(args, reporter):
+    import MBEBatch
+
+    if os.path.isfile(args.source):
+        commands = [[args.source, args.target]]
+    else:
+        mbe_files = MBEBatch.scan_mbe_files(args.source)
+        if not mbe_files:
+            return reporter.fatal("No .MBE files found in source directory")
+        commands = MBEBatch.build_extract_commands(mbe_files, args.source, args.target)
+
+    try:
+        MBEBatch.import_mbe_parser()
+    except ImportError as e:
+        return reporter.fatal(f"Cannot import MBE_Parser.py: {str(e)}")
+
+    os.makedirs(args.target, exist_ok=True)
+    if args.no_cache:
+        result = MBEBatch.run_batch(MBEBatch.extract_mbe_file, commands, args.jobs, _file_progress(reporter))
+    else:
+        cache = MBEBatch.open_extract_cache(args.cache_limit * 1024 * 1024)
+        result = MBEBatch.run_cached_extract(commands, args.jobs, _file_progress(reporter), cache)
+    return _batch_summary(reporter, result)
+
+def cmd_mbe_repack(args, reporter):
+    import MBEBatch
+
+    csv_dirs = MBEBatch.scan_csv_directories(args.source)
+    if not csv_dirs:
+        return reporter.fatal("No directories containing CSV files found")
+
+    try:
+        MBEBatch.import_mbe_repacker()
+    except ImportError as e:
+        return reporter.fatal(f"Cannot import MBE_Repacker.py: {str(e)}")
+
+    os.makedirs(args.target, exist_ok=True)
+    commands = MBEBatch.build_repack_commands(csv_dirs, args.target)
+    if args.full:
+        result = MBEBatch.run_batch(MBEBatch.repack_mbe_dir, commands, args.jobs, _file_progress(reporter))
+    else:
+        result = MBEBatch.run_incremental_repack(commands, args.jobs, _file_progress(reporter))
+    return _batch_summary(reporter, result)
+
+def cmd_mbe_cache_clear(args, reporter):
+    import MBEBatch
+
+    start_time = time.perf_counter()
+    try:
+        freed = MBEBatch.clear_extract_cache()
+    except OSError as e:
+        return reporter.fatal(f"Cannot clear extraction cache: {str(e)}")
+    return reporter.summary(0, [], time.perf_counter() - start_time, freed_bytes=freed)
+
+def _file_progress(reporter):
+    def on_progress(done, total, command, error):
+        reporter.file_done(done, total, command[0], error)
+    return on_progress
+
+def _batch_summary(reporter, result):
+    extra = {'bytes': result['bytes']}
+    for key in ('skipped', 'cache_hits'):
+        if key in result:
+            extra[key] = result[key]
+    return reporter.summary(result['processed'], result['failures'], result['elapsed'], **extra)
+
+# ============================================================================
+# TEXT Commands
+# ============================================================================
+
+def cmd_text_merge(args, reporter):
+    import TEXTBatch
+
+    try:
+        result = TEXTBatch.merge_csv_files(args.source, args.target, reporter.percent, args.jobs, args.index)
+    except Exception as e:
+        return reporter.fatal(str(e))
+    return _text_summary(reporter, result)
+
+def cmd_text_split(args, reporter):
+    import TEXTBatch
+
+    try:
+        result = TEXTBatch.split_tsv_files(args.source, args.target, reporter.percent, args.files,
+                                           args.incremental)
+    except Exception as e:
+        return reporter.fatal(str(e))
+    return _text_summary(reporter, result)
+
+def cmd_text_index(args, reporter):
+    import TEXTBatch
+
+    try:
+        result = TEXTBatch.index_tsv_file(args.source, reporter.percent)
+    except Exception as e:
+        return reporter.fatal(str(e))
+    return _text_summary(reporter, result)
+
+def _text_summary(reporter, result):
+    if result['error']:
+        return reporter.fatal(result['error'])
+    snapshot = result['snapshot']
+    extra = {'rows': result['rows'], 'bytes': snapshot['bytes_done'],
+             'mb_per_s': round(snapshot['bytes_done'] / (1024 * 1024) / max(result['elapsed'], 1e-6), 1)}
+    if 'indexed' in result:
+        extra['indexed'] = result['indexed']
+    if 'written' in result:
+        extra.update(written=result['written'], skipped=result['skipped'], removed=result['removed'])
+    return reporter.summary(result['files'], [], result['elapsed'], **extra)
+
+# ============================================================================
+# IMG Commands
+# ============================================================================
+
+def cmd_img_to_png(args, reporter):
+    import IMGBatch
+    return _run_img_conversion(reporter, IMGBatch.convert_img_to_png, args, IMGBatch.DECODE_THREADS_PER_PROCESS,
+                               args.decoder)
+
+def cmd_img_to_img(args, reporter):
+    import IMGBatch
+    cache = None if args.no_cache else IMGBatch.open_encode_cache(args.cache_limit * 1024 * 1024)
+    return _run_img_conversion(reporter, IMGBatch.convert_png_to_img, args, IMGBatch.ENCODE_THREADS_PER_PROCESS,
+                               cache)
+
+def cmd_img_cache_clear(args, reporter):
+    import IMGBatch
+
+    start_time = time.perf_counter()
+    try:
+        freed = IMGBatch.clear_encode_cache()
+    except OSError as e:
+        return reporter.fatal(f"Cannot clear conversion cache: {str(e)}")
+    return reporter.summary(0, [], time.perf_counter() - start_time, freed_bytes=freed)
+
+def _run_img_conversion(reporter, func, args, threads_per_process, *options):
+    import IMGBatch
+
+    os.makedirs(args.target, exist_ok=True)
+    pool = IMGBatch.CompressonatorPool(args.jobs, threads_per_process)
+    result = func(args.source, args.target, reporter.percent, reporter.log, pool, *options)
+    if result['error']:
+        return reporter.fatal(result['error'])
+    extra = {}
+    if 'cache_hits' in result:
+        extra = {'cache_hits': result['cache_hits'], 'cache_time_saved': round(result['cache_time_saved'], 1)}
+    return reporter.summary(result['processed'], result['failures'], result['elapsed'], **extra)
+
+# ============================================================================
+# CPK / MVGL Commands
+# ============================================================================
+
+def cmd_cpk_list(args, reporter):
+    import CPKBatch
+
+    start_time = time.perf_counter()
+    try:
+        entries = CPKBatch.list_entries(args.source, args.files)
+    except (OSError, CPKBatch.CPKFormatError) as e:
+        return reporter.fatal(f"Cannot read CPK file: {str(e)}")
+    if reporter.json_mode:
+        for entry in entries:
+            reporter._emit('entry', path=entry.path, id=entry.id, offset=entry.offset,
+                           size=entry.size, extract_size=entry.extract_size)
+    else:
+        print(CPKBatch.format_listing(entries))
+    return reporter.summary(len(entries), [], time.perf_counter() - start_time,
+                            bytes=sum(entry.extract_size for entry in entries))
+
+def cmd_cpk_extract(args, reporter):
+    import CPKBatch
+
+    if args.reader == 'yacpktool':
+        if args.files:
+            return reporter.fatal("--files requires the built-in reader")
+        return _run_external(reporter, CPKBatch, CPKBatch.extract_command, args)
+
+    try:
+        result = CPKBatch.extract_native(args.source, args.target, args.files, reporter.tool_progress,
+                                         jobs=args.jobs)
+    except CPKBatch.CPKFormatError as e:
+        return reporter.fatal(f"Cannot read CPK file: {str(e)}")
+    snapshot = result['snapshot']
+    if result['total'] == 0:
+        return reporter.fatal("No files in the archive match the selected patterns")
+    return reporter.summary(result['processed'], result['failures'], result['elapsed'],
+                            bytes=snapshot['bytes_done'], entries=snapshot['entries_done'])
+
+def cmd_cpk_repack(args, reporter):
+    import CPKBatch
+    return _run_external(reporter, CPKBatch, CPKBatch.repack_command, args)
+
+def cmd_cpk_patch(args, reporter):
+    import CPKBatch
+
+    try:
+        result = CPKBatch.patch_cpk(args.original, args.source, args.target, reporter.tool_progress)
+    except CPKBatch.CPKFormatError as e:
+        return reporter.fatal(f"Cannot patch CPK file: {str(e)}")
+    if result['error']:
+        return reporter.fatal(result['error'])
+    return reporter.summary(result['replaced'], result['failures'], result['elapsed'],
+                            copied=result['copied'], bytes=result['snapshot']['bytes_done'])
+
+def cmd_mvgl_list(args, reporter):
+    import MVGLBatch
+
+    start_time = time.perf_counter()
+    try:
+        entries = MVGLBatch.list_entries(args.source, args.files)
+    except (OSError, MVGLBatch.MVGLFormatError) as e:
+        return reporter.fatal(f"Cannot read MVGL file: {str(e)}")
+    if reporter.json_mode:
+        for entry in entries:
+            reporter._emit('entry', path=entry.path, id=entry.id, offset=entry.offset,
+                           size=entry.size, extract_size=entry.extract_size)
+    else:
+        print(MVGLBatch.format_listing(entries))
+    return reporter.summary(len(entries), [], time.perf_counter() - start_time,
+                            bytes=sum(entry.extract_size for entry in entries))
+
+def cmd_mvgl_extract(args, reporter):
+    import MVGLBatch
+
+    if args.reader == 'dscstools':
+        if args.files:
+            return reporter.fatal("--files requires the built-in reader")
+        return _run_external(reporter, MVGLBatch, MVGLBatch.extract_command, args)
+
+    try:
+        result = MVGLBatch.extract_native(args.source, args.target, args.files, reporter.tool_progress,
+                                          jobs=args.jobs)
+    except (OSError, MVGLBatch.MVGLFormatError) as e:
+        return reporter.fatal(f"Cannot read MVGL file: {str(e)}")
+    snapshot = result['snapshot']
+    if result['total'] == 0:
+        return reporter.fatal("No files in the archive match the selected patterns")
+    return reporter.summary(result['processed'], result['failures'], result['elapsed'],
+                            bytes=snapshot['bytes_done'], entries=snapshot['entries_done'])
+
+def cmd_mvgl_pack(args, reporter):
+    import MVGLBatch
+
+    if args.writer == 'dscstools':
+        return _run_external(reporter, MVGLBatch, MVGLBatch.pack_command, args)
+
+    try:
+        result = MVGLBatch.pack_native(args.source, args.target, not args.no_encrypt, reporter.tool_progress,
+                                       jobs=args.jobs)
+    except (OSError, MVGLBatch.MVGLFormatError) as e:
+        return reporter.fatal(f"Cannot pack MVGL file: {str(e)}")
+    return reporter.summary(result['processed'], result['failures'], result['elapsed'],
+                            compressed=result['compressed'], bytes=result['snapshot']['bytes_done'])
+
+def _log_nonempty(reporter):
+    def on_output(line):
+        if line.strip():
+            reporter.log(line)
+    return on_output
+
+def _run_external(reporter, batch_module, build_command, args):
+    start_time = time.perf_counter()
+    try:
+        command = build_command(args.source, args.target)
+        returncode, snapshot = batch_module.run_command(command, _log_nonempty(reporter), args.timeout,
+                                                        reporter.tool_progress)
+    except OSError as e:
+        return reporter.fatal(str(e))
+    elapsed = time.perf_counter() - start_time
+    extra = {'bytes': snapshot['bytes_done'], 'entries': snapshot['entries_done']}
+    if returncode != 0:
+        return reporter.summary(0, [(args.source, f"Exit code {returncode}")], elapsed, **extra)
+    return reporter.summary(1, [], elapsed, **extra)
+
+# ============================================================================
+# Argument Parsing
+# ============================================================================
+
+def _default_jobs():
+    return os.cpu_count() or 1
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--json', action='store_true',
+                        help="print progress and summary as JSON lines")
+
+    parser = argparse.ArgumentParser(prog='dststools', description="Headless batch tools for DSTSTools")
+    groups = parser.add_subparsers(dest='group', metavar='{mbe,text,img,cpk,mvgl}')
+    groups.required = True
+
+    def add_group(name, help_text):
+        actions = groups.add_parser(name, help=help_text).add_subparsers(dest='action')
+        actions.required = True
+        return actions
+
+    def add_action(actions, name, func, help_text, source_help=None, target_help=None,
+                   jobs_default=_default_jobs(), jobs_help="CPU count"):
+        action = actions.add_parser(name, parents=[common], help=help_text)
+        # Added per action: a --jobs Action shared through the parent would share its default
+        action.add_argument('--jobs', '-j', type=int, default=jobs_default,
+                            help=f"number of parallel workers (default: {jobs_help})")
+        if source_help:
+            action.add_argument('source', help=source_help)
+        if target_help:
+            action.add_argument('target', help=target_help)
+        action.set_defaults(func=func)
+        return action
+
+    mbe = add_group('mbe', "MBE <-> CSV")
+    action = add_action(mbe, 'extract', cmd_mbe_extract, "extract MBE files to CSV",
+                        "directory of .mbe files or a single .mbe file", "CSV output directory")
+    action.add_argument('--no-cache', action='store_true', help="always re-extract, bypassing the cache")
+    action.add_argument('--cache-limit', type=int, default=2048, metavar='MB',
+                        help="extraction cache size limit in MB (default: 2048)")
+    action = add_action(mbe, 'repack', cmd_mbe_repack, "repack CSV directories to MBE",
+                        "directory of CSV subdirectories", "MBE output directory")
+    action.add_argument('--full', action='store_true', help="rebuild every file, ignoring the manifest")
+    add_action(mbe, 'cache-clear', cmd_mbe_cache_clear, "delete the MBE extraction cache")
+
+    text = add_group('text', "CSV <-> TSV")
+    # Reading is I/O bound: without --jobs the reader count is not tied to the cores
+    action = add_action(text, 'merge', cmd_text_merge, "merge CSV subdirectories into one TSV",
+                        "directory of CSV subdirectories", "output TSV file",
+                        jobs_default=None, jobs_help="sized for I/O, not the CPU count")
+    action.add_argument('--index', action='store_true',
+                        help="also write a sidecar index (<file.tsv>.idx) for fast partial splits")
+    action = add_action(text, 'split', cmd_text_split, "split a TSV back into CSV subdirectories",
+                        "TSV file", "CSV output directory")
+    action.add_argument('--files', action='append', default=[], metavar='PATTERN',
+                        help="only files whose metadata (dir/file.csv) matches this glob (repeatable);"
+                             " read through the index when the TSV has an up-to-date one")
+    action.add_argument('--incremental', action='store_true',
+                        help="only rewrite CSV files whose content changed and remove files of groups"
+                             " no longer in the TSV (tracked in a manifest in the CSV directory)")
+    add_action(text, 'index', cmd_text_index, "build the sidecar index of a (possibly edited) TSV", "TSV file")
+
+    img = add_group('img', "IMG <-> PNG")
+    # Without --jobs the pool is sized from cores and compressonator threads
+    img_actions = [
+        add_action(img, 'to-png', cmd_img_to_png, "convert IMG files to PNG",
+                   "directory of IMG files", "PNG output directory",
+                   jobs_default=None, jobs_help="sized from CPU count and decoder threads"),
+        add_action(img, 'to-img', cmd_img_to_img, "convert PNG files to BC7 IMG",
+                   "directory of PNG files", "IMG output directory",
+                   jobs_default=None, jobs_help="sized from CPU count and encoder threads"),
+    ]
+    img_actions[1].add_argument('--no-cache', action='store_true', help="always re-encode, bypassing the cache")
+    img_actions[1].add_argument('--cache-limit', type=int, default=2048, metavar='MB',
+                                help="conversion cache size limit in MB (default: 2048)")
+    add_action(img, 'cache-clear', cmd_img_cache_clear, "delete the PNG to IMG conversion cache")
+    img_actions[0].add_argument('--decoder', choices=('auto', 'native', 'compressonator'), default='auto',
+                                help="built-in decoder with compressonator fallback (auto), built-in only,"
+                                     " or compressonatorcli only")
+
+    cpk = add_group('cpk', "CPK archives")
+    action = add_action(cpk, 'list', cmd_cpk_list, "list the files of a CPK archive", "CPK file")
+    cpk_selective = [action]
+    action = add_action(cpk, 'extract', cmd_cpk_extract, "extract a CPK archive", "CPK file", "output directory")
+    action.add_argument('--reader', choices=('builtin', 'yacpktool'), default='builtin',
+                        help="read the archive directly (default) or run YACpkTool")
+    cpk_selective.append(action)
+    for action in cpk_selective:
+        action.add_argument('--files', action='append', default=[], metavar='PATTERN',
+                            help="only files whose archive path matches this glob (repeatable)")
+    external_actions = [
+        cpk_selective[1],
+        add_action(cpk, 'repack', cmd_cpk_repack, "repack a directory into a CPK archive",
+                   "input directory", "output CPK file"),
+    ]
+    action = add_action(cpk, 'patch', cmd_cpk_patch,
+                        "replace files of a CPK archive without a full repack")
+    action.add_argument('original', help="original CPK file")
+    action.add_argument('source', help="directory with the changed files (same paths as in the archive)")
+    action.add_argument('target', help="output CPK file (may be the original)")
+
+    mvgl = add_group('mvgl', "MVGL archives")
+    action = add_action(mvgl, 'list', cmd_mvgl_list, "list the files of an MVGL archive", "MVGL file")
+    mvgl_selective = [action]
+    action = add_action(mvgl, 'extract', cmd_mvgl_extract, "extract an MVGL archive", "MVGL file", "output directory")
+    action.add_argument('--reader', choices=('builtin', 'dscstools'), default='builtin',
+                        help="read the archive directly (default) or run DSCSToolsCLI")
+    mvgl_selective.append(action)
+    for action in mvgl_selective:
+        action.add_argument('--files', action='append', default=[], metavar='PATTERN',
+                            help="only files whose archive path matches this glob (repeatable)")
+    action = add_action(mvgl, 'pack', cmd_mvgl_pack, "pack a directory into an MVGL archive",
+                        "input directory", "output MVGL file")
+    action.add_argument('--writer', choices=('builtin', 'dscstools'), default='builtin',
+                        help="write the archive directly (default) or run DSCSToolsCLI")
+    action.add_argument('--no-encrypt', action='store_true', help="write an unencrypted archive (built-in writer)")
+    external_actions += [mvgl_selective[1], action]
+    for action in external_actions:
+        action.add_argument('--timeout', type=float, metavar='SECONDS',
+                            help="kill the external tool after this many seconds")
+
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    reporter = Reporter(f"{args.group} {args.action}", args.json)
+    try:
+        return args.func(args, reporter)
+    except KeyboardInterrupt:
+        return reporter.fatal("Interrupted")
+    except OSError as e:
+        return reporter.fatal(str(e))
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())